@@ -0,0 +1,254 @@
+# bench.py
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+import numpy as np
+import database
+import harness
+import tests
+
+GROUPS = ("overhead", "database", "startup")
+DB_ROWS = (10000, 1000000)  # Stored runs the database benchmarks are repeated at
+DB_BATCH = 10000  # Runs inserted per transaction while filling a benchmark database
+DB_HOST = {"fingerprint": "bench", "hostname": "bench"}
+MEASURE_OPTIONS = {"warmup": 1, "min_runs": 3, "max_runs": 10, "time_budget": 60.0, "target_ci": 0.05}
+THRESHOLD = 0.10  # Slowdown against a baseline that --compare reports
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+STARTUP_LINE = re.compile(r"^\s*(\w+):\s+([\d.]+) ms")  # A phase line of main.report_startup
+
+# Every score below is a time or a share of time spent in the tool itself, so lower is always better
+
+def _per_call_ns(func, calls):
+    """Return the nanoseconds one call of func takes, from calls calls in a row."""
+    start_time = time.perf_counter_ns()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter_ns() - start_time) / calls
+
+def overhead_benchmark(iterations=1000000, ram_size=64 * 1024 ** 2, directory=None):
+    """Measure the tool's own costs that end up inside the tests' numbers.
+
+    cpu_loop_share is how much of the CPU workload is the bare interpreter
+    loop rather than the multiplications. ram_call_share is NumPy's per-call
+    dispatch cost relative to copying ram_size bytes, an upper bound of its
+    share in the RAM test's larger arrays. chase_step_ns is what each load
+    of the latency test costs with the data in L1, through the chase loop
+    tests.chase_engine picks. disk_cached_read_us is a 4 KiB read served
+    from the page cache through the disk test's I/O path, below which disk
+    latencies are tool overhead. The rest are the timer and progress
+    checkpoint costs paid around every timed block.
+    """
+    start_time = time.perf_counter_ns()
+    for _ in range(1, iterations):
+        pass
+    loop_ns = time.perf_counter_ns() - start_time
+    workload_ns = tests._cpu_workload(iterations) * 1e9
+
+    small = np.ones(8)
+    large = np.ones(ram_size // 8)
+    target = np.empty_like(large)
+    call_ns = _per_call_ns(lambda: np.copyto(small, small), 10000)
+    copy_ns = _per_call_ns(lambda: np.copyto(target, large), 3)
+    del large, target
+
+    chain, _ = tests._pointer_chain(tests.LATENCY_MIN_SIZE, np.random.default_rng(0))
+    chase_ns = tests._chase(chain, 100000)
+
+    handle, path = tempfile.mkstemp(dir=directory)
+    try:
+        os.write(handle, os.urandom(4096))
+        view = memoryview(bytearray(4096))
+        tests._read_block(handle, view, 0)
+        read_ns = _per_call_ns(lambda: tests._read_block(handle, view, 0), 10000)
+    finally:
+        os.close(handle)
+        os.unlink(path)
+
+    cancel = threading.Event()
+
+    def checkpoint():
+        tests._check_cancel(cancel)
+        tests._report(lambda fraction, throughput: None, 0.5, 1.0)
+
+    return {
+        "cpu_loop_share": round(loop_ns / workload_ns, 4),
+        "ram_call_share": round(call_ns / (call_ns + copy_ns), 6),
+        "ram_call_ns": round(call_ns, 1),
+        "chase_step_ns": round(chase_ns, 2),
+        "disk_cached_read_us": round(read_ns / 1000, 3),
+        "timer_ns": round(_per_call_ns(time.perf_counter_ns, 100000), 1),
+        "checkpoint_ns": round(_per_call_ns(checkpoint, 100000), 1),
+    }
+
+def fill_database(rows, batch=DB_BATCH):
+    """Add rows CPU runs, an hour apart and each with two metrics, to the shared database."""
+    start = int(time.time()) - rows * 3600
+    for first in range(0, rows, batch):
+        database.insert_runs([{
+            "test_type": "CPU",
+            "metrics": {"single_core": 1000.0 + index % 97, "all_core": 4000.0 + index % 89},
+            "host": DB_HOST,
+            "started_at": start + index * 3600,
+        } for index in range(first, min(first + batch, rows))])
+
+def database_benchmark(rows):
+    """Time the inserts and queries the UI and CLI use, on a database already holding rows runs."""
+    host_id = database.get_or_create_host(DB_HOST)
+    start_time = time.perf_counter_ns()
+
+    def lap():
+        nonlocal start_time
+        now = time.perf_counter_ns()
+        elapsed, start_time = (now - start_time) / 1e6, now
+        return round(elapsed, 3)
+
+    fill_database(100, batch=100)
+    scores = {"insert_100_runs_ms": lap()}
+    database.get_test_results_page(100)
+    scores["page_first_ms"] = lap()
+    database.get_test_results_page(100, before=(int(time.time()) - rows * 1800, 0))  # Halfway back
+    scores["page_deep_ms"] = lap()
+    database.count_test_results()
+    scores["count_ms"] = lap()
+    database.get_metric_history("CPU", "single_core", host_id)
+    scores["metric_history_ms"] = lap()
+    database.get_result_aggregates(test_type="CPU", period="day")
+    scores["aggregates_by_day_ms"] = lap()
+    sum(len(chunk) for chunk in database.iter_export_rows())
+    scores["export_scan_ms"] = lap()
+    return scores
+
+def startup_benchmark():
+    """Start the app until its first paint with --startup-check and return each phase and the whole process in ms."""
+    environment = dict(os.environ)
+    if sys.platform.startswith("linux") and not environment.get("DISPLAY") and not environment.get("WAYLAND_DISPLAY"):
+        environment["QT_QPA_PLATFORM"] = "offscreen"
+    start_time = time.perf_counter_ns()
+    completed = subprocess.run([sys.executable, MAIN, "--startup-check"], env=environment, cwd=os.path.dirname(MAIN),
+                               capture_output=True, text=True, timeout=60)
+    scores = {"process_ms": round((time.perf_counter_ns() - start_time) / 1e6, 1)}
+    for line in completed.stderr.splitlines():
+        match = STARTUP_LINE.match(line)
+        if match:
+            scores[f"{match.group(1)}_ms"] = float(match.group(2))
+    if "total_ms" not in scores:
+        raise RuntimeError(f"main.py printed no startup report: {completed.stderr.strip()[-500:]}")
+    # The total first, as harness.measure checks convergence on the first score
+    return {"total_ms": scores.pop("total_ms"), **scores}
+
+def run_benchmarks(groups=GROUPS, rows=DB_ROWS, measure_options=None, directory=None, log=None):
+    """Run the micro-benchmark groups and return their harness.measure results by benchmark name.
+
+    The database group fills a temporary database per size in rows and
+    leaves the app's database untouched. log, if given, is called with a
+    line of text as each benchmark starts.
+    """
+    measure_options = measure_options or MEASURE_OPTIONS
+    log = log or (lambda text: None)
+    results = {}
+    if "overhead" in groups:
+        log("overhead")
+        results["overhead"] = harness.measure(lambda: overhead_benchmark(directory=directory), **measure_options)
+    if "database" in groups:
+        workdir = tempfile.mkdtemp(dir=directory)
+        try:
+            for count in rows:
+                log(f"database_{count}: filling")
+                database.init(os.path.join(workdir, f"bench_{count}.db"))
+                fill_database(count)
+                log(f"database_{count}")
+                results[f"database_{count}"] = harness.measure(lambda: database_benchmark(count), **measure_options)
+                database.close()
+        finally:
+            shutil.rmtree(workdir)
+    if "startup" in groups:
+        log("startup")
+        results["startup"] = harness.measure(startup_benchmark, **measure_options)
+    return results
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Return (benchmark, metric, baseline mean, mean, change) for every score slower than baseline by over threshold."""
+    slower = []
+    for name, metrics in results.items():
+        for metric, summary in metrics.items():
+            before = baseline.get(name, {}).get(metric)
+            if not isinstance(summary, dict) or not isinstance(before, dict) or not before["mean"]:
+                continue  # New benchmarks and the rejected counts have nothing to compare
+            change = summary["mean"] / before["mean"] - 1
+            if change > threshold:
+                slower.append((name, metric, before["mean"], summary["mean"], change))
+    return slower
+
+def parse_group(text):
+    """Parse a benchmark group name given in any case."""
+    group = text.lower()
+    if group not in GROUPS:
+        raise argparse.ArgumentTypeError(f"unknown group {text!r}, choose from {', '.join(GROUPS)}")
+    return group
+
+def parse_rows(text):
+    """Parse a comma-separated list of row counts such as 10000,1000000."""
+    try:
+        return [int(part) for part in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected row counts such as 10000,1000000, got {text!r}") from None
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m bench",
+        description="Benchmark the benchmark tool itself: test overhead, database speed and startup time.",
+    )
+    parser.add_argument("groups", nargs="*", type=parse_group, metavar="GROUP",
+                        help=f"groups to run: {', '.join(GROUPS)} (default: all); startup launches the "
+                             "app, which opens its database as usual")
+    parser.add_argument("--rows", type=parse_rows, default=list(DB_ROWS),
+                        help=f"database sizes to benchmark (default: {','.join(map(str, DB_ROWS))})")
+    parser.add_argument("-n", "--max-runs", type=int, default=MEASURE_OPTIONS["max_runs"],
+                        help=f"maximum measured runs per benchmark (default: {MEASURE_OPTIONS['max_runs']})")
+    parser.add_argument("--directory", help="directory for temporary files (default: the system's)")
+    parser.add_argument("--compare", metavar="BASELINE", help="a previous -o report to compare against; "
+                        "slowdowns are listed and make the exit status 1")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"slowdown fraction --compare reports (default: {THRESHOLD})")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file instead of stdout")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    measure_options = {**MEASURE_OPTIONS, "max_runs": max(args.max_runs, 1),
+                       "min_runs": min(MEASURE_OPTIONS["min_runs"], max(args.max_runs, 1))}
+    results = run_benchmarks(args.groups or GROUPS, args.rows, measure_options, args.directory,
+                             log=lambda text: print(f"Running {text}", file=sys.stderr))
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "benchmarks": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as file:
+            slower = compare(results, json.load(file)["benchmarks"], args.threshold)
+        for name, metric, before, after, change in slower:
+            print(f"{name}.{metric}: {before:g} -> {after:g} ({change:+.0%})", file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# cli.py
+
+import argparse
+import ast
+import json
+import platform
+import socket
+import sys
+from datetime import datetime
+import database
+import hardware
+import registry
+import regression
+import suite
+
+# Test functions by test type, the same names the UI and the database use
+TESTS = {name: registry.runner(name) for name in registry.benchmarks()}
+
+def parse_test_type(text):
+    """Parse a test name given in any case into its registered test type."""
+    test_type = text.upper()
+    if test_type not in TESTS:
+        raise argparse.ArgumentTypeError(f"unknown test {text!r}, choose from {', '.join(TESTS)}")
+    return test_type
+
+def parse_param(text):
+    """Parse a TEST.NAME=VALUE option into (test type, name, value)."""
+    key, separator, raw_value = text.partition("=")
+    test_type, dot, name = key.partition(".")
+    if not separator or not dot or not name:
+        raise argparse.ArgumentTypeError(f"expected TEST.NAME=VALUE, got {text!r}")
+    test_type = test_type.upper()
+    if test_type not in TESTS:
+        raise argparse.ArgumentTypeError(f"unknown test {test_type!r}")
+    if name not in registry.params(test_type):
+        raise argparse.ArgumentTypeError(f"{test_type} has no parameter {name!r}, see --list")
+    try:
+        value = ast.literal_eval(raw_value)
+    except (ValueError, SyntaxError):
+        value = raw_value  # Plain strings such as paths need no quoting
+    return test_type, name, value
+
+def parse_affinity(text):
+    """Parse a --cpus option into (test type or None for every test, CPU list)."""
+    test_type, separator, cpus = text.rpartition("=")
+    try:
+        return (parse_test_type(test_type) if separator else None), suite.parse_cpu_list(cpus)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+
+def add_test_arguments(parser):
+    """Add the test selection, test parameter and harness options shared with fleet runs."""
+    parser.add_argument("tests", nargs="*", type=parse_test_type, metavar="TEST",
+                        help=f"tests to run: {', '.join(TESTS)} (default: all)")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="discarded warmup runs per test (default: 1)")
+    parser.add_argument("--min-runs", type=int, default=3,
+                        help="measured runs before checking convergence (default: 3)")
+    parser.add_argument("-n", "--max-runs", type=int, default=10,
+                        help="maximum measured runs per test (default: 10)")
+    parser.add_argument("--time-budget", type=float, default=600.0,
+                        help="seconds each test may keep repeating for (default: 600)")
+    parser.add_argument("--target-ci", type=float, default=0.02,
+                        help="stop once the 95%% confidence interval is within this "
+                             "fraction of the mean (default: 0.02)")
+    parser.add_argument("-p", "--param", type=parse_param, action="append", default=[],
+                        metavar="TEST.NAME=VALUE",
+                        help="keyword argument for a test function, e.g. disk.queue_depth=8")
+
+def parse_test_arguments(args):
+    """Validate parsed add_test_arguments options and return (test types, params, measure options)."""
+    if args.warmup < 0 or args.min_runs < 1 or args.max_runs < args.min_runs:
+        sys.exit("need --warmup >= 0 and 1 <= --min-runs <= --max-runs")
+    params = {}
+    for test_type, name, value in args.param:
+        params.setdefault(test_type, {})[name] = value
+    measure_options = {
+        "warmup": args.warmup,
+        "min_runs": args.min_runs,
+        "max_runs": args.max_runs,
+        "time_budget": args.time_budget,
+        "target_ci": args.target_ci,
+    }
+    return args.tests or list(TESTS), params, measure_options
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m cli",
+        description="Run benchmarks without the GUI and print the results as JSON.",
+    )
+    add_test_arguments(parser)
+    parser.add_argument("--telemetry", action="store_true",
+                        help="include the CPU, memory and disk samples taken every 100 ms during each test")
+    parser.add_argument("--parallel", action="store_true",
+                        help="run the tests all at once instead of one after the other")
+    parser.add_argument("--cooldown", type=float, default=0.0,
+                        help="seconds to rest between serial tests, then wait for the CPU to go idle "
+                             f"(default: 0, nightly runs should use e.g. {suite.COOLDOWN:g})")
+    parser.add_argument("--cpus", type=parse_affinity, action="append", default=[], metavar="[TEST=]CPUS",
+                        help="pin every test, or one test, to a CPU list such as 0-3,6; the CPU test's "
+                             "all-core half then runs one worker per listed CPU")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="profile each test with cProfile, dump TEST.prof files to DIR "
+                             "and add the hot paths to the report (not with --parallel)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="trace allocations with tracemalloc and add the peak and its sites to the report")
+    parser.add_argument("--store", action="store_true",
+                        help="save the results in the database and check them for regressions")
+    parser.add_argument("--database", help="database file for --store (default: the app's)")
+    parser.add_argument("--list", action="store_true", help="list the tests and their parameters, then exit")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--indent", type=int, default=2, help="JSON indentation, 0 for one line")
+    return parser
+
+def store_results(report):
+    """Save every test of a suite.run_suite report as a run on this host and add the regressions found to it."""
+    tests = report["tests"]
+    run_ids = database.insert_runs([{
+        "test_type": test_type,
+        "metrics": entry["results"],
+        "host": hardware.get_host_info(),
+        "started_at": entry["started_at"],
+        "duration": entry["duration"],
+        "params": entry["params"],
+        "utilization": entry["utilization"],
+        "telemetry": entry.get("telemetry"),
+    } for test_type, entry in tests.items()])
+    for entry, run_id in zip(tests.values(), run_ids):
+        entry["run_id"] = run_id
+        entry["regressions"] = regression.regressions(run_id)
+
+def list_tests():
+    """Print every registered test with its parameters and their defaults."""
+    for name in registry.benchmarks():
+        print(name)
+        for param, default in registry.params(name).items():
+            print(f"    {name.lower()}.{param}={default!r}")
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.list:
+        list_tests()
+        return
+    test_types, params, measure_options = parse_test_arguments(args)
+    affinity = {test_type: cpus for test_type, cpus in args.cpus}
+    if None in affinity:  # CPUs for every test, with per-test lists taking precedence
+        every_test = affinity.pop(None)
+        affinity = {**dict.fromkeys(test_types, every_test), **affinity}
+    if args.store and (args.profile or args.trace_memory):
+        sys.exit("--store cannot be combined with --profile or --trace-memory, which skew the results")
+    if args.parallel and args.profile:
+        sys.exit("--profile cannot be combined with --parallel, cProfile profiles one thread at a time")
+    if args.store:
+        database.init(args.database or database.DATABASE_NAME)
+
+    started = datetime.now().isoformat(timespec="seconds")
+    suite_report = suite.run_suite(test_types, params, measure_options, mode="parallel" if args.parallel else "serial",
+                                   cooldown=args.cooldown, affinity=affinity or None,
+                                   profile_dir=args.profile, trace_memory=args.trace_memory)
+    if args.store:
+        store_results(suite_report)
+    if not args.telemetry:
+        for entry in suite_report["tests"].values():
+            del entry["telemetry"]
+    report = {
+        "host": socket.gethostname(),
+        "inventory": hardware.get_inventory(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "started": started,
+        "mode": suite_report["mode"],
+        "cooldown": suite_report["cooldown"],
+        "duration": suite_report["duration"],
+        "tests": suite_report["tests"],
+    }
+    text = json.dumps(report, indent=args.indent or None)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
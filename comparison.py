@@ -0,0 +1,268 @@
+# comparison.py
+
+import argparse
+import bisect
+import csv
+import gzip
+import itertools
+import json
+import os
+import sys
+import database
+import regression
+
+LOCAL_SET = "local"  # Reference set built from this database's own hosts, see refresh_local
+QUANTILES = 101  # Points stored per aggregate, every percentile from the minimum to the maximum
+IMPORT_BATCH = 10000  # Reference results inserted per transaction
+FIELDS = ["test_type", "metric", "value", "label", *database.REFERENCE_ATTRIBUTES]
+
+# Attributes the comparison dialog offers to filter on, with their labels
+FILTERS = {
+    "cpu_name": "Same CPU model",
+    "cpu_cores": "Same core count",
+    "cpu_threads": "Same thread count",
+    "ram_gb": "Same RAM size",
+    "os": "Same OS",
+}
+
+def _integer(value):
+    """Parse a whole number field of a reference file, None if it is empty."""
+    return None if value in (None, "") else int(float(value))
+
+def _reference_row(record):
+    """Turn one record of a reference file into a row for database.insert_reference_results.
+
+    test_type, metric and value are required. ram_bytes is accepted in
+    place of ram_gb, and empty fields are stored as NULL.
+    """
+    try:
+        row = [str(record["test_type"]).upper(), str(record["metric"]), float(record["value"])]
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError(f"Reference result without a valid test_type, metric and value: {record!r}") from error
+    ram_gb = record.get("ram_gb")
+    if ram_gb in (None, "") and record.get("ram_bytes") not in (None, ""):
+        ram_gb = round(float(record["ram_bytes"]) / 1024 ** 3)
+    return row + [record.get("label") or None, record.get("cpu_name") or None, _integer(record.get("cpu_cores")),
+                  _integer(record.get("cpu_threads")), _integer(ram_gb), record.get("os") or None]
+
+def read_reference_file(path):
+    """Yield the records of a CSV or JSON Lines reference file, which may be gzip compressed, as dicts.
+
+    CSV files need a header line naming the FIELDS they have.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", newline="", encoding="utf-8") as file:
+        if path.removesuffix(".gz").endswith(".jsonl"):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+def quantiles(ordered, count=QUANTILES):
+    """Return count evenly spaced, linearly interpolated quantiles of an already sorted list."""
+    last = len(ordered) - 1
+    points = []
+    for index in range(count):
+        position = index * last / (count - 1)
+        lower = int(position)
+        upper = min(lower + 1, last)
+        points.append(ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower))
+    return points
+
+def share_below(points, value):
+    """Return the estimated fraction (0-1) of a population below value, from its quantiles."""
+    if value <= points[0]:
+        return 0.0
+    if value >= points[-1]:
+        return 1.0
+    upper = bisect.bisect_right(points, value)
+    lower = upper - 1
+    # Interpolate between the two quantiles around value; equal neighbours cannot occur here
+    return (lower + (value - points[lower]) / (points[upper] - points[lower])) / (len(points) - 1)
+
+def rebuild_aggregates(set_id):
+    """Recompute the precomputed aggregates of a reference set.
+
+    Every metric's results are read once, sorted by value, and split by each
+    of the REFERENCE_ATTRIBUTES, so the sorted order carries over to every
+    group. A group stores its count, mean and QUANTILES points, which is
+    all rank and the comparison dialog need however many results a set has.
+    """
+    rows = []
+    for test_type, metric in database.get_reference_groups(set_id):
+        results = database.get_reference_values(set_id, test_type, metric)
+        groups = {("", ""): [value for value, *_ in results]}
+        for value, *attributes in results:
+            for attribute, attribute_value in zip(database.REFERENCE_ATTRIBUTES, attributes):
+                if attribute_value is not None:
+                    groups.setdefault((attribute, str(attribute_value)), []).append(value)
+        for (attribute, attribute_value), values in groups.items():
+            rows.append((test_type, metric, attribute, attribute_value, len(values), sum(values) / len(values),
+                         database.encode_samples(quantiles(values))))
+    database.replace_reference_aggregates(set_id, rows)
+    return len(rows)
+
+def import_reference(path, name=None, batch=IMPORT_BATCH):
+    """Import a reference dataset file as a reference set and index it, replacing a set of the same name.
+
+    The file is streamed into the database batch records at a time, into a
+    pending set that replaces the previous one only once it is complete and
+    indexed. A failed import leaves the previous set as it was. name
+    defaults to the file name without its extensions. Returns a dict with
+    name, results and aggregates.
+    """
+    name = name or os.path.basename(path).split(".")[0]
+    if name == LOCAL_SET:
+        raise ValueError(f"The set name {LOCAL_SET!r} is kept for this database's own hosts")
+    set_id = database.create_reference_set(name, os.path.abspath(path))
+    count = 0
+    try:
+        records = read_reference_file(path)
+        while True:
+            rows = [_reference_row(record) for record in itertools.islice(records, batch)]
+            if not rows:
+                break
+            database.insert_reference_results(set_id, rows)
+            count += len(rows)
+        aggregates = rebuild_aggregates(set_id)
+    except BaseException:
+        database.delete_reference_set(set_id)  # No half imported set is left behind
+        raise
+    database.publish_reference_set(set_id, name)
+    return {"name": name, "results": count, "aggregates": aggregates}
+
+def refresh_local():
+    """Rebuild the LOCAL_SET reference set from the stored runs, one result per host, test and metric.
+
+    Each host contributes the mean of its runs, so hosts that ran a test
+    often do not outweigh the others. Returns the number of results.
+    """
+    rows = [(test_type, metric, mean, hostname, cpu_name, cores, threads,
+             round(ram_bytes / 1024 ** 3) if ram_bytes else None, host_os)
+            for hostname, cpu_name, cores, threads, ram_bytes, host_os, test_type, metric, mean
+            in database.get_host_metric_means()]
+    set_id = database.create_reference_set(LOCAL_SET)
+    try:
+        database.insert_reference_results(set_id, rows)
+        rebuild_aggregates(set_id)
+    except BaseException:
+        database.delete_reference_set(set_id)
+        raise
+    database.publish_reference_set(set_id, LOCAL_SET)
+    return len(rows)
+
+def host_attributes(host):
+    """Return the REFERENCE_ATTRIBUTES of a host, as hardware.get_host_info describes it."""
+    ram_bytes = host.get("ram_bytes")
+    return {
+        "cpu_name": host.get("cpu_name"),
+        "cpu_cores": host.get("cpu_cores"),
+        "cpu_threads": host.get("cpu_threads"),
+        "ram_gb": round(ram_bytes / 1024 ** 3) if ram_bytes else None,
+        "os": host.get("os"),
+    }
+
+def rank(test_type, metric, value, filters=None, sets=None):
+    """Rank a result against the reference sets, by percentile.
+
+    filters maps REFERENCE_ATTRIBUTES to the values compared results must
+    have, usually a subset of host_attributes. No filter or one filter is
+    answered from the precomputed aggregates; several filters need a count
+    over the matching results, which the index keeps to one range scan.
+    sets is a list of set names, all sets by default.
+
+    Returns a dict per set with set, count and percentile, the share of the
+    results this one does better than given the metric's direction, plus
+    the mean, median, p10 and p90 when they come from an aggregate. Sets
+    with no matching results are left out.
+    """
+    filters = {attribute: value for attribute, value in (filters or {}).items() if value is not None}
+    higher_is_better = regression.higher_is_better(metric)
+    ranking = []
+    for reference_set in database.get_reference_sets():
+        if sets is not None and reference_set["name"] not in sets:
+            continue
+        entry = {"set": reference_set["name"]}
+        if len(filters) <= 1:
+            attribute, attribute_value = next(iter(filters.items()), ("", ""))
+            aggregate = database.get_reference_aggregate(reference_set["id"], test_type, metric,
+                                                         attribute, attribute_value)
+            if aggregate is None:
+                continue
+            count, mean, points = aggregate
+            below = share_below(points, value)
+            entry.update(count=count, mean=mean, median=points[len(points) // 2],
+                         p10=points[len(points) // 10], p90=points[len(points) * 9 // 10])
+        else:
+            count, below_count = database.count_reference_results(reference_set["id"], test_type, metric,
+                                                                  value, filters)
+            if not count:
+                continue
+            below = below_count / count
+            entry["count"] = count
+        entry["percentile"] = round(100 * (below if higher_is_better else 1 - below), 1)
+        ranking.append(entry)
+    return ranking
+
+def neighbours(set_name, test_type, metric, value, attribute="cpu_name", limit=10):
+    """Return the attribute values of a set whose median result is closest to value, best first.
+
+    Each is a dict with the attribute value as name, count and median, read
+    from the aggregates. Up to limit values on either side of value are
+    returned, so the list shows what the result sits between.
+    """
+    reference_set = next((entry for entry in database.get_reference_sets() if entry["name"] == set_name), None)
+    if reference_set is None:
+        return []
+    groups = sorted(({"name": name, "count": count, "median": points[len(points) // 2]}
+                     for name, count, _, points in database.get_reference_attribute_aggregates(
+                         reference_set["id"], test_type, metric, attribute)),
+                    key=lambda group: group["median"])
+    position = bisect.bisect_left([group["median"] for group in groups], value)
+    nearby = groups[max(position - limit, 0):position + limit]
+    return nearby[::-1] if regression.higher_is_better(metric) else nearby
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m comparison",
+        description="Manage the reference results that benchmark results are compared against.",
+    )
+    parser.add_argument("--database", help="database file to use (default: the app's)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="import a CSV or JSON Lines reference file, optionally gzip "
+                                                       f"compressed, with the fields {', '.join(FIELDS)}")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--name", help="name of the reference set (default: the file name)")
+    commands.add_parser("local", help="rebuild the reference set of this database's own hosts")
+    commands.add_parser("list", help="list the reference sets")
+    rank_parser = commands.add_parser("rank", help="rank a result against the reference sets")
+    rank_parser.add_argument("test_type", type=str.upper)
+    rank_parser.add_argument("metric")
+    rank_parser.add_argument("value", type=float)
+    for attribute in database.REFERENCE_ATTRIBUTES:
+        rank_parser.add_argument(f"--{attribute.replace('_', '-')}", dest=attribute,
+                                 help=f"only compare with results that have this {attribute}")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    database.init(args.database or database.DATABASE_NAME)
+    if args.command == "import":
+        try:
+            summary = import_reference(args.file, args.name)
+        except (OSError, ValueError) as error:
+            sys.exit(str(error))
+        print(f"Imported {summary['results']} results as {summary['name']!r} "
+              f"({summary['aggregates']} aggregates)", file=sys.stderr)
+    elif args.command == "local":
+        print(f"Rebuilt {LOCAL_SET!r} from {refresh_local()} host results", file=sys.stderr)
+    elif args.command == "list":
+        for reference_set in database.get_reference_sets():
+            print(f"{reference_set['name']}\t{reference_set['results']}\t{reference_set['source'] or ''}")
+    else:
+        filters = {attribute: getattr(args, attribute) for attribute in database.REFERENCE_ATTRIBUTES}
+        print(json.dumps(rank(args.test_type, args.metric, args.value, filters), indent=2))
+
+if __name__ == "__main__":
+    main()
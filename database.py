@@ -1,15 +1,265 @@
 # database.py
 
+import array
+import concurrent.futures
+import contextlib
+import json
+import math
+import os
+import platform
+import queue
 import sqlite3
+import sys
+import threading
+import time
+import zlib
 from datetime import datetime
 
-DATABASE_NAME = 'database.db'
+# Next to this module rather than relative to whatever directory the app runs from
+DATABASE_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database.db')
 
-def create_table():
-    """Create the tests table if it does not exist."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
+# Summary statistics stored next to each result, as returned by harness.summarize
+STATS_COLUMNS = [
+    ('mean', 'REAL'),
+    ('median', 'REAL'),
+    ('p95', 'REAL'),
+    ('stddev', 'REAL'),
+    ('samples', 'INTEGER'),
+]
+
+# Host columns, filled from hardware.get_host_info
+HOST_COLUMNS = ['fingerprint', 'hostname', 'cpu_name', 'cpu_cores', 'cpu_threads',
+                'cpu_freq_mhz', 'ram_bytes', 'disk_bytes', 'os']
+
+# Statements are kept as constants so sqlite3's per-connection statement
+# cache compiles each of them only once
+INSERT_RUN_SQL = '''
+    INSERT INTO runs (host_id, test_type, started_at, duration, params, python_version, platform, utilization)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+INSERT_METRIC_SQL = '''
+    INSERT INTO metrics (run_id, name, position, value, median, p95, stddev, samples)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+INSERT_TELEMETRY_SQL = '''
+    INSERT INTO telemetry (run_id, channel, samples, data) VALUES (?, ?, ?, ?)
+'''
+INSERT_HOST_SQL = f'''
+    INSERT OR IGNORE INTO hosts ({', '.join(HOST_COLUMNS)}, first_seen, last_seen)
+    VALUES ({', '.join('?' * len(HOST_COLUMNS))}, ?, ?)
+'''
+# The first metric of each run (position 0) is its headline score
+SELECT_RESULTS_SQL = '''
+    SELECT r.test_type, m.value, datetime(r.started_at, 'unixepoch', 'localtime')
+    FROM runs r JOIN metrics m ON m.run_id = r.id AND m.position = 0
+    ORDER BY r.started_at DESC, r.id DESC
+'''
+
+# Percentiles are picked by nearest rank within each (test type, metric, period) group
+AGGREGATES_SQL = '''
+    WITH ranked AS (
+        SELECT r.test_type, m.name, m.value, {period} AS period,
+               ROW_NUMBER() OVER (PARTITION BY r.test_type, m.name, {period} ORDER BY m.value) AS position,
+               COUNT(*) OVER (PARTITION BY r.test_type, m.name, {period}) AS total
+        FROM runs r JOIN metrics m ON m.run_id = r.id
+        WHERE {where}
+    )
+    SELECT test_type, name, period, COUNT(*), MIN(value), MAX(value), AVG(value),
+           MAX(CASE WHEN position = CAST(0.5 * (total - 1) AS INTEGER) + 1 THEN value END),
+           MAX(CASE WHEN position = CAST(0.95 * (total - 1) AS INTEGER) + 1 THEN value END)
+    FROM ranked
+    GROUP BY test_type, name, period
+    ORDER BY test_type, name, period
+'''
+
+# One row per metric of every run, the layout bulk exports write
+EXPORT_COLUMNS = ['run_id', 'test_type', 'started_at', 'duration', 'fingerprint', 'hostname', 'params',
+                  'python_version', 'platform', 'metric', 'position', 'value', 'median', 'p95', 'stddev', 'samples']
+EXPORT_CHUNK_SIZE = 1000  # Runs read per query by iter_export_rows
+# The runs of a chunk are picked first so LIMIT counts runs, not their metrics
+EXPORT_ROWS_SQL = '''
+    SELECT r.id, r.test_type, r.started_at, r.duration, h.fingerprint, h.hostname, r.params,
+           r.python_version, r.platform, m.name, m.position, m.value, m.median, m.p95, m.stddev, m.samples
+    FROM (SELECT * FROM runs WHERE id > ? ORDER BY id LIMIT ?) r
+    LEFT JOIN hosts h ON h.id = r.host_id
+    LEFT JOIN metrics m ON m.run_id = r.id
+    ORDER BY r.id, m.position
+'''
+
+# Hardware columns reference results can be filtered on, see get_reference_aggregate
+PENDING_PREFIX = '~pending:'  # Name prefix of reference sets still being filled, see create_reference_set
+REFERENCE_ATTRIBUTES = ['cpu_name', 'cpu_cores', 'cpu_threads', 'ram_gb', 'os']
+INSERT_REFERENCE_SQL = f'''
+    INSERT INTO reference_results (set_id, test_type, metric, value, label, {', '.join(REFERENCE_ATTRIBUTES)})
+    VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(REFERENCE_ATTRIBUTES))})
+'''
+
+# strftime formats that group run times into the periods get_result_aggregates accepts
+PERIOD_FORMATS = {
+    'hour': '%Y-%m-%d %H:00',
+    'day': '%Y-%m-%d',
+    'week': '%Y-W%W',
+    'month': '%Y-%m',
+}
+
+class Database:
+    """A long-lived SQLite connection shared by every thread of the app.
+
+    The connection runs in WAL mode with synchronous=NORMAL, so readers never
+    block the writer and a commit does not wait for an fsync of the whole
+    database. Access is serialized with a lock, which makes the one
+    connection safe to use from the UI thread and test workers alike.
+    Transactions are begun explicitly rather than by the sqlite3 module,
+    which would leave CREATE and ALTER statements outside of them.
+    """
+    def __init__(self, path=DATABASE_NAME):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Hold the lock and commit everything done on the yielded connection at once, schema changes included.
+
+        If the block raises, all of it is rolled back. A transaction opened
+        inside another one joins it.
+        """
+        with self.lock:
+            if self.conn.in_transaction:
+                yield self.conn
+                return
+            self.conn.execute('BEGIN')
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def execute(self, sql, params=()):
+        """Run one statement in its own transaction."""
+        with self.transaction() as conn:
+            conn.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        """Run one statement for every row, all in a single transaction."""
+        with self.transaction() as conn:
+            conn.executemany(sql, rows)
+
+    def query(self, sql, params=()):
+        """Run a query and return all of its rows."""
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+_database = None
+_database_lock = threading.Lock()
+
+def _open(path):
+    """Open the database at path and migrate it, closing it again if a migration fails."""
+    db = Database(path)
+    try:
+        create_table(db)
+    except BaseException:
+        db.close()
+        raise
+    return db
+
+def init(path=DATABASE_NAME):
+    """Open the database at path, bring its schema up to date, and make it the shared one.
+
+    Nothing touches the disk until this (or the first database call) runs.
+    It only becomes the shared one once every migration has succeeded, and
+    then the previous connection is closed.
+    """
+    global _database
+    with _database_lock:
+        db = _open(path)
+        if _database is not None:
+            _database.close()
+        _database = db
+    return db
+
+def get_database():
+    """Return the shared Database, opening the default one on first use."""
+    global _database
+    if _database is None:
+        with _database_lock:  # Threads asking at once must not open two connections
+            if _database is None:
+                _database = _open(DATABASE_NAME)
+    return _database
+
+def close():
+    """Close the shared Database, if one is open; the next database call opens the default one again."""
+    global _database
+    with _database_lock:
+        closing, _database = _database, None
+    if closing is not None:
+        closing.close()
+
+class Writer:
+    """A thread that runs database jobs one at a time, in the order they were submitted.
+
+    The UI hands its inserts to the writer so that neither its own thread
+    nor the test workers wait on disk I/O, and so that runs finishing at
+    the same time are written one after the other.
+    """
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="database-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) and return a concurrent.futures.Future of its result."""
+        future = concurrent.futures.Future()
+        self.jobs.put((future, func, args, kwargs))
+        return future
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            future, func, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as error:  # Handed to whoever waits on the future
+                future.set_exception(error)
+
+    def close(self):
+        """Finish the queued jobs, then stop the thread."""
+        self.jobs.put(None)
+        self.thread.join()
+
+_writer = None
+
+def writer():
+    """Return the shared Writer, starting its thread on first use."""
+    global _writer
+    with _database_lock:
+        if _writer is None:
+            _writer = Writer()
+    return _writer
+
+def close_writer():
+    """Wait for the shared Writer to finish its queued jobs and stop it, if it was started."""
+    global _writer
+    with _database_lock:
+        closing, _writer = _writer, None
+    if closing is not None:
+        closing.close()
+
+def _migrate_test_results(conn):
+    """Schema 1: the original flat test_results table with statistics columns and indexes."""
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS test_results (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             test_type TEXT,
@@ -17,29 +267,509 @@ def create_table():
             timestamp TEXT
         )
     ''')
-    conn.commit()
-    conn.close()
+    # Add the statistics columns to tables created before they existed
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(test_results)')}
+    for column, column_type in STATS_COLUMNS:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE test_results ADD COLUMN {column} {column_type}')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_test_results_timestamp ON test_results (timestamp, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_test_results_type_timestamp ON test_results (test_type, timestamp, id)')
+
+def _migrate_runs(conn):
+    """Schema 2: hosts, runs and named metrics with epoch timestamps, replacing test_results.
+
+    Legacy rows saved together (same test type prefix and timestamp, e.g.
+    CPU:single_core and CPU:all_core) become one run with several metrics.
+    Their host is unknown, so host_id stays NULL.
+    """
+    conn.execute('''
+        CREATE TABLE hosts (
+            id INTEGER PRIMARY KEY,
+            fingerprint TEXT NOT NULL UNIQUE,
+            hostname TEXT,
+            cpu_name TEXT,
+            cpu_cores INTEGER,
+            cpu_threads INTEGER,
+            cpu_freq_mhz REAL,
+            ram_bytes INTEGER,
+            disk_bytes INTEGER,
+            os TEXT,
+            first_seen INTEGER NOT NULL,
+            last_seen INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE runs (
+            id INTEGER PRIMARY KEY,
+            host_id INTEGER REFERENCES hosts (id),
+            test_type TEXT NOT NULL,
+            started_at INTEGER NOT NULL,
+            duration REAL,
+            params TEXT,
+            python_version TEXT,
+            platform TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE metrics (
+            run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+            name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            value REAL,
+            median REAL,
+            p95 REAL,
+            stddev REAL,
+            samples INTEGER,
+            PRIMARY KEY (run_id, name)
+        ) WITHOUT ROWID
+    ''')
+    # Newest-first history overall, per test type and per host and test type
+    conn.execute('CREATE INDEX idx_runs_started ON runs (started_at, id)')
+    conn.execute('CREATE INDEX idx_runs_type_started ON runs (test_type, started_at, id)')
+    conn.execute('CREATE INDEX idx_runs_host_type_started ON runs (host_id, test_type, started_at)')
+
+    runs = {}  # (test type, timestamp) -> [run id, next metric position]
+    legacy = conn.execute('''
+        SELECT test_type, result, timestamp, mean, median, p95, stddev, samples
+        FROM test_results ORDER BY id
+    ''')
+    for test_type, result, timestamp, mean, *stats in legacy.fetchall():
+        base_type, _, name = test_type.partition(':')
+        key = (base_type, timestamp)
+        if key not in runs:
+            started_at = int(datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').timestamp())
+            # Not INSERT_RUN_SQL, which names columns later migrations add
+            run_id = conn.execute('INSERT INTO runs (test_type, started_at) VALUES (?, ?)',
+                                  (base_type, started_at)).lastrowid
+            runs[key] = [run_id, 0]
+        run_id, position = runs[key]
+        runs[key][1] += 1
+        conn.execute(INSERT_METRIC_SQL, (run_id, name or 'score', position,
+                                         result if mean is None else mean, *stats))
+    conn.execute('DROP TABLE test_results')
+
+def _migrate_utilization(conn):
+    """Schema 3: how busy the host was during each run, as hardware.UtilizationSampler summary JSON."""
+    conn.execute('ALTER TABLE runs ADD COLUMN utilization TEXT')
+
+def _migrate_telemetry(conn):
+    """Schema 4: the telemetry sampled during each run, one compressed column per channel, see encode_samples."""
+    conn.execute('''
+        CREATE TABLE telemetry (
+            run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+            channel TEXT NOT NULL,
+            samples INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (run_id, channel)
+        ) WITHOUT ROWID
+    ''')
+
+def _migrate_exports(conn):
+    """Schema 5: the last run each named incremental export has written, see set_export_mark."""
+    conn.execute('''
+        CREATE TABLE exports (
+            name TEXT PRIMARY KEY,
+            last_run_id INTEGER NOT NULL,
+            exported_at INTEGER NOT NULL
+        )
+    ''')
+
+def _migrate_references(conn):
+    """Schema 6: imported reference results to compare against, and their precomputed aggregates.
+
+    Each aggregate covers one test type and metric of a set, either whole
+    (attribute and attribute_value empty) or only the results whose
+    hardware attribute has one value. Its quantiles are encode_samples data.
+    """
+    conn.execute('''
+        CREATE TABLE reference_sets (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            source TEXT,
+            imported_at INTEGER NOT NULL,
+            results INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE reference_results (
+            set_id INTEGER NOT NULL REFERENCES reference_sets (id) ON DELETE CASCADE,
+            test_type TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            value REAL NOT NULL,
+            label TEXT,
+            cpu_name TEXT,
+            cpu_cores INTEGER,
+            cpu_threads INTEGER,
+            ram_gb INTEGER,
+            os TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_reference_results_metric ON reference_results (set_id, test_type, metric, value)')
+    conn.execute('''
+        CREATE TABLE reference_aggregates (
+            set_id INTEGER NOT NULL REFERENCES reference_sets (id) ON DELETE CASCADE,
+            test_type TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            attribute TEXT NOT NULL,
+            attribute_value TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            mean REAL NOT NULL,
+            quantiles BLOB NOT NULL,
+            PRIMARY KEY (set_id, test_type, metric, attribute, attribute_value)
+        ) WITHOUT ROWID
+    ''')
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [_migrate_test_results, _migrate_runs, _migrate_utilization, _migrate_telemetry, _migrate_exports,
+              _migrate_references]
+
+def encode_samples(values):
+    """Pack a channel's samples as zlib-compressed little-endian float32, with None stored as NaN."""
+    packed = array.array('f', [math.nan if value is None else value for value in values])
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return zlib.compress(packed.tobytes())
+
+def decode_samples(data):
+    """Unpack encode_samples data into a list of floats, with NaN read back as None."""
+    packed = array.array('f')
+    packed.frombytes(zlib.decompress(data))
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return [None if math.isnan(value) else value for value in packed]
+
+def create_table(db=None):
+    """Create the tables, or upgrade an existing database to the latest schema."""
+    db = db or get_database()
+    version = db.query('PRAGMA user_version')[0][0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with db.transaction() as conn:
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+
+def get_or_create_host(host, conn=None):
+    """Return the id of the host described by a hardware.get_host_info dict, adding it if new."""
+    if conn is None:
+        with get_database().transaction() as conn:
+            return get_or_create_host(host, conn)
+    now = int(time.time())
+    conn.execute(INSERT_HOST_SQL, (*[host.get(column) for column in HOST_COLUMNS], now, now))
+    conn.execute('UPDATE hosts SET last_seen = ? WHERE fingerprint = ?', (now, host['fingerprint']))
+    return conn.execute('SELECT id FROM hosts WHERE fingerprint = ?', (host['fingerprint'],)).fetchone()[0]
+
+def _metric_row(run_id, name, position, value):
+    """Build the metrics row for a score or a harness.summarize summary dict."""
+    if isinstance(value, dict):
+        return (run_id, name, position, value['mean'], *[value.get(column) for column, _ in STATS_COLUMNS[1:]])
+    return (run_id, name, position, value, None, None, None, None)
+
+def insert_runs(runs):
+    """Insert many runs and their metrics in a single transaction and return their ids.
+
+    Each run is a dict with test_type and metrics (a dict of named scores or
+    harness summaries, the first being the headline), and optionally host (a
+    hardware.get_host_info dict), started_at (epoch seconds, default now),
+    duration (seconds), params (JSON-serializable test arguments),
+    utilization (a hardware.UtilizationSampler summary) and telemetry (its
+    telemetry columns).
+    """
+    run_ids = []
+    with get_database().transaction() as conn:
+        host_ids = {}
+        for run in runs:
+            host = run.get('host')
+            if host is not None and host['fingerprint'] not in host_ids:
+                host_ids[host['fingerprint']] = get_or_create_host(host, conn)
+            params = run.get('params')
+            utilization = run.get('utilization')
+            run_id = conn.execute(INSERT_RUN_SQL, (
+                host_ids[host['fingerprint']] if host is not None else None,
+                run['test_type'],
+                int(run.get('started_at') or time.time()),
+                run.get('duration'),
+                json.dumps(params) if params is not None else None,
+                platform.python_version(),
+                platform.platform(),
+                json.dumps(utilization) if utilization is not None else None,
+            )).lastrowid
+            conn.executemany(INSERT_METRIC_SQL, [_metric_row(run_id, name, position, value)
+                                                 for position, (name, value) in enumerate(run['metrics'].items())])
+            if run.get('telemetry'):
+                conn.executemany(INSERT_TELEMETRY_SQL, [(run_id, channel, len(values), encode_samples(values))
+                                                        for channel, values in run['telemetry'].items()])
+            run_ids.append(run_id)
+    return run_ids
+
+def insert_run(test_type, metrics, host=None, started_at=None, duration=None, params=None, utilization=None,
+               telemetry=None):
+    """Insert one run with its named metrics and return its id, see insert_runs."""
+    return insert_runs([{'test_type': test_type, 'metrics': metrics, 'host': host, 'started_at': started_at,
+                         'duration': duration, 'params': params, 'utilization': utilization,
+                         'telemetry': telemetry}])[0]
 
 def insert_test_result(test_type, result):
-    """Insert a new test result into the database."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    cursor.execute('''
-        INSERT INTO test_results (test_type, result, timestamp)
-        VALUES (?, ?, ?)
-    ''', (test_type, result, timestamp))
-    conn.commit()
-    conn.close()
+    """Insert a new test result into the database.
+
+    result is either a single score or a summary dict from harness.summarize.
+    It is stored as a run with a single metric named score.
+    """
+    insert_test_results([(test_type, result)])
+
+def insert_test_results(results):
+    """Insert many (test_type, result) pairs in one transaction, one single-score run each."""
+    insert_runs([{'test_type': test_type, 'metrics': {'score': result}} for test_type, result in results])
 
 def get_test_results():
-    """Retrieve all test results from the database."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT test_type, result, timestamp FROM test_results ORDER BY timestamp DESC')
-    results = cursor.fetchall()
-    conn.close()
-    return results
-
-# Initialize the database
-create_table()
+    """Retrieve the headline result of every run as (test_type, result, local time string)."""
+    return get_database().query(SELECT_RESULTS_SQL)
+
+def get_test_results_page(limit=100, before=None, test_type=None):
+    """Retrieve up to limit runs, newest first, as (id, test_type, metric, result, started_at).
+
+    metric and result are the run's headline metric and its value, and
+    started_at is in epoch seconds. Pass the (started_at, id) of the last row
+    of a page as before to get the next one. The query seeks straight to
+    that point in the started_at index, so every page costs the same however
+    deep into the history it is.
+    """
+    conditions, params = [], []
+    if test_type is not None:
+        conditions.append('r.test_type = ?')
+        params.append(test_type)
+    if before is not None:
+        conditions.append('(r.started_at, r.id) < (?, ?)')
+        params.extend(before)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return get_database().query(f'''
+        SELECT r.id, r.test_type, m.name, m.value, r.started_at
+        FROM runs r JOIN metrics m ON m.run_id = r.id AND m.position = 0
+        {where}
+        ORDER BY r.started_at DESC, r.id DESC
+        LIMIT ?
+    ''', (*params, limit))
+
+def count_test_results(test_type=None):
+    """Return how many runs are stored, optionally for one test type only."""
+    if test_type is None:
+        return get_database().query('SELECT COUNT(*) FROM runs')[0][0]
+    return get_database().query('SELECT COUNT(*) FROM runs WHERE test_type = ?', (test_type,))[0][0]
+
+def get_result_aggregates(test_type=None, since=None, until=None, period=None, metric=None, host_id=None):
+    """Summarize metrics per test type and metric name, computed inside SQLite.
+
+    since and until (epoch seconds, until exclusive) limit the time window,
+    and test_type, metric and host_id narrow it further. With period set to
+    one of PERIOD_FORMATS the results are also grouped by local hour, day,
+    week or month. Returns a list of dicts with test_type, metric, period
+    (None when not grouping), count, min, max, avg, p50 and p95.
+    """
+    conditions, params = ['1'], []
+    for column, value in (('r.test_type', test_type), ('m.name', metric), ('r.host_id', host_id)):
+        if value is not None:
+            conditions.append(f'{column} = ?')
+            params.append(value)
+    if since is not None:
+        conditions.append('r.started_at >= ?')
+        params.append(since)
+    if until is not None:
+        conditions.append('r.started_at < ?')
+        params.append(until)
+    if period is None:
+        period_sql = 'NULL'
+    elif period in PERIOD_FORMATS:
+        period_sql = f"strftime('{PERIOD_FORMATS[period]}', r.started_at, 'unixepoch', 'localtime')"
+    else:
+        raise ValueError(f"Unknown period {period!r}, expected one of {', '.join(PERIOD_FORMATS)}")
+
+    rows = get_database().query(AGGREGATES_SQL.format(period=period_sql, where=' AND '.join(conditions)), params)
+    keys = ('test_type', 'metric', 'period', 'count', 'min', 'max', 'avg', 'p50', 'p95')
+    return [dict(zip(keys, row)) for row in rows]
+
+def get_run(run_id):
+    """Return a run as a dict with id, host_id, test_type, started_at, utilization and its metrics by name."""
+    row = get_database().query('SELECT id, host_id, test_type, started_at, utilization FROM runs WHERE id = ?', (run_id,))
+    if not row:
+        return None
+    run = dict(zip(('id', 'host_id', 'test_type', 'started_at', 'utilization'), row[0]))
+    run['utilization'] = json.loads(run['utilization']) if run['utilization'] else None
+    metrics = get_database().query('SELECT name, value FROM metrics WHERE run_id = ? ORDER BY position', (run_id,))
+    run['metrics'] = dict(metrics)
+    return run
+
+def get_metric_history(test_type, metric, host_id=None, until_run=None, limit=50):
+    """Return the latest limit values of one metric as (run_id, started_at, value), oldest first.
+
+    Only runs of the same test on the same host count (host_id None means
+    runs with no known host). With until_run, runs after that one are left out.
+    """
+    conditions, params = ['r.test_type = ?', 'r.host_id IS ?', 'm.name = ?'], [test_type, host_id, metric]
+    if until_run is not None:
+        conditions.append('(r.started_at, r.id) <= (SELECT started_at, id FROM runs WHERE id = ?)')
+        params.append(until_run)
+    rows = get_database().query(f'''
+        SELECT r.id, r.started_at, m.value
+        FROM runs r JOIN metrics m ON m.run_id = r.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY r.started_at DESC, r.id DESC
+        LIMIT ?
+    ''', (*params, limit))
+    return rows[::-1]
+
+def get_telemetry(run_id, channels=None):
+    """Return the telemetry of a run as a dict of channel name to samples, empty if none was recorded.
+
+    Pass a list of channel names to decode only those.
+    """
+    sql = 'SELECT channel, data FROM telemetry WHERE run_id = ?'
+    params = [run_id]
+    if channels is not None:
+        sql += f" AND channel IN ({', '.join('?' * len(channels))})"
+        params.extend(channels)
+    return {channel: decode_samples(data) for channel, data in get_database().query(sql, params)}
+
+
+def iter_export_rows(after_run_id=0, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield every run after after_run_id, oldest first, as lists of EXPORT_COLUMNS rows.
+
+    Each list holds the metrics of up to chunk_size runs and comes from its
+    own query, which seeks past the previous chunk by run id. The whole
+    table is never loaded at once and other threads can use the database
+    between chunks. A run without metrics gives one row with the metric
+    columns NULL.
+    """
+    while True:
+        rows = get_database().query(EXPORT_ROWS_SQL, (after_run_id, chunk_size))
+        if not rows:
+            return
+        yield rows
+        after_run_id = rows[-1][0]
+
+def count_runs_after(run_id=0):
+    """Return how many runs have an id above run_id, which is what an incremental export from there writes."""
+    return get_database().query('SELECT COUNT(*) FROM runs WHERE id > ?', (run_id,))[0][0]
+
+def get_export_mark(name):
+    """Return the last run id the incremental export called name has written, or 0 if it never ran."""
+    row = get_database().query('SELECT last_run_id FROM exports WHERE name = ?', (name,))
+    return row[0][0] if row else 0
+
+def set_export_mark(name, run_id):
+    """Record that the incremental export called name has written every run up to run_id."""
+    get_database().execute('''
+        INSERT INTO exports (name, last_run_id, exported_at) VALUES (?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET last_run_id = excluded.last_run_id, exported_at = excluded.exported_at
+    ''', (name, run_id, int(time.time())))
+
+def create_reference_set(name, source=None):
+    """Create an empty, pending reference set to be published as name, and return its id.
+
+    Until publish_reference_set, the set sits under a PENDING_PREFIX name
+    that get_reference_sets leaves out, and a set already called name is
+    untouched. A pending set of the same name left behind by an earlier
+    import that never finished is dropped.
+    """
+    with get_database().transaction() as conn:
+        conn.execute('DELETE FROM reference_sets WHERE name = ?', (PENDING_PREFIX + name,))
+        return conn.execute('INSERT INTO reference_sets (name, source, imported_at) VALUES (?, ?, ?)',
+                            (PENDING_PREFIX + name, source, int(time.time()))).lastrowid
+
+def publish_reference_set(set_id, name):
+    """Make a pending reference set the one called name, replacing the previous set of that name at once."""
+    with get_database().transaction() as conn:
+        conn.execute('DELETE FROM reference_sets WHERE name = ?', (name,))
+        conn.execute('UPDATE reference_sets SET name = ?, imported_at = ? WHERE id = ?',
+                     (name, int(time.time()), set_id))
+
+def delete_reference_set(set_id):
+    """Delete a reference set with its results and aggregates."""
+    with get_database().transaction() as conn:
+        conn.execute('DELETE FROM reference_sets WHERE id = ?', (set_id,))
+
+def insert_reference_results(set_id, rows):
+    """Add rows of (test_type, metric, value, label, *REFERENCE_ATTRIBUTES) to a reference set in one transaction."""
+    with get_database().transaction() as conn:
+        conn.executemany(INSERT_REFERENCE_SQL, [(set_id, *row) for row in rows])
+        conn.execute('UPDATE reference_sets SET results = results + ? WHERE id = ?', (len(rows), set_id))
+
+def get_reference_sets():
+    """Return every published reference set as a dict with id, name, source, imported_at and results, by name."""
+    rows = get_database().query('''
+        SELECT id, name, source, imported_at, results FROM reference_sets
+        WHERE substr(name, 1, ?) != ? ORDER BY name
+    ''', (len(PENDING_PREFIX), PENDING_PREFIX))
+    return [dict(zip(('id', 'name', 'source', 'imported_at', 'results'), row)) for row in rows]
+
+def get_reference_groups(set_id):
+    """Return the (test_type, metric) pairs a reference set has results for."""
+    return get_database().query(
+        'SELECT DISTINCT test_type, metric FROM reference_results WHERE set_id = ? ORDER BY test_type, metric',
+        (set_id,))
+
+def get_reference_values(set_id, test_type, metric):
+    """Return (value, *REFERENCE_ATTRIBUTES) for one metric of a reference set, smallest value first."""
+    return get_database().query(f'''
+        SELECT value, {', '.join(REFERENCE_ATTRIBUTES)} FROM reference_results
+        WHERE set_id = ? AND test_type = ? AND metric = ?
+        ORDER BY value
+    ''', (set_id, test_type, metric))
+
+def replace_reference_aggregates(set_id, rows):
+    """Replace a reference set's aggregates with rows of (test_type, metric, attribute, attribute_value, count, mean, quantiles)."""
+    with get_database().transaction() as conn:
+        conn.execute('DELETE FROM reference_aggregates WHERE set_id = ?', (set_id,))
+        conn.executemany('''
+            INSERT INTO reference_aggregates (set_id, test_type, metric, attribute, attribute_value, count, mean, quantiles)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(set_id, *row) for row in rows])
+
+def get_reference_aggregate(set_id, test_type, metric, attribute='', attribute_value=''):
+    """Return (count, mean, quantiles) of one metric of a reference set, whole or for one attribute value, or None.
+
+    quantiles are decoded, an evenly spaced list from the minimum to the maximum.
+    """
+    row = get_database().query('''
+        SELECT count, mean, quantiles FROM reference_aggregates
+        WHERE set_id = ? AND test_type = ? AND metric = ? AND attribute = ? AND attribute_value = ?
+    ''', (set_id, test_type, metric, attribute, str(attribute_value)))
+    if not row:
+        return None
+    count, mean, quantiles = row[0]
+    return count, mean, decode_samples(quantiles)
+
+def get_reference_attribute_aggregates(set_id, test_type, metric, attribute):
+    """Return (attribute_value, count, mean, quantiles) for every value of an attribute in a reference set."""
+    rows = get_database().query('''
+        SELECT attribute_value, count, mean, quantiles FROM reference_aggregates
+        WHERE set_id = ? AND test_type = ? AND metric = ? AND attribute = ?
+    ''', (set_id, test_type, metric, attribute))
+    return [(value, count, mean, decode_samples(quantiles)) for value, count, mean, quantiles in rows]
+
+def count_reference_results(set_id, test_type, metric, value, filters):
+    """Return (matching results, those below value) for a metric of a reference set, filtered by attribute values.
+
+    filters maps REFERENCE_ATTRIBUTES to the values results must have. This
+    scans the matching rows, for filter combinations no aggregate covers.
+    """
+    conditions, params = ['set_id = ?', 'test_type = ?', 'metric = ?'], [set_id, test_type, metric]
+    for attribute, attribute_value in filters.items():
+        if attribute not in REFERENCE_ATTRIBUTES:
+            raise ValueError(f"Unknown attribute {attribute!r}, expected one of {', '.join(REFERENCE_ATTRIBUTES)}")
+        conditions.append(f'{attribute} = ?')
+        params.append(attribute_value)
+    row = get_database().query(f'''
+        SELECT COUNT(*), COALESCE(SUM(value < ?), 0) FROM reference_results WHERE {' AND '.join(conditions)}
+    ''', (value, *params))
+    return row[0]
+
+def get_host_metric_means():
+    """Return, per known host, test type and metric, the mean of its stored runs.
+
+    Rows are (hostname, cpu_name, cpu_cores, cpu_threads, ram_bytes, os,
+    test_type, metric, mean). Runs with no known host are left out.
+    """
+    return get_database().query('''
+        SELECT h.hostname, h.cpu_name, h.cpu_cores, h.cpu_threads, h.ram_bytes, h.os, r.test_type, m.name, AVG(m.value)
+        FROM runs r JOIN hosts h ON h.id = r.host_id JOIN metrics m ON m.run_id = r.id
+        WHERE m.value IS NOT NULL
+        GROUP BY h.id, r.test_type, m.name
+    ''')
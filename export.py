@@ -0,0 +1,177 @@
+# export.py
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+import database
+
+FORMATS = ("csv", "jsonl", "parquet")
+COMPRESSIONS = ("gzip", "zstd")
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}  # File name endings that pick a compression
+
+# Arrow types of the database.EXPORT_COLUMNS, by name so pyarrow is imported only for Parquet exports
+PARQUET_TYPES = {
+    "run_id": "int64",
+    "test_type": "string",
+    "started_at": "int64",
+    "duration": "double",
+    "fingerprint": "string",
+    "hostname": "string",
+    "params": "string",
+    "python_version": "string",
+    "platform": "string",
+    "metric": "string",
+    "position": "int32",
+    "value": "double",
+    "median": "double",
+    "p95": "double",
+    "stddev": "double",
+    "samples": "int64",
+}
+
+class ExportCancelled(Exception):
+    """Raised inside export_runs when its cancel event is set."""
+
+def guess_format(path):
+    """Return the (format, compression) a file name such as results.csv.gz asks for, None where it does not tell."""
+    root, extension = os.path.splitext(path)
+    compression = COMPRESSION_SUFFIXES.get(extension.lower())
+    if compression is not None:
+        root, extension = os.path.splitext(root)
+    file_format = extension.lower().lstrip(".")
+    return (file_format if file_format in FORMATS else None), compression
+
+def _open_text(path, compression):
+    """Open path for writing UTF-8 text, through a gzip or zstd compressor if asked for."""
+    if compression is None:
+        return open(path, "w", newline="", encoding="utf-8")
+    if compression == "gzip":
+        return gzip.open(path, "wt", newline="", encoding="utf-8")
+    try:
+        import zstandard  # Optional, only zstd exports need it
+    except ImportError:
+        raise ValueError("zstd compression needs the zstandard package") from None
+    writer = zstandard.ZstdCompressor().stream_writer(open(path, "wb"))  # Closing it closes the file
+    return io.TextIOWrapper(writer, newline="", encoding="utf-8")
+
+def _write_csv(path, chunks, compression):
+    """Write a header line, then every row as CSV, with NULL as an empty field."""
+    with _open_text(path, compression) as file:
+        writer = csv.writer(file)
+        writer.writerow(database.EXPORT_COLUMNS)
+        for rows in chunks:
+            writer.writerows(rows)
+
+def _write_jsonl(path, chunks, compression):
+    """Write every row as one JSON object per line, with params decoded into an object."""
+    with _open_text(path, compression) as file:
+        for rows in chunks:
+            for row in rows:
+                record = dict(zip(database.EXPORT_COLUMNS, row))
+                record["params"] = json.loads(record["params"]) if record["params"] else None
+                file.write(json.dumps(record) + "\n")
+
+def _write_parquet(path, chunks, compression):
+    """Write every chunk as one Parquet row group, compressed inside the file with the given codec."""
+    try:
+        import pyarrow  # Optional, only Parquet exports need it
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet export needs the pyarrow package") from None
+    schema = pyarrow.schema([(name, pyarrow.type_for_alias(PARQUET_TYPES[name]))
+                             for name in database.EXPORT_COLUMNS])
+    with pyarrow.parquet.ParquetWriter(path, schema, compression=compression or "none") as writer:
+        for rows in chunks:
+            columns = [pyarrow.array(column, type=field.type) for column, field in zip(zip(*rows), schema)]
+            writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet}
+
+def export_runs(path, file_format=None, compression=None, since_last=None, chunk_size=database.EXPORT_CHUNK_SIZE,
+                progress=None, cancel=None):
+    """Stream stored runs to a CSV, JSON Lines or Parquet file, one row per metric.
+
+    Rows are read from the database in chunks of chunk_size runs and written
+    as they arrive, so memory use does not grow with the history. The format
+    and compression (gzip or zstd) default to what the file name asks for,
+    e.g. results.jsonl.gz. With since_last set to an export name, only runs
+    added since the previous export of that name are written, and the
+    export's mark moves on once the file is complete. The file is written
+    under a temporary name and renamed at the end, so a failed or cancelled
+    export (cancel being a threading.Event) leaves no partial file behind.
+    progress(fraction, rows per second) is called after every chunk.
+
+    Returns a dict with path, format, compression, runs, rows and
+    last_run_id.
+    """
+    guessed_format, guessed_compression = guess_format(path)
+    file_format = file_format or guessed_format or "csv"
+    compression = compression or guessed_compression
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown format {file_format!r}, expected one of {', '.join(FORMATS)}")
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression {compression!r}, expected one of {', '.join(COMPRESSIONS)}")
+
+    after_run_id = database.get_export_mark(since_last) if since_last else 0
+    total_runs = database.count_runs_after(after_run_id)
+    summary = {"path": path, "format": file_format, "compression": compression,
+               "runs": 0, "rows": 0, "last_run_id": after_run_id}
+    start_time = time.perf_counter()
+
+    def chunks():
+        for rows in database.iter_export_rows(after_run_id, chunk_size):
+            if cancel is not None and cancel.is_set():
+                raise ExportCancelled()
+            yield rows
+            summary["runs"] += len({row[0] for row in rows})
+            summary["rows"] += len(rows)
+            summary["last_run_id"] = rows[-1][0]
+            if progress is not None:
+                # Runs stored while the export goes on are written too, so total_runs may be passed, or even 0
+                progress(min(summary["runs"] / max(total_runs, 1), 1.0),
+                         summary["rows"] / (time.perf_counter() - start_time))
+
+    partial_path = path + ".part"
+    try:
+        WRITERS[file_format](partial_path, chunks(), compression)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+        raise
+    if since_last:
+        database.set_export_mark(since_last, summary["last_run_id"])
+    return summary
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m export",
+        description="Export the stored benchmark history, one row per metric of every run.",
+    )
+    parser.add_argument("output", help="file to write, e.g. results.csv.gz, results.jsonl.zst or results.parquet")
+    parser.add_argument("--format", choices=FORMATS, help="file format (default: from the file name, else csv)")
+    parser.add_argument("--compression", choices=COMPRESSIONS,
+                        help="compression (default: from the file name; Parquet compresses inside the file)")
+    parser.add_argument("--since-last", metavar="NAME",
+                        help="only export runs added since the last export with this name, then remember this one")
+    parser.add_argument("--chunk-size", type=int, default=database.EXPORT_CHUNK_SIZE,
+                        help=f"runs read from the database at a time (default: {database.EXPORT_CHUNK_SIZE})")
+    parser.add_argument("--database", help="database file to export (default: the app's)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    database.init(args.database or database.DATABASE_NAME)
+    try:
+        summary = export_runs(args.output, args.format, args.compression, args.since_last, args.chunk_size)
+    except ValueError as error:
+        sys.exit(str(error))
+    print(f"Exported {summary['runs']} runs ({summary['rows']} rows) to {summary['path']}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
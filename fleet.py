@@ -0,0 +1,350 @@
+# fleet.py
+
+import argparse
+import hmac
+import ipaddress
+import json
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cli
+import database
+import hardware
+import harness
+import registry
+import regression
+import suite
+
+DEFAULT_PORT = 8765
+TOKEN_HEADER = "X-Benchmark-Token"
+RUN_TIMEOUT = 3600  # Seconds the coordinator waits for one agent to finish a test
+SLOWEST_NODES = 5  # Nodes listed as slowest per test in the fleet report
+MEASURE_OPTIONS = ("warmup", "min_runs", "max_runs", "time_budget", "target_ci")  # harness.measure options agents take
+
+# JSON types a test parameter may be given as, by the type of its default; a None default takes anything
+PARAM_TYPES = {bool: (bool,), int: (int,), float: (int, float), str: (str,), tuple: (list, tuple)}
+
+# Agent side
+
+def parse_run_request(request):
+    """Check a decoded POST /run body and return its (test type, params, measure options).
+
+    params must name parameters of the test from registry.params, each of
+    the same type as its default, and measure may only hold numeric
+    MEASURE_OPTIONS. Raises ValueError otherwise.
+    """
+    if not isinstance(request, dict):
+        raise ValueError("expected a JSON object")
+    test_type = str(request.get("test")).upper()
+    if test_type not in cli.TESTS:
+        raise ValueError(f"unknown test {request.get('test')!r}")
+    params = request.get("params") or {}
+    measure_options = request.get("measure") or {}
+    if not isinstance(params, dict) or not isinstance(measure_options, dict):
+        raise ValueError("params and measure must be JSON objects")
+    defaults = registry.params(test_type)
+    for name, value in params.items():
+        if name not in defaults:
+            raise ValueError(f"{test_type} has no parameter {name!r}")
+        default = defaults[name]
+        if default is not None and (not isinstance(value, PARAM_TYPES.get(type(default), (type(default),)))
+                                    or isinstance(value, bool) and not isinstance(default, bool)):
+            raise ValueError(f"{test_type} parameter {name!r} must be like {default!r}, not {value!r}")
+    for name, value in measure_options.items():
+        if name not in MEASURE_OPTIONS or isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"bad measure option {name}={value!r}")
+    return test_type, params, measure_options
+
+class AgentHandler(BaseHTTPRequestHandler):
+    """HTTP API of an agent: GET /info for its host details, POST /run to run one test.
+
+    POST /run takes {"test": TEST, "params": {...}, "measure": {...}} and
+    answers once the test is done with the host, the test, its params,
+    started_at, duration, the harness results and the host's utilization
+    and telemetry. Only tests in cli.TESTS, with parameters their
+    signatures declare, can be run (see parse_run_request), one at a time,
+    so concurrent requests do not skew each other.
+    """
+    server_version = "BenchmarkAgent/1"
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorized(self):
+        # Compared in constant time, so response timing does not leak how much of a guess was right
+        if self.server.token is not None and not hmac.compare_digest(
+                self.headers.get(TOKEN_HEADER, "").encode(), self.server.token.encode()):
+            self.send_json(403, {"error": "bad or missing token"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        if self.path == "/info":
+            self.send_json(200, self.server.host_info)
+        else:
+            self.send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+        if self.path != "/run":
+            self.send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            test_type, params, measure_options = parse_run_request(request)
+        except (ValueError, KeyError, AttributeError, TypeError) as error:
+            self.send_json(400, {"error": f"bad run request: {error}"})
+            return
+
+        with self.server.run_lock:
+            try:
+                with hardware.UtilizationSampler() as sampler:
+                    # The same path as local runs, so calibrated tests share their duration out across the runs
+                    entry = suite.measure_test(test_type, params, measure_options, None, None, None)
+            except Exception as error:  # Report any test failure to the coordinator instead of dropping the connection
+                self.send_json(500, {"error": f"{test_type} failed: {error!r}"})
+                return
+        self.send_json(200, {
+            "host": self.server.host_info,
+            "test": test_type,
+            "params": entry["params"],
+            "started_at": entry["started_at"],
+            "duration": entry["duration"],
+            "results": entry["results"],
+            "utilization": sampler.summary(),
+            "telemetry": sampler.telemetry(),
+        })
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[agent {self.server.host_info['hostname']}] {format % args}\n")
+
+def agent_host_info(name=None):
+    """Return this machine's host info, under name if given so several agents on one machine stay distinct."""
+    info = hardware.get_host_info()
+    if name:
+        info["hostname"] = name
+        info["fingerprint"] = hardware.host_fingerprint(info)
+    return info
+
+def is_loopback(host):
+    """Return whether an agent listening on host can only be reached from this machine."""
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+def make_agent(host="127.0.0.1", port=DEFAULT_PORT, name=None, token=None):
+    """Create an agent's HTTP server, without starting it.
+
+    An agent reachable from other machines runs whatever tests its callers
+    ask for, so listening on anything but a loopback address needs a token.
+    """
+    if token is None and not is_loopback(host):
+        raise ValueError(f"an agent listening on {host or 'all addresses'} needs a --token")
+    server = ThreadingHTTPServer((host, port), AgentHandler)
+    server.host_info = agent_host_info(name)
+    server.token = token
+    server.run_lock = threading.Lock()
+    return server
+
+def serve_agent(host="127.0.0.1", port=DEFAULT_PORT, name=None, token=None):
+    """Run an agent until interrupted."""
+    server = make_agent(host, port, name, token)
+    print(f"Agent {server.host_info['hostname']} listening on {host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+# Coordinator side
+
+def _request(agent, path, payload=None, token=None, timeout=RUN_TIMEOUT):
+    """Send a GET (or a POST with a JSON payload) to an agent at host:port and return the decoded reply."""
+    request = urllib.request.Request(
+        f"http://{agent}{path}",
+        data=None if payload is None else json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json", **({TOKEN_HEADER: token} if token else {})},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        raise RuntimeError(json.loads(error.read() or b"{}").get("error", str(error))) from None
+
+def run_on_agent(agent, test_types, params, measure_options, token=None):
+    """Run each test on one agent in turn; return its replies and any errors as (test, message)."""
+    replies, errors = [], []
+    for test_type in test_types:
+        try:
+            replies.append(_request(agent, "/run", {
+                "test": test_type,
+                "params": params.get(test_type, {}),
+                "measure": measure_options,
+            }, token))
+        except (OSError, RuntimeError, ValueError) as error:
+            errors.append((test_type, str(error)))
+    return replies, errors
+
+def run_fleet(agents, test_types, params=None, measure_options=None, token=None, store=True):
+    """Run the tests on every agent at once and collect their results.
+
+    Each agent runs the tests one after the other, while all agents run in
+    parallel. With store=True every result is saved as a run of the
+    agent's host in the database. Returns (replies, errors), errors being a
+    list of dicts with agent, test and error.
+    """
+    params = params or {}
+    measure_options = measure_options or {}
+    replies, errors = [], []
+    with ThreadPoolExecutor(len(agents)) as executor:
+        futures = {agent: executor.submit(run_on_agent, agent, test_types, params, measure_options, token)
+                   for agent in agents}
+        for agent, future in futures.items():
+            agent_replies, agent_errors = future.result()
+            for reply in agent_replies:
+                reply["agent"] = agent
+            replies.extend(agent_replies)
+            errors.extend({"agent": agent, "test": test, "error": error} for test, error in agent_errors)
+
+    if store and replies:
+        database.insert_runs([{
+            "test_type": reply["test"],
+            "metrics": reply["results"],
+            "host": reply["host"],
+            "started_at": reply["started_at"],
+            "duration": reply["duration"],
+            "params": reply["params"],
+            "utilization": reply.get("utilization"),
+            "telemetry": reply.get("telemetry"),
+        } for reply in replies])
+    return replies, errors
+
+def fleet_report(replies, slowest=SLOWEST_NODES):
+    """Summarize how each test's headline score is spread across the fleet.
+
+    Returns a dict per test with the metric, the number of nodes, the min,
+    p50, p95, max, mean and stddev of the per-node means, and the slowest
+    nodes (lowest scores, or highest for lower-is-better metrics) with their
+    score and how far below the fleet median they are.
+    """
+    report = {}
+    for test_type in dict.fromkeys(reply["test"] for reply in replies):
+        test_replies = [reply for reply in replies if reply["test"] == test_type]
+        metric = next(iter(test_replies[0]["results"]))
+        nodes = [(reply["host"]["hostname"], reply["results"][metric]["mean"])
+                 for reply in test_replies if metric in reply["results"]]
+        values = [value for _, value in nodes]
+        median = statistics.median(values)
+        better_high = regression.higher_is_better(metric)
+        ranked = sorted(nodes, key=lambda node: node[1], reverse=not better_high)
+        report[test_type] = {
+            "metric": metric,
+            "nodes": len(values),
+            "min": min(values),
+            "p50": median,
+            "p95": harness.percentile(values, 0.95),
+            "max": max(values),
+            "mean": statistics.fmean(values),
+            "stddev": statistics.stdev(values) if len(values) > 1 else 0.0,
+            "slowest": [{
+                "host": host,
+                "value": value,
+                "vs_median": ((median - value) if better_high else (value - median)) / median if median else 0.0,
+            } for host, value in ranked[:slowest]],
+        }
+    return report
+
+def spawn_local_agents(count, base_port=DEFAULT_PORT, token=None, startup_timeout=30):
+    """Start count agent processes on localhost for trying the fleet mode on one machine.
+
+    Returns (processes, agent addresses) once every agent answers /info.
+    """
+    processes, agents = [], []
+    for index in range(count):
+        port = base_port + index
+        command = [sys.executable, "-m", "fleet", "agent", "--port", str(port), "--name", f"local-{index + 1}"]
+        if token:
+            command += ["--token", token]
+        processes.append(subprocess.Popen(command))
+        agents.append(f"127.0.0.1:{port}")
+
+    deadline = time.time() + startup_timeout
+    for agent in agents:
+        while True:
+            try:
+                _request(agent, "/info", token=token, timeout=1)
+                break
+            except (OSError, RuntimeError):
+                if time.time() > deadline:
+                    for process in processes:
+                        process.terminate()
+                    raise RuntimeError(f"agent {agent} did not start")
+                time.sleep(0.2)
+    return processes, agents
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m fleet", description="Run benchmarks across many machines.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    agent = commands.add_parser("agent", help="serve test runs to a coordinator")
+    agent.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    agent.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    agent.add_argument("--name", help="name to report instead of the hostname")
+    agent.add_argument("--token", help="shared secret the coordinator must send, "
+                                       "required unless listening on a loopback address")
+
+    run = commands.add_parser("run", help="run tests on agents and report the spread across the fleet")
+    cli.add_test_arguments(run)
+    run.add_argument("-a", "--agent", action="append", default=[], metavar="HOST:PORT",
+                     help="agent to run on, may be repeated")
+    run.add_argument("--local-agents", type=int, default=0, metavar="N",
+                     help="also start N agents on this machine")
+    run.add_argument("--token", help="shared secret to send to the agents")
+    run.add_argument("--database", help="database file to store results in (default: the app's)")
+    run.add_argument("--no-store", action="store_true", help="do not store results in the database")
+    run.add_argument("--indent", type=int, default=2, help="JSON indentation, 0 for one line")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "agent":
+        try:
+            serve_agent(args.host, args.port, args.name, args.token)
+        except ValueError as error:
+            sys.exit(str(error))
+        return
+
+    test_types, params, measure_options = cli.parse_test_arguments(args)
+    processes, agents = [], list(args.agent)
+    if args.local_agents:
+        processes, local_agents = spawn_local_agents(args.local_agents, token=args.token)
+        agents += local_agents
+    if not agents:
+        sys.exit("no agents given, use --agent HOST:PORT or --local-agents N")
+    if not args.no_store:
+        database.init(args.database or database.DATABASE_NAME)
+    try:
+        replies, errors = run_fleet(agents, test_types, params, measure_options, args.token, store=not args.no_store)
+    finally:
+        for process in processes:
+            process.terminate()
+    print(json.dumps({"report": fleet_report(replies), "errors": errors, "runs": replies}, indent=args.indent or None))
+
+if __name__ == "__main__":
+    main()
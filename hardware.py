@@ -0,0 +1,396 @@
+# hardware.py
+
+import functools
+import glob
+import hashlib
+import json
+import os
+import platform
+import re
+import shutil
+import socket
+import subprocess
+import threading
+import time
+import psutil
+try:
+    import resource
+except ImportError:
+    resource = None  # Not available on Windows, see _process_faults
+
+INVENTORY_TTL = 300.0  # Seconds a hardware probe's answer is served from the cache before it is refreshed
+SAMPLE_INTERVAL = 0.1  # Seconds between telemetry samples while a test runs
+MAX_SAMPLE_INTERVAL = 2.0  # Longest interval the sampler backs off to when over its overhead budget
+OVERHEAD_BUDGET = 0.01  # Fraction of one core the sampler may use
+SKIPPED_BLOCK_DEVICES = ("loop", "ram", "zram", "dm-", "md", "sr")  # Virtual devices left out of the inventory
+
+def cached(ttl=INVENTORY_TTL):
+    """Cache a probe's answer for ttl seconds.
+
+    The first call waits for the probe. After that, an answer older than ttl
+    is still returned at once while a background thread probes again, so no
+    caller blocks on psutil or sysfs twice. The wrapped function gains
+    refresh(), which probes again now, and cache_clear().
+    """
+    def decorator(func):
+        lock = threading.Lock()
+        state = {"value": None, "expires": None, "refreshing": False}
+
+        def refresh():
+            value = func()
+            with lock:
+                state.update(value=value, expires=time.monotonic() + ttl, refreshing=False)
+            return value
+
+        def refresh_quietly():
+            try:
+                refresh()
+            except Exception:  # Keep serving the previous answer
+                with lock:
+                    state["refreshing"] = False
+
+        @functools.wraps(func)
+        def wrapper():
+            with lock:
+                expires, value = state["expires"], state["value"]
+                stale = expires is not None and time.monotonic() >= expires and not state["refreshing"]
+                if stale:
+                    state["refreshing"] = True
+            if expires is None:
+                return refresh()
+            if stale:
+                threading.Thread(target=refresh_quietly, name=f"refresh-{func.__name__}", daemon=True).start()
+            return value
+
+        def cache_clear():
+            with lock:
+                state.update(value=None, expires=None, refreshing=False)
+
+        wrapper.refresh = refresh
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+def _read(path, default=None):
+    """Return the stripped contents of a small sysfs or procfs file, or default if it cannot be read."""
+    try:
+        with open(path) as file:
+            return file.read().strip()
+    except OSError:
+        return default
+
+def _parse_size(text):
+    """Parse a sysfs cache size such as 48K or 2M into bytes."""
+    match = re.fullmatch(r"(\d+)\s*([KMG]?)", text or "")
+    if not match:
+        return None
+    return int(match.group(1)) * 1024 ** " KMG".index(match.group(2) or " ")
+
+def _cpu_model():
+    """Return the CPU model name, from /proc/cpuinfo where platform.processor() gives none."""
+    for line in (_read("/proc/cpuinfo") or "").splitlines():
+        if line.startswith("model name"):
+            return line.partition(":")[2].strip()
+    return platform.processor() or "Unknown CPU"
+
+def _cpu_caches():
+    """Return cpu0's caches as dicts with level, type, size_bytes and shared_with (logical CPUs)."""
+    caches = []
+    for index in sorted(glob.glob("/sys/devices/system/cpu/cpu0/cache/index*")):
+        caches.append({
+            "level": int(_read(os.path.join(index, "level"), 0)),
+            "type": _read(os.path.join(index, "type")),
+            "size_bytes": _parse_size(_read(os.path.join(index, "size"))),
+            "shared_with": _read(os.path.join(index, "shared_cpu_list")),
+        })
+    return caches
+
+@cached()
+def get_cpu_inventory():
+    """Return the CPU's model, core and thread counts, frequencies in MHz and caches.
+
+    per_core_mhz lists the current frequency of each logical CPU. Frequencies
+    and caches psutil or sysfs do not expose are None or empty.
+    """
+    try:
+        frequency = psutil.cpu_freq()
+        per_core = psutil.cpu_freq(percpu=True) or []
+    except (OSError, NotImplementedError):  # Some platforms and VMs expose no frequency at all
+        frequency, per_core = None, []
+    return {
+        "model": _cpu_model(),
+        "cores": psutil.cpu_count(logical=False),
+        "threads": psutil.cpu_count(logical=True),
+        "max_mhz": frequency.max or None if frequency else None,
+        "min_mhz": frequency.min or None if frequency else None,
+        "current_mhz": frequency.current or None if frequency else None,
+        "per_core_mhz": [core.current for core in per_core],
+        "caches": _cpu_caches(),
+    }
+
+def last_level_cache_bytes():
+    """Return the size of the largest data or unified cache from get_cpu_inventory, None if none is reported."""
+    sizes = [cache["size_bytes"] for cache in get_cpu_inventory()["caches"]
+             if cache["type"] in ("Data", "Unified") and cache["size_bytes"]]
+    return max(sizes, default=None)
+
+@cached()
+def get_numa_nodes():
+    """Return the NUMA nodes as dicts with node, cpus (a CPU list such as 0-7) and memory_bytes."""
+    nodes = []
+    for path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*"), key=lambda path: int(path.rsplit("node", 1)[1])):
+        memory = re.search(r"MemTotal:\s+(\d+) kB", _read(os.path.join(path, "meminfo"), ""))
+        nodes.append({
+            "node": int(path.rsplit("node", 1)[1]),
+            "cpus": _read(os.path.join(path, "cpulist")),
+            "memory_bytes": int(memory.group(1)) * 1024 if memory else None,
+        })
+    return nodes
+
+def _memory_modules():
+    """Return the memory type and speed from dmidecode, which needs root; (None, None) without it."""
+    if shutil.which("dmidecode") is None:
+        return None, None
+    try:
+        output = subprocess.run(["dmidecode", "--type", "17"], capture_output=True, text=True, timeout=5).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None, None
+    types = re.findall(r"^\s*Type:\s*(\S+)", output, re.MULTILINE)
+    speeds = re.findall(r"^\s*Speed:\s*(\d+)", output, re.MULTILINE)
+    types = [memory_type for memory_type in types if memory_type not in ("Unknown", "Other")]
+    return (types[0] if types else None), (int(speeds[0]) if speeds else None)
+
+@cached()
+def get_memory_inventory():
+    """Return the total and swap memory in bytes, and the module type (e.g. DDR4) and speed in MT/s when known."""
+    memory_type, speed = _memory_modules()
+    return {
+        "total_bytes": psutil.virtual_memory().total,
+        "swap_bytes": psutil.swap_memory().total,
+        "type": memory_type,
+        "speed_mts": speed,
+    }
+
+@cached()
+def get_block_devices():
+    """Return the physical block devices with name, model, size_bytes, rotational and the active I/O scheduler."""
+    devices = []
+    for path in sorted(glob.glob("/sys/block/*")):
+        name = os.path.basename(path)
+        if name.startswith(SKIPPED_BLOCK_DEVICES):
+            continue
+        scheduler = re.search(r"\[(\S+)\]", _read(os.path.join(path, "queue", "scheduler"), ""))
+        sectors = _read(os.path.join(path, "size"))
+        rotational = _read(os.path.join(path, "queue", "rotational"))
+        devices.append({
+            "name": name,
+            "model": _read(os.path.join(path, "device", "model")),
+            "size_bytes": int(sectors) * 512 if sectors else None,  # sysfs counts 512-byte sectors
+            "rotational": rotational == "1" if rotational is not None else None,
+            "scheduler": scheduler.group(1) if scheduler else None,
+        })
+    return devices
+
+def get_inventory():
+    """Return the whole hardware inventory: cpu, numa_nodes, memory and block_devices."""
+    return {
+        "cpu": get_cpu_inventory(),
+        "numa_nodes": get_numa_nodes(),
+        "memory": get_memory_inventory(),
+        "block_devices": get_block_devices(),
+    }
+
+def get_cpu_info():
+    """Retrieve CPU information."""
+    cpu = get_cpu_inventory()
+    frequency = cpu["max_mhz"] or cpu["current_mhz"]
+    frequency = f"{frequency / 1000:.2f} GHz" if frequency else "Unknown frequency"
+    return f"CPU Name: {cpu['model']}", f"CPU Characteristics: {cpu['cores']} Cores, {cpu['threads']} Threads, {frequency}"
+
+def get_ram_info():
+    """Retrieve RAM information."""
+    memory = get_memory_inventory()
+    total_memory = memory["total_bytes"] / (1024 ** 3)  # Convert to GB
+    return f"RAM Name: {memory['type'] or 'Physical Memory'}", f"RAM Characteristics: {total_memory:.2f} GB"
+
+@cached()
+def _system_disk_bytes():
+    return psutil.disk_usage('/').total
+
+def get_disk_info():
+    """Retrieve Disk information."""
+    total_disk = _system_disk_bytes() / (1024 ** 3)  # Convert to GB
+    models = [device["model"] for device in get_block_devices() if device["model"]]
+    return f"Disk Name: {models[0] if models else 'System Disk'}", f"Disk Characteristics: {total_disk:.2f} GB Total"
+
+# Host fields that identify the hardware; the fingerprint is a hash of these
+FINGERPRINT_FIELDS = ["hostname", "cpu_name", "cpu_cores", "cpu_threads", "ram_bytes", "disk_bytes", "os"]
+
+def get_host_info():
+    """Gather the same details as the get_*_info functions as raw values, plus a fingerprint."""
+    return dict(_host_info())  # A copy, callers may adjust it
+
+@cached()
+def _host_info():
+    cpu = get_cpu_inventory()
+    info = {
+        "hostname": socket.gethostname(),
+        "cpu_name": platform.processor() or "Unknown CPU",  # Not the inventory model, which would change existing fingerprints
+        "cpu_cores": cpu["cores"],
+        "cpu_threads": cpu["threads"],
+        "cpu_freq_mhz": cpu["max_mhz"],
+        "ram_bytes": get_memory_inventory()["total_bytes"],
+        "disk_bytes": _system_disk_bytes(),
+        "os": f"{platform.system()} {platform.release()} {platform.machine()}",
+    }
+    info["fingerprint"] = host_fingerprint(info)
+    return info
+
+def host_fingerprint(info):
+    """Return a short stable hash identifying a host from its FINGERPRINT_FIELDS."""
+    identity = json.dumps({field: info.get(field) for field in FINGERPRINT_FIELDS}, sort_keys=True)
+    return hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+def prefetch():
+    """Gather the inventory on a background thread so the first page to need it finds it cached."""
+    def gather():
+        get_inventory()
+        _host_info()
+    thread = threading.Thread(target=gather, name="hardware-prefetch", daemon=True)
+    thread.start()
+    return thread
+
+def _process_faults():
+    """Return the (major, minor) page faults of this process and its finished child processes."""
+    if resource is None:
+        return psutil.Process().memory_info().num_page_faults, 0  # Windows counts all faults as one number
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_majflt + children.ru_majflt, own.ru_minflt + children.ru_minflt
+
+def _disk_counters():
+    try:
+        return psutil.disk_io_counters()
+    except (OSError, RuntimeError):  # No disk statistics, e.g. in some containers
+        return None
+
+def _cpu_mhz():
+    try:
+        frequency = psutil.cpu_freq()
+    except (OSError, NotImplementedError):
+        return None
+    return frequency.current if frequency else None
+
+class UtilizationSampler:
+    """Records telemetry on a background thread while a test runs.
+
+    Every interval it samples the mean CPU frequency, the utilization of
+    each core, RAM use, the RSS of this process, and the page faults and
+    disk bytes since the previous sample. Use it as a context manager around
+    the run, then read summary() and telemetry(). The figures cover the
+    whole host, the test's own load included: a CPU test keeps its cores
+    busy, and anything else running shows up on top.
+
+    The sampler times its own work with thread_time. Should it use more than
+    OVERHEAD_BUDGET of a core, it doubles its interval, up to
+    MAX_SAMPLE_INTERVAL.
+    """
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.columns = {}  # Channel name -> samples, see telemetry()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.process = psutil.Process()
+        self.started = self.stopped = None
+        self.disk_start = self.disk_end = None
+        self.previous_faults = self.previous_disk = None
+        self.sampler_cpu = 0.0  # Seconds of CPU time spent sampling
+
+    def _record(self):
+        cores = psutil.cpu_percent(interval=None, percpu=True)
+        faults = _process_faults()
+        disk = _disk_counters()
+        sample = {
+            "t": time.monotonic() - self.started,
+            "cpu_mhz": _cpu_mhz(),
+            "cpu_percent": sum(cores) / len(cores),
+            **{f"core_{index}_percent": value for index, value in enumerate(cores)},
+            "ram_percent": psutil.virtual_memory().percent,
+            "rss_bytes": self.process.memory_info().rss,
+            "major_faults": faults[0] - self.previous_faults[0],
+            "minor_faults": faults[1] - self.previous_faults[1],
+            "disk_read_bytes": disk.read_bytes - self.previous_disk.read_bytes if disk and self.previous_disk else None,
+            "disk_write_bytes": disk.write_bytes - self.previous_disk.write_bytes if disk and self.previous_disk else None,
+        }
+        self.previous_faults, self.previous_disk = faults, disk
+        for channel, value in sample.items():
+            self.columns.setdefault(channel, []).append(value)
+
+    def _sample(self):
+        while not self.stop_event.wait(self.interval):
+            cpu_before = time.thread_time()
+            self._record()
+            self.sampler_cpu += time.thread_time() - cpu_before
+            if self.sampler_cpu / (time.monotonic() - self.started) > OVERHEAD_BUDGET:
+                self.interval = min(self.interval * 2, MAX_SAMPLE_INTERVAL)
+
+    def start(self):
+        psutil.cpu_percent(interval=None, percpu=True)  # The first call only sets the starting point
+        self.started = time.monotonic()
+        self.disk_start = self.previous_disk = _disk_counters()
+        self.previous_faults = _process_faults()
+        self.thread = threading.Thread(target=self._sample, name="utilization-sampler", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        if not self.columns:  # Shorter than one interval, take a single sample over the whole run
+            self._record()
+        self.stopped = time.monotonic()
+        self.disk_end = _disk_counters()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def telemetry(self):
+        """Return the samples as a dict of channel name to list, one entry per sample.
+
+        The channels are t (seconds since the start), cpu_mhz, cpu_percent
+        (the mean over cores), core_<n>_percent, ram_percent, rss_bytes, and
+        the major_faults, minor_faults, disk_read_bytes and disk_write_bytes
+        since the previous sample. Unavailable values are None.
+        """
+        return self.columns
+
+    def summary(self):
+        """Summarize the run's telemetry.
+
+        Gives the mean and max CPU and RAM use in percent, disk throughput in
+        MB/s, the lowest CPU frequency, peak RSS, major faults, the sample
+        count and the sampler's own overhead as a fraction of a core.
+        """
+        elapsed = max(self.stopped - self.started, 1e-9)
+        cpu, ram = self.columns["cpu_percent"], self.columns["ram_percent"]
+        frequencies = [value for value in self.columns["cpu_mhz"] if value]
+        summary = {
+            "cpu_percent_mean": sum(cpu) / len(cpu),
+            "cpu_percent_max": max(cpu),
+            "ram_percent_mean": sum(ram) / len(ram),
+            "ram_percent_max": max(ram),
+            "disk_read_mb_s": None,
+            "disk_write_mb_s": None,
+            "cpu_mhz_min": min(frequencies) if frequencies else None,
+            "rss_max_bytes": max(self.columns["rss_bytes"]),
+            "major_faults": sum(self.columns["major_faults"]),
+            "samples": len(cpu),
+            "sampler_overhead": self.sampler_cpu / elapsed,
+        }
+        if self.disk_start is not None and self.disk_end is not None:
+            summary["disk_read_mb_s"] = (self.disk_end.read_bytes - self.disk_start.read_bytes) / elapsed / 1e6
+            summary["disk_write_mb_s"] = (self.disk_end.write_bytes - self.disk_start.write_bytes) / elapsed / 1e6
+        return summary
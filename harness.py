@@ -0,0 +1,121 @@
+# harness.py
+
+import math
+import statistics
+import time
+
+# Two-sided 95% Student's t critical values by degrees of freedom, 1.96 beyond 30
+T_CRITICAL_95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+]
+
+def percentile(values, fraction):
+    """Return the linearly interpolated value at fraction (0-1) of a list of numbers."""
+    ordered = sorted(values)
+    position = fraction * (len(ordered) - 1)
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def reject_outliers(samples, k=1.5):
+    """Drop samples outside Tukey's fences (k interquartile ranges beyond the quartiles).
+
+    Fewer than four samples are returned unchanged, as quartiles mean
+    nothing for them.
+    """
+    if len(samples) < 4:
+        return list(samples)
+    q1, q3 = percentile(samples, 0.25), percentile(samples, 0.75)
+    spread = k * (q3 - q1)
+    return [sample for sample in samples if q1 - spread <= sample <= q3 + spread]
+
+def ci_half_width(samples):
+    """Return the half-width of the 95% confidence interval of the mean."""
+    if len(samples) < 2:
+        return math.inf
+    degrees = len(samples) - 1
+    t_value = T_CRITICAL_95[degrees - 1] if degrees <= len(T_CRITICAL_95) else 1.96
+    return t_value * statistics.stdev(samples) / math.sqrt(len(samples))
+
+def summarize(samples):
+    """Summarize samples as mean, median, p95, standard deviation and sample count."""
+    return {
+        "mean": statistics.fmean(samples),
+        "median": statistics.median(samples),
+        "p95": percentile(samples, 0.95),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "samples": len(samples),
+    }
+
+def measure(func, warmup=1, min_runs=3, max_runs=20, time_budget=300.0, target_ci=0.02,
+            progress=None):
+    """Run func repeatedly and summarize each score it returns.
+
+    func returns a score or a dict of named scores. After warmup discarded
+    runs it is repeated until the 95% confidence interval of the first
+    score's mean is within target_ci of the mean (after at least min_runs
+    runs), max_runs is reached or time_budget seconds have passed, whichever
+    comes first. At least one measured run always happens. Outliers are
+    rejected per score before summarizing.
+
+    If progress is given, func is called with a progress keyword argument
+    and every (fraction, throughput) it reports is passed on to progress
+    with the fraction rescaled to all warmup and maximum runs.
+
+    Returns a dict mapping each score name ("score" for plain numbers) to
+    its summary, with an extra "rejected" count of dropped outliers.
+    """
+    total_runs = warmup + max_runs
+    completed_runs = 0
+
+    def run():
+        nonlocal completed_runs
+        if progress is None:
+            result = func()
+        else:
+            def run_progress(fraction, throughput):
+                progress(min(1.0, (completed_runs + fraction) / total_runs), throughput)
+            result = func(progress=run_progress)
+        completed_runs += 1
+        return result
+
+    deadline = time.perf_counter_ns() + int(time_budget * 1e9)
+    for _ in range(warmup):
+        run()
+        if time.perf_counter_ns() >= deadline:
+            break
+
+    samples = {}
+    while True:
+        result = run()
+        scores = result if isinstance(result, dict) else {"score": result}
+        for name, value in scores.items():
+            samples.setdefault(name, []).append(value)
+
+        headline = samples[next(iter(samples))]
+        runs = len(headline)
+        if runs >= max_runs or time.perf_counter_ns() >= deadline:
+            break
+        if runs >= min_runs:
+            kept = reject_outliers(headline)
+            mean = statistics.fmean(kept)
+            if mean and ci_half_width(kept) <= target_ci * abs(mean):
+                break
+
+    summaries = {}
+    for name, values in samples.items():
+        kept = reject_outliers(values)
+        summaries[name] = dict(summarize(kept), rejected=len(values) - len(kept))
+    return summaries
+
+def run_duration(target, warmup=1, max_runs=20, time_budget=None):
+    """Return how long each run may last for measure, given the same options, to take at most target seconds.
+
+    A time_budget shorter than target is shared out instead, as measure
+    stops at it anyway.
+    """
+    if time_budget is not None:
+        target = min(target, time_budget)
+    return target / (warmup + max_runs)
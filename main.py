@@ -1,15 +1,50 @@
 # main.py
 
+import time
+STARTED = time.perf_counter()  # Taken before the imports below so that they count towards startup time
+
+import os
 import sys
 from PyQt5 import QtWidgets, QtCore, QtGui
 import database
-import tests_ui
+import registry
+
+STARTUP_BUDGET = 1.0  # Seconds from launch until the main menu is painted, see report_startup
+HISTORY_EXPORT_NAME = "history_dialog"  # Mark of incremental exports from the history dialog, see export.export_runs
+
+# File types the history can be exported as, with the suffix added to names typed without one
+HISTORY_EXPORT_FILTERS = {
+    "CSV, gzip (*.csv.gz)": ".csv.gz",
+    "JSON Lines, gzip (*.jsonl.gz)": ".jsonl.gz",
+    "Parquet (*.parquet)": ".parquet",
+    "CSV (*.csv)": ".csv",
+    "JSON Lines (*.jsonl)": ".jsonl",
+}
+
+# Startup phases as (name, perf_counter when it ended), reported by report_startup
+startup_phases = [("imports", time.perf_counter())]
+
+def mark_startup(phase):
+    """Record that a startup phase has ended."""
+    startup_phases.append((phase, time.perf_counter()))
+
+def report_startup(budget=STARTUP_BUDGET):
+    """Print how long each startup phase took and return whether the total stayed within budget."""
+    start = STARTED
+    for phase, end in startup_phases:
+        print(f"{phase:>10}: {(end - start) * 1000:7.1f} ms", file=sys.stderr)
+        start = end
+    total = startup_phases[-1][1] - STARTED
+    within_budget = total <= budget
+    print(f"{'total':>10}: {total * 1000:7.1f} ms ({'within' if within_budget else 'over'} "
+          f"the {budget * 1000:.0f} ms budget)", file=sys.stderr)
+    return within_budget
 
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Benchmark")
-        self.setFixedSize(700, 400)  # Fixed window size
+        self.setFixedSize(700, 560)  # Fixed window size, tall enough for the live graph
 
         # Set icon and overall style
         self.setWindowIcon(QtGui.QIcon("icons/icon.png"))
@@ -28,19 +63,32 @@ class MainWindow(QtWidgets.QMainWindow):
         self.central_widget = QtWidgets.QStackedWidget()
         self.setCentralWidget(self.central_widget)
 
-        # Load UI pages
-        self.cpu_test_ui = tests_ui.create_test_ui(self, "CPU")
-        self.ram_test_ui = tests_ui.create_test_ui(self, "RAM")
-        self.disk_test_ui = tests_ui.create_test_ui(self, "DISK")
-        self.central_widget.addWidget(self.cpu_test_ui)
-        self.central_widget.addWidget(self.ram_test_ui)
-        self.central_widget.addWidget(self.disk_test_ui)
+        # Test pages by test type, each built the first time it is opened
+        self.test_pages = {}
+        self.suite_page = None
 
         # Add main menu and set as initial page
         self.main_menu = self.create_main_menu()
         self.central_widget.addWidget(self.main_menu)
         self.central_widget.setCurrentWidget(self.main_menu)
 
+    def show_test_page(self, test_type):
+        """Switch to a test's page, building it first if it has not been opened before."""
+        if test_type not in self.test_pages:
+            import tests_ui  # Deferred as it loads the test modules and numpy, which the menu does not need
+            page = tests_ui.create_test_ui(self, test_type)
+            self.test_pages[test_type] = page
+            self.central_widget.addWidget(page)
+        self.central_widget.setCurrentWidget(self.test_pages[test_type])
+
+    def show_suite_page(self):
+        """Switch to the full suite page, building it on first use like the test pages."""
+        if self.suite_page is None:
+            import tests_ui  # Deferred, see show_test_page
+            self.suite_page = tests_ui.create_suite_ui(self)
+            self.central_widget.addWidget(self.suite_page)
+        self.central_widget.setCurrentWidget(self.suite_page)
+
     def create_main_menu(self):
         widget = QtWidgets.QWidget()
         layout = QtWidgets.QVBoxLayout(widget)
@@ -66,14 +114,13 @@ class MainWindow(QtWidgets.QMainWindow):
         grid_layout = QtWidgets.QGridLayout()
         layout.addLayout(grid_layout)
 
-        button_data = [
-            ("CPU", "icons/cpu.png", self.cpu_test_ui),
-            ("RAM", "icons/ram.png", self.ram_test_ui),
-            ("DISK", "icons/disk.png", self.disk_test_ui)
-        ]
+        button_data = [(benchmark["name"], benchmark["icon"] or "icons/start.png",
+                        lambda _, test_type=benchmark["name"]: self.show_test_page(test_type))
+                       for benchmark in registry.pages()]
+        button_data.append(("SUITE", "icons/results.png", lambda _: self.show_suite_page()))
 
         # Create styled buttons with icons
-        for i, (text, icon_path, ui_widget) in enumerate(button_data):
+        for i, (text, icon_path, handler) in enumerate(button_data):
             button = QtWidgets.QPushButton(text)
             button.setFixedSize(180, 180)
             button.setIcon(QtGui.QIcon(icon_path))
@@ -91,7 +138,7 @@ class MainWindow(QtWidgets.QMainWindow):
                     background-color: #E1E1E1;
                 }
             """)
-            button.clicked.connect(lambda _, w=ui_widget: self.central_widget.setCurrentWidget(w))
+            button.clicked.connect(handler)
             row, col = divmod(i, 3)
             grid_layout.addWidget(button, row, col)
 
@@ -100,12 +147,12 @@ class MainWindow(QtWidgets.QMainWindow):
     def show_history_dialog(self):
         dialog = QtWidgets.QDialog(self)
         dialog.setWindowTitle("Test History")
-        dialog.setFixedSize(500, 350)
+        dialog.setFixedSize(500, 420)
         dialog.setStyleSheet("""
             QDialog {
                 background-color: #1E1E1E;
             }
-            QLabel {
+            QLabel, QCheckBox {
                 font-size: 16px;
                 color: #E1E1E1;
             }
@@ -122,18 +169,95 @@ class MainWindow(QtWidgets.QMainWindow):
         """)
 
         layout = QtWidgets.QVBoxLayout(dialog)
-        results = database.get_test_results()
 
-        history_text = "\n".join([f"{test_type} | Result: {result} | Time: {timestamp}"
-                                  for test_type, result, timestamp in results]) if results else "No test history available."
+        # Rows are fetched from the database page by page as the table scrolls
+        import tests_ui  # Deferred, see show_test_page
+        model = tests_ui.HistoryModel()
+        if model.canFetchMore():
+            model.fetchMore()
+        if model.rowCount():
+            history_table = QtWidgets.QTableView()
+            history_table.setModel(model)
+            history_table.verticalHeader().setVisible(False)
+            history_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+            history_table.horizontalHeader().setSectionResizeMode(2, QtWidgets.QHeaderView.ResizeToContents)
+            history_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+            history_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+            history_table.setStyleSheet("""
+                QTableView {
+                    font-size: 14px;
+                    color: #E1E1E1;
+                    background-color: #1E1E1E;
+                    gridline-color: #333333;
+                }
+                QHeaderView::section {
+                    color: #E1E1E1;
+                    background-color: #333333;
+                }
+            """)
+            layout.addWidget(history_table)
+
+            # Telemetry of the selected run, if it was recorded
+            sparklines = tests_ui.TelemetrySparklines("#E1E1E1")
+            sparklines.setVisible(False)
+            layout.addWidget(sparklines)
+
+            def show_telemetry(current, previous):
+                telemetry = database.get_telemetry(model.rows[current.row()][0])
+                sparklines.set_telemetry(telemetry)
+                sparklines.setVisible(bool(telemetry))
+
+            history_table.selectionModel().currentRowChanged.connect(show_telemetry)
+
+            # Bulk export of every run, streamed to the file on a worker thread
+            since_last_check = QtWidgets.QCheckBox("Only runs added since the last export")
+            layout.addWidget(since_last_check)
+            export_status = QtWidgets.QLabel("")
+            layout.addWidget(export_status)
+            export_button = QtWidgets.QPushButton("Export History")
+
+            def export_history():
+                path, selected_filter = QtWidgets.QFileDialog.getSaveFileName(
+                    dialog, "Export History", "", ";;".join(HISTORY_EXPORT_FILTERS))
+                if not path:
+                    return
+                if "." not in os.path.basename(path):
+                    path += HISTORY_EXPORT_FILTERS.get(selected_filter, ".csv.gz")
+                runnable = tests_ui.ExportRunnable(
+                    path, since_last=HISTORY_EXPORT_NAME if since_last_check.isChecked() else None)
 
-        history_label = QtWidgets.QLabel(history_text)
-        history_label.setAlignment(QtCore.Qt.AlignTop)
-        layout.addWidget(history_label)
+                def done(text):
+                    export_status.setText(text)
+                    export_button.setEnabled(True)
+
+                runnable.signals.progress.connect(
+                    lambda fraction, rate: export_status.setText(f"Exporting... {fraction:.0%} ({rate:,.0f} rows/s)"))
+                runnable.signals.finished.connect(lambda summary: done(
+                    f"Exported {summary['runs']} runs to {os.path.basename(summary['path'])}"))
+                runnable.signals.cancelled.connect(lambda: done("Export cancelled"))
+                runnable.signals.failed.connect(lambda error: done(f"Export failed: {error}"))
+                dialog.finished.connect(runnable.cancel)  # Closing the dialog abandons the export
+                export_button.setEnabled(False)
+                export_status.setText("Exporting...")
+                QtCore.QThreadPool.globalInstance().start(runnable)
+
+            export_button.clicked.connect(export_history)
+        else:
+            history_label = QtWidgets.QLabel("No test history available.")
+            history_label.setAlignment(QtCore.Qt.AlignTop)
+            layout.addWidget(history_label)
 
         close_button = QtWidgets.QPushButton("Close")
         close_button.clicked.connect(dialog.close)
-        layout.addWidget(close_button, alignment=QtCore.Qt.AlignCenter)
+        if model.rowCount():
+            button_layout = QtWidgets.QHBoxLayout()
+            button_layout.addStretch()
+            button_layout.addWidget(export_button)
+            button_layout.addWidget(close_button)
+            button_layout.addStretch()
+            layout.addLayout(button_layout)
+        else:
+            layout.addWidget(close_button, alignment=QtCore.Qt.AlignCenter)
 
         dialog.exec_()
 
@@ -177,11 +301,31 @@ class MainWindow(QtWidgets.QMainWindow):
         dialog.exec_()
 
 def main():
+    # --startup-report prints the startup phases, --startup-check also exits with 1 if over budget
+    check_startup = "--startup-check" in sys.argv
+    report = check_startup or "--startup-report" in sys.argv
     app = QtWidgets.QApplication(sys.argv)
+    mark_startup("qt")
+    database.init()
+    mark_startup("database")
     app.setStyle("Fusion")
     window = MainWindow()
+    mark_startup("window")
     window.show()
-    sys.exit(app.exec_())
+
+    def started():
+        mark_startup("shown")
+        within_budget = report_startup() if report else True
+        if check_startup:
+            app.exit(0 if within_budget else 1)
+            return
+        import hardware  # After the first paint, psutil is not needed for the menu
+        hardware.prefetch()
+
+    QtCore.QTimer.singleShot(0, started)  # Runs once the event loop has shown the window
+    exit_code = app.exec_()
+    database.close_writer()  # Results still queued for the database must not be lost on exit
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,90 @@
+# profiling.py
+
+import contextlib
+import cProfile
+import os
+import pstats
+import tracemalloc
+
+HOT_PATHS = 15  # Functions listed per profile, by time spent in their own code
+TOP_ALLOCATIONS = 10  # Allocation sites listed per memory trace
+TRACE_FRAMES = 5  # Stack frames tracemalloc keeps per allocation
+
+def hot_paths(profiler, top=HOT_PATHS):
+    """Return the top functions of a cProfile profile by own time, as dicts with function, calls, own_s and cumulative_s."""
+    stats = pstats.Stats(profiler).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    return [{
+        "function": f"{os.path.basename(filename)}:{line}({name})" if line else name,
+        "calls": calls,
+        "own_s": round(own_time, 6),
+        "cumulative_s": round(cumulative_time, 6),
+    } for (filename, line, name), (_, calls, own_time, cumulative_time, _) in ranked]
+
+@contextlib.contextmanager
+def profile_thread(path=None, top=HOT_PATHS):
+    """Profile the calling thread with cProfile while the block runs.
+
+    Yields a dict that afterwards holds the hot_paths and, if path is given,
+    the path the full profile was dumped to for pstats or snakeviz. Only
+    the calling thread is seen: work in the threads or processes a test
+    starts shows up as time spent waiting for them.
+    """
+    report = {}
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        if path is not None:
+            profiler.dump_stats(path)
+            report["path"] = path
+        report["hot_paths"] = hot_paths(profiler, top)
+
+class MemoryTracer:
+    """Trace Python and NumPy allocations with tracemalloc while used as a context manager.
+
+    peak_bytes is the most memory held at once across all threads of the
+    process. check() takes a snapshot of the allocation sites whenever a
+    new peak has been reached since the last call. Calling it from a
+    test's progress callback makes top_allocations show what was held near
+    the peak rather than the little left at the end; without such calls
+    only the peak is known.
+    """
+    def __init__(self, top=TOP_ALLOCATIONS):
+        self.top = top
+        self.peak_bytes = 0
+        self.top_allocations = []
+        self.started_tracing = False
+
+    def __enter__(self):
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start(TRACE_FRAMES)
+        tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, *exc_info):
+        # No snapshot here, by now most of what made the peak has been freed
+        self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1])
+        if self.started_tracing:
+            tracemalloc.stop()
+        return False
+
+    def check(self):
+        """Record the allocation sites if memory use has reached a new peak."""
+        _, peak = tracemalloc.get_traced_memory()
+        if peak <= self.peak_bytes:
+            return
+        self.peak_bytes = peak
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        self.top_allocations = [{
+            "site": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+            "bytes": stat.size,
+            "blocks": stat.count,
+        } for stat in snapshot.statistics("lineno")[:self.top]]
+
+    def summary(self):
+        """Return peak_bytes and top_allocations as a dict."""
+        return {"peak_bytes": self.peak_bytes, "top_allocations": self.top_allocations}
@@ -0,0 +1,114 @@
+# registry.py
+
+import importlib
+import importlib.metadata
+import inspect
+import sys
+
+ENTRY_POINT_GROUP = "performance_test.benchmarks"  # Entry point group third-party benchmarks register under
+RUNNER_KEYWORDS = ("progress", "cancel")  # Keywords the UI and harness pass, not benchmark parameters
+
+# Benchmarks by test type, in the order pages and CLI list them
+BENCHMARKS = {}
+_plugins_loaded = False
+
+def register(name, run, hardware_info=None, unit="", page=None, button=None, icon=None, params=None):
+    """Register a benchmark under a test type name and return its description.
+
+    run is the test function: it takes its parameters as keywords plus the
+    optional progress and cancel keywords, and returns a dict of named
+    scores, the first being the headline. hardware_info returns the two
+    lines (name, characteristics) shown at the top of its page. Both may be
+    given as "module:attribute" references, imported only when first used.
+    unit is that of the live throughput it reports. A benchmark gets its own
+    page and main menu button with icon, unless page names the test type
+    whose page it is started from, with a button labelled button. params
+    maps parameter names to defaults and is read from run's signature if
+    not given.
+    """
+    name = name.upper()
+    benchmark = {
+        "name": name,
+        "run": run,
+        "hardware_info": hardware_info or (lambda: (name, "No information available")),
+        "unit": unit,
+        "page": page.upper() if page else None,
+        "button": button or f"Start {name} Test",
+        "icon": icon,
+        "params": params,
+    }
+    BENCHMARKS[name] = benchmark
+    return benchmark
+
+def load_plugins(group=ENTRY_POINT_GROUP):
+    """Load third-party benchmarks from entry points, once.
+
+    Each entry point in the group names a function that is called with
+    register and registers one or more benchmarks with it. A plugin that
+    fails to load is reported and skipped.
+    """
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    for entry_point in importlib.metadata.entry_points(group=group):
+        try:
+            entry_point.load()(register)
+        except Exception as error:  # A broken plugin must not keep the built-in benchmarks from running
+            print(f"Could not load benchmark plugin {entry_point.name}: {error!r}", file=sys.stderr)
+
+def benchmarks():
+    """Return every registered benchmark by test type, loading plugins on first use."""
+    load_plugins()
+    return BENCHMARKS
+
+def get(name):
+    """Return the benchmark registered under a test type, or None."""
+    return benchmarks().get(name.upper())
+
+def resolve(reference):
+    """Return the object a "module:attribute" reference names, importing its module; return anything else as is."""
+    if not isinstance(reference, str):
+        return reference
+    module, _, attribute = reference.partition(":")
+    return getattr(importlib.import_module(module), attribute)
+
+def runner(name):
+    """Return the test function of a registered benchmark."""
+    return resolve(get(name)["run"])
+
+def hardware_info(name):
+    """Return the (name, characteristics) lines shown on a benchmark's page."""
+    return resolve(get(name)["hardware_info"])()
+
+def params(name):
+    """Return a benchmark's parameters and their defaults."""
+    benchmark = get(name)
+    if benchmark["params"] is None:
+        benchmark["params"] = {
+            parameter.name: parameter.default
+            for parameter in inspect.signature(runner(name)).parameters.values()
+            if parameter.name not in RUNNER_KEYWORDS and parameter.default is not inspect.Parameter.empty
+        }
+    return benchmark["params"]
+
+def pages():
+    """Return the benchmarks that have a page of their own."""
+    return [benchmark for benchmark in benchmarks().values() if benchmark["page"] is None]
+
+def extras(page):
+    """Return the benchmarks started from another benchmark's page."""
+    return [benchmark for benchmark in benchmarks().values() if benchmark["page"] == page]
+
+# Built-in benchmarks, by reference so that numpy and psutil load only when a test page or run needs them
+register("CPU", "tests:cpu_test", "hardware:get_cpu_info", "M iterations/s", icon="icons/cpu.png")
+register("CPU_MIX", "tests:cpu_mix_test", "hardware:get_cpu_info", "points",
+         page="CPU", button="Start Kernel Mix Test")
+register("RAM", "tests:ram_test", "hardware:get_ram_info", "GB/s", icon="icons/ram.png")
+register("RAM_LATENCY", "tests:ram_latency_test", "hardware:get_ram_info", "ns/access",
+         page="RAM", button="Start Latency Test")
+register("DISK", "tests:disk_test", "hardware:get_disk_info", "MB/s", icon="icons/disk.png")
+register("DISK_MMAP", "tests:disk_mmap_test", "hardware:get_disk_info", "MB/s",
+         page="DISK", button="Start mmap Test")
+register("DISK_STREAMS", "tests:disk_streams_test", "hardware:get_disk_info", "MB/s",
+         page="DISK", button="Start Multi-Stream Test")
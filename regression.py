@@ -0,0 +1,128 @@
+# regression.py
+
+import math
+import statistics
+import database
+
+BASELINE_RUNS = 20  # Previous runs of the same test on the same host to compare against
+RECENT_RUNS = 3  # Newest runs, including the one being checked, that form the recent window
+ALPHA = 0.05  # Significance level of the one-sided Mann-Whitney test
+MIN_EFFECT = 0.05  # Significant changes smaller than this fraction are not reported
+LOWER_IS_BETTER_SUFFIXES = ("_us", "_ns", "_faults")  # Latencies and fault counts, everything else is a higher-is-better score
+
+def higher_is_better(metric):
+    """Return whether a larger value of the named metric means better performance."""
+    return not metric.endswith(LOWER_IS_BETTER_SUFFIXES)
+
+def _ranks(values):
+    """Return the 1-based ranks of values (ties get their average rank) and the tie group sizes."""
+    order = sorted(range(len(values)), key=values.__getitem__)
+    ranks = [0.0] * len(values)
+    ties = []
+    start = 0
+    while start < len(order):
+        end = start
+        while end + 1 < len(order) and values[order[end + 1]] == values[order[start]]:
+            end += 1
+        for position in range(start, end + 1):
+            ranks[order[position]] = (start + end) / 2 + 1
+        ties.append(end - start + 1)
+        start = end + 1
+    return ranks, ties
+
+def mann_whitney_u(a, b):
+    """Return U for a and the one-sided p-value that values in a tend to be smaller than in b.
+
+    Uses the normal approximation with tie and continuity corrections, which
+    is adequate from a handful of values per side.
+    """
+    n1, n2 = len(a), len(b)
+    ranks, ties = _ranks(list(a) + list(b))
+    u = sum(ranks[:n1]) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - sum(t ** 3 - t for t in ties) / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0  # Every value is identical
+    z = (u - n1 * n2 / 2 + 0.5) / math.sqrt(variance)
+    return u, 0.5 * math.erfc(-z / math.sqrt(2))
+
+def change_point(values):
+    """Find the single split that best separates values into segments with different means.
+
+    Returns (index of the first value after the change, relative shift of
+    the mean), or None when there are fewer than four values or no shift.
+    """
+    if len(values) < 4:
+        return None
+    best_index, best_score = None, 0.0
+    spread = statistics.pstdev(values) or 1.0
+    for index in range(2, len(values) - 1):
+        left, right = values[:index], values[index:]
+        # Mean difference weighted by segment sizes, as in a two-sample t statistic
+        score = abs(statistics.fmean(right) - statistics.fmean(left)) * math.sqrt(len(left) * len(right) / len(values)) / spread
+        if score > best_score:
+            best_index, best_score = index, score
+    if best_index is None:
+        return None
+    before = statistics.fmean(values[:best_index])
+    after = statistics.fmean(values[best_index:])
+    return best_index, (after - before) / before if before else 0.0
+
+def compare(baseline, recent, higher_is_better=True, alpha=ALPHA, min_effect=MIN_EFFECT):
+    """Compare a recent window of values with a baseline window.
+
+    Returns a dict with the baseline and recent medians, the relative change
+    of the median, the slowdown (the change in the bad direction, positive
+    when performance got worse), the p-value that recent values are worse
+    than the baseline, and whether that counts as a regression.
+    """
+    baseline_median = statistics.median(baseline)
+    recent_median = statistics.median(recent)
+    change = (recent_median - baseline_median) / baseline_median if baseline_median else 0.0
+    if higher_is_better:
+        _, p_value = mann_whitney_u(recent, baseline)
+    else:
+        _, p_value = mann_whitney_u(baseline, recent)
+    slowdown = -change if higher_is_better else change
+    return {
+        "baseline_median": baseline_median,
+        "recent_median": recent_median,
+        "change": change,
+        "slowdown": slowdown,
+        "p_value": p_value,
+        "regressed": p_value < alpha and slowdown >= min_effect,
+    }
+
+def check_run(run_id, baseline_runs=BASELINE_RUNS, recent_runs=RECENT_RUNS, alpha=ALPHA, min_effect=MIN_EFFECT):
+    """Check every metric of a stored run against the same host's earlier runs of the same test.
+
+    The recent window is the run and the recent_runs - 1 runs before it, the
+    baseline the baseline_runs runs before those. Metrics with fewer than
+    three baseline runs are skipped. Returns one compare() dict per metric,
+    extended with the metric name, the baseline size and, when the series
+    shows a change point, the id of the first run after it and its shift.
+    """
+    run = database.get_run(run_id)
+    if run is None:
+        raise ValueError(f"No run with id {run_id}")
+
+    findings = []
+    for metric in run["metrics"]:
+        history = database.get_metric_history(run["test_type"], metric, run["host_id"],
+                                              until_run=run_id, limit=baseline_runs + recent_runs)
+        history = [row for row in history if row[2] is not None]
+        values = [value for _, _, value in history]
+        if len(values) < recent_runs + 3:
+            continue
+        baseline, recent = values[:-recent_runs], values[-recent_runs:]
+        finding = compare(baseline, recent, higher_is_better(metric), alpha, min_effect)
+        finding.update(metric=metric, baseline_runs=len(baseline))
+        split = change_point(values)
+        if split is not None:
+            finding.update(change_point_run=history[split[0]][0], change_point_shift=split[1])
+        findings.append(finding)
+    return findings
+
+def regressions(run_id, **options):
+    """Return only the findings of check_run that are regressions."""
+    return [finding for finding in check_run(run_id, **options) if finding["regressed"]]
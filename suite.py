@@ -0,0 +1,183 @@
+# suite.py
+
+import contextlib
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import psutil
+import hardware
+import harness
+import profiling
+import registry
+import tests
+
+COOLDOWN = 30.0  # Seconds of rest between tests so heat and dirty caches from one do not carry into the next
+IDLE_PERCENT = 10.0  # Host CPU use to wait for after a cooldown before the next test starts
+MODES = ("serial", "parallel")
+
+def parse_cpu_list(text):
+    """Parse a CPU list such as 0-3,6 into a sorted list of CPU numbers."""
+    cpus = set()
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        if not first.isdigit() or (last and not last.isdigit()):
+            raise ValueError(f"bad CPU list {text!r}, expected e.g. 0-3,6")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+def pin_thread(cpus):
+    """Restrict the calling thread, and the processes it starts, to cpus.
+
+    Returns the previous CPU set to restore, or None where the OS has no
+    per-thread affinity (everywhere but Linux), in which case nothing is
+    pinned.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return None
+    previous = os.sched_getaffinity(0)  # On Linux, 0 is the calling thread
+    os.sched_setaffinity(0, cpus)
+    return previous
+
+def cool_down(seconds, idle_percent=IDLE_PERCENT, cancel=None):
+    """Rest for seconds, then up to as long again until the host's CPU use drops below idle_percent."""
+    if seconds <= 0:
+        return
+    if cancel is not None and cancel.wait(seconds):
+        raise tests.TestCancelled()
+    if cancel is None:
+        time.sleep(seconds)
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline and psutil.cpu_percent(interval=1.0) >= idle_percent:
+        if cancel is not None and cancel.is_set():
+            raise tests.TestCancelled()
+
+def test_params(test_type, params, measure_options):
+    """Return params for one run of a test under harness.measure with measure_options.
+
+    Tests that calibrate themselves to a duration get an equal share of
+    tests.TARGET_DURATION per run, so the whole measurement, warmup and
+    repetitions included, takes about that long rather than that long per
+    run, or within the time_budget if that is shorter. A duration given in
+    params is kept. Tests without a duration parameter, such as the
+    fixed-size DISK_MMAP and DISK_STREAMS workloads, are left as they are.
+    """
+    if "duration" in registry.params(test_type) and "duration" not in params:
+        options = {name: measure_options[name] for name in ("warmup", "max_runs", "time_budget")
+                   if name in measure_options}
+        return {**params, "duration": harness.run_duration(tests.TARGET_DURATION, **options)}
+    return params
+
+def measure_test(test_type, params, measure_options, cpus, cancel, progress, profile_dir=None, tracer=None):
+    """Run one test under the harness on the calling thread, pinned to cpus if given.
+
+    With profile_dir the thread is profiled into <test type>.prof there.
+    A profiling.MemoryTracer is checked at every progress report.
+    """
+    test = registry.runner(test_type)
+    params = test_params(test_type, params, measure_options)
+    if cancel is not None:
+        test = functools.partial(test, cancel=cancel)
+    test_progress = functools.partial(progress, test_type) if progress else None
+    if tracer is not None:
+        def test_progress(fraction, throughput):
+            tracer.check()
+            if progress is not None:
+                progress(test_type, fraction, throughput)
+    profiler = (profiling.profile_thread(os.path.join(profile_dir, f"{test_type}.prof")) if profile_dir
+                else contextlib.nullcontext())
+    previous = pin_thread(cpus) if cpus else None
+    started_at = time.time()
+    try:
+        with profiler as profile:
+            results = harness.measure(lambda **kwargs: test(**params, **kwargs), **measure_options,
+                                      progress=test_progress)
+    finally:
+        if previous is not None:
+            os.sched_setaffinity(0, previous)
+    entry = {
+        "params": params,
+        "results": results,
+        "started_at": started_at,
+        "duration": time.time() - started_at,
+        "cpus": list(cpus) if cpus else None,
+    }
+    if profile is not None:
+        entry["profile"] = profile
+    return entry
+
+def run_suite(test_types, params=None, measure_options=None, mode="serial", cooldown=COOLDOWN, affinity=None,
+              cancel=None, progress=None, on_start=None, on_result=None, profile_dir=None, trace_memory=False):
+    """Run several tests as one suite and return their combined report.
+
+    In serial mode the tests run one after the other with a cooldown between
+    them, so none sees another's load or heat. In parallel mode they all run
+    at once, to measure how they contend with each other. affinity pins
+    tests to CPUs. It is either one CPU list for every test or a dict of
+    lists by test type. Tests it leaves out may use every CPU.
+
+    Each test's report entry has params, results, started_at, duration, the
+    CPUs it was pinned to, and the host's utilization and telemetry while it
+    ran. In parallel mode these cover the whole group. on_start(test_type,
+    index) and on_result(test_type, entry) are called as tests start and
+    finish. progress(test_type, fraction, throughput) relays test progress.
+    Setting cancel (a threading.Event) stops the suite with
+    tests.TestCancelled.
+
+    To see what the tool itself costs, profile_dir dumps a cProfile
+    profile of each test's thread there and adds its hot paths to the
+    entry as profile, in serial mode only: cProfile allows one profiler
+    per process from Python 3.12 on. trace_memory adds the peak traced allocations and
+    their sites as memory, covering the whole group in parallel mode.
+    Both slow the tests down, so their scores are not comparable with
+    normal runs.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {', '.join(MODES)}")
+    params = params or {}
+    measure_options = measure_options or {}
+    if affinity is not None and not isinstance(affinity, dict):
+        affinity = {test_type: affinity for test_type in test_types}
+    affinity = affinity or {}
+
+    if profile_dir:
+        if mode == "parallel":
+            raise ValueError("profile_dir needs serial mode, as only one thread at a time can be profiled")
+        os.makedirs(profile_dir, exist_ok=True)
+
+    def run(index, test_type, tracer):
+        if on_start is not None:
+            on_start(test_type, index)
+        return measure_test(test_type, params.get(test_type, {}), measure_options, affinity.get(test_type), cancel,
+                        progress, profile_dir, tracer)
+
+    report = {"mode": mode, "cooldown": cooldown, "started_at": time.time(), "tests": {}}
+
+    def finish(test_type, entry, sampler, tracer):
+        entry.update(utilization=sampler.summary(), telemetry=sampler.telemetry())
+        if tracer is not None:
+            entry["memory"] = tracer.summary()
+        report["tests"][test_type] = entry
+        if on_result is not None:
+            on_result(test_type, entry)
+
+    if mode == "serial":
+        for index, test_type in enumerate(test_types):
+            if index:
+                cool_down(cooldown, cancel=cancel)
+            tracer = profiling.MemoryTracer() if trace_memory else None
+            with hardware.UtilizationSampler() as sampler, tracer or contextlib.nullcontext():
+                entry = run(index, test_type, tracer)
+            finish(test_type, entry, sampler, tracer)
+    else:
+        # One sampler and tracer for the group, as concurrent ones would reset each other's counters
+        tracer = profiling.MemoryTracer() if trace_memory else None
+        with hardware.UtilizationSampler() as sampler, tracer or contextlib.nullcontext(), \
+                ThreadPoolExecutor(len(test_types)) as executor:
+            futures = {test_type: executor.submit(run, index, test_type, tracer)
+                       for index, test_type in enumerate(test_types)}
+            entries = {test_type: future.result() for test_type, future in futures.items()}
+        for test_type, entry in entries.items():
+            finish(test_type, entry, sampler, tracer)
+    report["duration"] = time.time() - report["started_at"]
+    return report
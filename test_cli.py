@@ -0,0 +1,44 @@
+# test_cli.py
+
+import json
+import pytest
+import cli
+
+# A RAM test small enough to run in milliseconds
+RAM_ARGS = ["ram", "-p", "ram.max_memory=196608", "-p", "ram.repeats=2",
+            "--warmup", "0", "--min-runs", "1", "--max-runs", "2"]
+
+def test_no_tests_means_all():
+    args = cli.build_parser().parse_args([])
+    test_types, params, measure_options = cli.parse_test_arguments(args)
+    assert test_types == list(cli.TESTS)
+    assert params == {}
+    assert measure_options["max_runs"] == 10
+
+def test_test_names_are_case_insensitive_and_checked():
+    assert cli.build_parser().parse_args(["cpu", "Ram"]).tests == ["CPU", "RAM"]
+    with pytest.raises(SystemExit):
+        cli.build_parser().parse_args(["gpu"])
+    with pytest.raises(SystemExit):
+        cli.build_parser().parse_args(["-p", "ram.no_such_param=1"])
+
+def test_json_report(tmp_path):
+    output = tmp_path / "report.json"
+    cli.main(RAM_ARGS + ["-o", str(output)])
+    report = json.loads(output.read_text())
+    assert {"host", "inventory", "platform", "python", "started", "mode", "duration", "tests"} <= set(report)
+    assert report["mode"] == "serial"
+    entry = report["tests"]["RAM"]
+    assert entry["params"]["max_memory"] == 196608
+    assert entry["params"]["repeats"] == 2
+    assert "telemetry" not in entry  # Only with --telemetry
+    for kernel in ("copy", "scale", "add", "triad"):
+        summary = entry["results"][kernel]
+        assert summary["samples"] >= 1
+        assert summary["mean"] > 0
+
+def test_indent_zero_prints_one_line(capsys):
+    cli.main(RAM_ARGS + ["--indent", "0"])
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+    assert "RAM" in json.loads(lines[0])["tests"]
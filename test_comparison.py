@@ -0,0 +1,63 @@
+# test_comparison.py
+
+import csv
+import pytest
+import comparison
+import database
+
+@pytest.fixture
+def reference(tmp_path):
+    """A reference set "ref" of ten CPU hosts scoring 1 to 10; odd scores are CPU A, scores up to 5 run Linux."""
+    database.init(str(tmp_path / 'database.db'))
+    path = tmp_path / 'ref.csv'
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['test_type', 'metric', 'value', 'cpu_name', 'os'])
+        for value in range(1, 11):
+            for metric in ('score', 'latency_ns'):
+                writer.writerow(['cpu', metric, value, 'A' if value % 2 else 'B', 'Linux' if value <= 5 else 'Windows'])
+    comparison.import_reference(str(path))
+    yield tmp_path
+    database.close()
+
+def test_quantiles_and_share_below():
+    points = comparison.quantiles([0, 1, 2, 3, 4], count=5)
+    assert points == [0, 1, 2, 3, 4]
+    assert comparison.quantiles([0, 10], count=3) == [0, 5, 10]
+    assert comparison.share_below(points, -1) == 0.0
+    assert comparison.share_below(points, 0) == 0.0
+    assert comparison.share_below(points, 2.5) == 0.625
+    assert comparison.share_below(points, 4) == 1.0
+
+def test_rank_without_filters(reference):
+    [entry] = comparison.rank('CPU', 'score', 5)
+    assert entry['set'] == 'ref'
+    assert entry['count'] == 10
+    assert entry['mean'] == 5.5
+    assert entry['percentile'] == 44.4  # (5 - 1) / 9 of the way from the lowest score to the highest
+    # Lower latencies are better, so the same value beats the other share
+    assert comparison.rank('CPU', 'latency_ns', 5)[0]['percentile'] == 55.6
+    assert comparison.rank('CPU', 'score', 5, sets=['other']) == []
+    assert comparison.rank('RAM', 'score', 5) == []
+
+def test_rank_with_one_filter(reference):
+    [entry] = comparison.rank('CPU', 'score', 5, {'cpu_name': 'A', 'os': None})  # None filters are dropped
+    assert entry['count'] == 5
+    assert entry['mean'] == 5.0
+    assert entry['percentile'] == 50.0
+    assert comparison.rank('CPU', 'score', 5, {'cpu_name': 'C'}) == []
+
+def test_rank_with_two_filters(reference):
+    [entry] = comparison.rank('CPU', 'score', 5, {'cpu_name': 'A', 'os': 'Linux'})
+    assert entry == {'set': 'ref', 'count': 3, 'percentile': 66.7}  # Counted: 1 and 3 are below 5
+    with pytest.raises(ValueError):
+        comparison.rank('CPU', 'score', 5, {'cpu_name': 'A', 'no_such_attribute': 1})
+
+def test_failed_reimport_keeps_the_previous_set(reference):
+    path = reference / 'ref.csv'
+    with open(path, 'a', newline='') as file:
+        file.write('cpu,score,not a number,A,Linux\n')
+    with pytest.raises(ValueError):
+        comparison.import_reference(str(path))
+    assert [(entry['name'], entry['results']) for entry in database.get_reference_sets()] == [('ref', 20)]
+    assert comparison.rank('CPU', 'score', 5)[0]['count'] == 10
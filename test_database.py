@@ -0,0 +1,93 @@
+# test_database.py
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import pytest
+import database
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database.db')
+
+@pytest.fixture
+def baseline_copy(tmp_path):
+    """A copy of the shipped database.db, which still has the original test_results schema."""
+    path = str(tmp_path / 'database.db')
+    shutil.copy(BASELINE, path)
+    yield path
+    database.close()
+
+def _tables(path):
+    conn = sqlite3.connect(path)
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+    return version, tables
+
+def test_migrates_baseline_database(baseline_copy):
+    conn = sqlite3.connect(baseline_copy)
+    legacy_rows = conn.execute('SELECT COUNT(*) FROM test_results').fetchone()[0]
+    conn.close()
+
+    database.init(baseline_copy)
+    version, tables = _tables(baseline_copy)
+    assert version == len(database.MIGRATIONS)
+    assert 'test_results' not in tables
+    assert {'hosts', 'runs', 'metrics'} <= tables
+    assert database.count_test_results() == legacy_rows
+
+def test_failed_migration_is_rolled_back(baseline_copy, tmp_path):
+    conn = sqlite3.connect(baseline_copy)
+    conn.execute("INSERT INTO test_results (test_type, result, timestamp) VALUES ('CPU', 1, 'not a timestamp')")
+    conn.commit()
+    conn.close()
+
+    working = database.init(str(tmp_path / 'working.db'))
+    with pytest.raises(ValueError):
+        database.init(baseline_copy)
+    assert database.get_database() is working  # The half-migrated database never becomes the shared one
+    version, tables = _tables(baseline_copy)
+    assert version == 1  # Only the first migration, which succeeded, was kept
+    assert not tables & {'hosts', 'runs', 'metrics'}
+
+    # Once the bad row is gone the migration runs again from where it stopped
+    conn = sqlite3.connect(baseline_copy)
+    conn.execute("DELETE FROM test_results WHERE timestamp = 'not a timestamp'")
+    conn.commit()
+    conn.close()
+    database.init(baseline_copy)
+    assert _tables(baseline_copy)[0] == len(database.MIGRATIONS)
+
+def test_close_forgets_the_shared_database(baseline_copy, monkeypatch):
+    monkeypatch.setattr(database, 'DATABASE_NAME', baseline_copy)
+    first = database.init(baseline_copy)
+    database.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        first.query('SELECT 1')
+    assert database.get_database() is not first  # Opened again rather than handing out the closed one
+    assert database.get_database().query('SELECT 1') == [(1,)]
+    database.close()
+    database.close()  # Nothing left to close
+
+def test_threads_share_one_default_connection(baseline_copy, monkeypatch):
+    monkeypatch.setattr(database, 'DATABASE_NAME', baseline_copy)
+    opened = []
+    original_open = database._open
+
+    def slow_open(path):
+        opened.append(path)
+        time.sleep(0.05)  # Widens the window in which a second thread could also open one
+        return original_open(path)
+
+    monkeypatch.setattr(database, '_open', slow_open)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(database.get_database())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(opened) == 1
+    assert all(db is results[0] for db in results)
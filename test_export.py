@@ -0,0 +1,57 @@
+# test_export.py
+
+import csv
+import gzip
+import json
+import pytest
+import database
+import export
+
+@pytest.fixture
+def runs(tmp_path):
+    database.init(str(tmp_path / 'database.db'))
+    database.insert_runs([{'test_type': 'RAM', 'metrics': {'copy': 10.0 + run, 'triad': 12.0 + run},
+                           'params': {'repeats': run}, 'started_at': 1000 + run} for run in range(3)])
+    yield tmp_path
+    database.close()
+
+def _csv_rows(path):
+    with open(path, newline='') as file:
+        return list(csv.reader(file))
+
+def test_export_csv_since_last(runs):
+    path = str(runs / 'runs.csv')
+    summary = export.export_runs(path, since_last='nightly')
+    assert (summary['runs'], summary['rows']) == (3, 6)
+    rows = _csv_rows(path)
+    assert rows[0] == list(database.EXPORT_COLUMNS)
+    assert len(rows) == 1 + 6
+
+    # Nothing new since the last export of that name
+    summary = export.export_runs(path, since_last='nightly')
+    assert (summary['runs'], summary['rows']) == (0, 0)
+    assert _csv_rows(path) == [list(database.EXPORT_COLUMNS)]
+
+    run_id = database.insert_run('CPU', {'score': 1.0})
+    summary = export.export_runs(path, since_last='nightly')
+    assert (summary['runs'], summary['rows'], summary['last_run_id']) == (1, 1, run_id)
+    # Another name keeps its own mark
+    assert export.export_runs(str(runs / 'all.csv'), since_last='weekly')['runs'] == 4
+
+def test_export_jsonl_gzip(runs):
+    path = str(runs / 'runs.jsonl.gz')
+    summary = export.export_runs(path)
+    assert (summary['format'], summary['compression']) == ('jsonl', 'gzip')
+    records = list(gzip.open(path, 'rt'))
+    first = json.loads(records[0])
+    assert (first['test_type'], first['metric'], first['value']) == ('RAM', 'copy', 10.0)
+    assert first['params'] == {'repeats': 0}
+    assert len(records) == 6
+    assert not (runs / 'runs.jsonl.gz.part').exists()
+
+def test_progress_stays_within_one(runs, monkeypatch):
+    # Runs stored after the count was taken are exported too
+    monkeypatch.setattr(database, 'count_runs_after', lambda run_id: 0)
+    fractions = []
+    export.export_runs(str(runs / 'runs.csv'), chunk_size=1, progress=lambda fraction, rate: fractions.append(fraction))
+    assert fractions == [1.0, 1.0, 1.0]
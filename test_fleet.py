@@ -0,0 +1,58 @@
+# test_fleet.py
+
+import threading
+import pytest
+import fleet
+import tests
+
+@pytest.fixture
+def agent():
+    server = fleet.make_agent(port=0, name="test-agent", token="secret")
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield f"127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+def test_parse_run_request_checks_params():
+    assert fleet.parse_run_request({"test": "ram", "params": {"max_memory": 196608, "repeats": 2},
+                                    "measure": {"max_runs": 2}}) == \
+        ("RAM", {"max_memory": 196608, "repeats": 2}, {"max_runs": 2})
+    # Lists stand in for tuples, ints for floats, and None defaults take anything
+    fleet.parse_run_request({"test": "DISK_STREAMS", "params": {"streams": [1, 2]}})
+    fleet.parse_run_request({"test": "CPU", "params": {"duration": 1, "processes": 2}})
+    for request in ({"test": "GPU"},
+                    {"test": "RAM", "params": {"no_such_param": 1}},
+                    {"test": "RAM", "params": {"max_memory": "a lot"}},
+                    {"test": "DISK", "params": {"queue_depth": True}},
+                    {"test": "RAM", "params": [1]},
+                    {"test": "RAM", "measure": {"max_runs": "2"}},
+                    {"test": "RAM", "measure": {"progress": 1}},
+                    ["RAM"]):
+        with pytest.raises(ValueError):
+            fleet.parse_run_request(request)
+
+def test_agent_rejects_bad_requests(agent):
+    with pytest.raises(RuntimeError, match="token"):
+        fleet._request(agent, "/info")
+    with pytest.raises(RuntimeError, match="no parameter"):
+        fleet._request(agent, "/run", {"test": "RAM", "params": {"no_such_param": 1}}, token="secret")
+    with pytest.raises(RuntimeError, match="bad run request"):
+        fleet._request(agent, "/run", ["RAM"], token="secret")
+
+def test_agent_runs_a_test(agent):
+    replies, errors = fleet.run_on_agent(agent, ["RAM"], {"RAM": {"max_memory": 196608, "repeats": 2}},
+                                         {"warmup": 0, "min_runs": 1, "max_runs": 2}, token="secret")
+    assert errors == []
+    assert replies[0]["host"]["hostname"] == "test-agent"
+    assert replies[0]["results"]["triad"]["samples"] >= 1
+    # Each run gets its share of the target duration, as in local runs
+    assert replies[0]["params"]["duration"] == pytest.approx(tests.TARGET_DURATION / 2)
+
+def test_non_loopback_agent_needs_a_token():
+    with pytest.raises(ValueError):
+        fleet.make_agent("0.0.0.0", port=0)
+    assert fleet.is_loopback("::1") and fleet.is_loopback("localhost")
+    assert not fleet.is_loopback("") and not fleet.is_loopback("192.168.1.10")
+    fleet.make_agent("0.0.0.0", port=0, token="secret").server_close()
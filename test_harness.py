@@ -0,0 +1,102 @@
+# test_harness.py
+
+import itertools
+import statistics
+import time
+import pytest
+import harness
+
+def counting(values):
+    """Return a func yielding values in turn, and the list of calls it made."""
+    calls = []
+    source = iter(values)
+
+    def func():
+        calls.append(None)
+        return next(source)
+    return func, calls
+
+def test_percentile_interpolates():
+    assert harness.percentile([4, 1, 3, 2], 0.0) == 1
+    assert harness.percentile([4, 1, 3, 2], 1.0) == 4
+    assert harness.percentile([1, 2, 3, 4], 0.5) == 2.5
+    assert harness.percentile([10], 0.95) == 10
+
+def test_reject_outliers_keeps_fewer_than_four_samples():
+    assert harness.reject_outliers([1.0, 1.0, 1000.0]) == [1.0, 1.0, 1000.0]
+    assert harness.reject_outliers([]) == []
+
+def test_reject_outliers_uses_tukey_fences():
+    # Quartiles 10.75 and 12.25, so the fences are at 8.5 and 14.5
+    samples = [10, 11, 11, 12, 12, 13, 100, 8]
+    assert harness.reject_outliers(samples) == [10, 11, 11, 12, 12, 13]
+    assert harness.reject_outliers(samples, k=3) == [10, 11, 11, 12, 12, 13, 8]
+
+def test_ci_half_width():
+    assert harness.ci_half_width([5.0]) == float("inf")
+    # stdev 2.3094, n 4 and t(3) = 3.182
+    assert harness.ci_half_width([0.0, 0.0, 4.0, 4.0]) == pytest.approx(3.182 * 2.3094 / 2, rel=1e-4)
+    # Beyond 30 degrees of freedom the normal 1.96 is used
+    samples = [0.0, 2.0] * 20
+    assert harness.ci_half_width(samples) == pytest.approx(
+        1.96 * statistics.stdev(samples) / len(samples) ** 0.5)
+
+def test_summarize():
+    summary = harness.summarize([1.0, 2.0, 3.0, 4.0])
+    assert summary["mean"] == 2.5
+    assert summary["median"] == 2.5
+    assert summary["p95"] == pytest.approx(3.85)
+    assert summary["samples"] == 4
+    assert harness.summarize([7.0])["stddev"] == 0.0
+
+def test_run_duration():
+    assert harness.run_duration(10.0, warmup=1, max_runs=9) == 1.0
+    assert harness.run_duration(10.0, warmup=0, max_runs=10, time_budget=600.0) == 1.0
+    assert harness.run_duration(10.0, warmup=1, max_runs=4, time_budget=2.5) == 0.5  # The budget is shorter
+    with pytest.raises(TypeError):
+        harness.run_duration(10.0, target_ci=0.02)
+
+def test_measure_stops_once_the_ci_is_tight():
+    func, calls = counting(itertools.repeat(100.0))
+    result = harness.measure(func, warmup=1, min_runs=3, max_runs=20, target_ci=0.02)
+    assert len(calls) == 1 + 3  # Converged as soon as min_runs were in
+    assert result["score"]["samples"] == 3
+    assert result["score"]["mean"] == 100.0
+
+def test_measure_stops_at_max_runs():
+    func, calls = counting(itertools.cycle([50.0, 150.0]))  # Never within 2% of the mean
+    result = harness.measure(func, warmup=2, min_runs=3, max_runs=6)
+    assert len(calls) == 2 + 6
+    assert result["score"]["samples"] == 6
+
+def test_measure_stops_at_the_time_budget():
+    def slow():
+        time.sleep(0.05)
+        return {"fast": time.perf_counter(), "other": 1.0}  # Always changing, so never converges
+    result = harness.measure(slow, warmup=0, min_runs=2, max_runs=1000, time_budget=0.2)
+    assert 1 <= result["fast"]["samples"] <= 5
+    assert result["other"]["samples"] == result["fast"]["samples"]
+
+def test_measure_runs_once_even_without_budget():
+    func, calls = counting(itertools.repeat(1.0))
+    result = harness.measure(func, warmup=3, time_budget=0)
+    assert len(calls) == 2  # The warmup stops at the deadline, one measured run still happens
+    assert result["score"]["samples"] == 1
+
+def test_measure_summarizes_every_score_and_counts_rejects():
+    values = [{"a": 10.0, "b": value} for value in (1, 1, 1, 1, 1, 50)]
+    func, _ = counting(values)
+    result = harness.measure(func, warmup=0, min_runs=6, max_runs=6, target_ci=0)
+    assert result["a"]["rejected"] == 0
+    assert result["b"]["rejected"] == 1
+    assert result["b"]["mean"] == 1
+
+def test_measure_rescales_progress():
+    reports = []
+
+    def func(progress):
+        progress(1.0, 5.0)
+        return 1.0
+    harness.measure(func, warmup=1, min_runs=1, max_runs=3, progress=lambda *report: reports.append(report))
+    assert reports[0] == (0.25, 5.0)  # One of four runs, warmup included
+    assert all(fraction <= 1.0 for fraction, _ in reports)
@@ -0,0 +1,55 @@
+# test_regression.py
+
+import pytest
+import database
+import regression
+
+@pytest.fixture
+def empty_database(tmp_path):
+    database.init(str(tmp_path / 'database.db'))
+    yield
+    database.close()
+
+def test_mann_whitney_u_known_values():
+    # The same as scipy.stats.mannwhitneyu(a, b, alternative='less', method='asymptotic')
+    assert regression.mann_whitney_u([1, 2, 3], [4, 5, 6]) == pytest.approx((0.0, 0.040428), abs=1e-6)
+    assert regression.mann_whitney_u([4, 5, 6], [1, 2, 3]) == pytest.approx((9.0, 0.985452), abs=1e-6)
+    # Ties share their average rank and shrink the variance
+    assert regression.mann_whitney_u([1, 2, 2, 3], [2, 3, 4, 5]) == pytest.approx((2.5, 0.068329), abs=1e-6)
+
+def test_mann_whitney_u_without_spread():
+    assert regression.mann_whitney_u([1, 1], [1, 1]) == (2.0, 1.0)
+
+def test_compare_follows_the_metric_direction():
+    baseline = [100, 101, 99, 100, 102, 98, 100, 101]
+    slower = regression.compare(baseline, [80, 81, 79], higher_is_better=True)
+    assert slower['regressed']
+    assert slower['slowdown'] == pytest.approx(0.2)
+    assert slower['p_value'] < 0.05
+    # The same drop in a latency is an improvement
+    compare = regression.compare(baseline, [80, 81, 79], higher_is_better=False)
+    assert not compare['regressed']
+    assert compare['slowdown'] == pytest.approx(-0.2)
+    # Significant but smaller than min_effect
+    assert not regression.compare(baseline, [97, 97, 97], min_effect=0.05)['regressed']
+
+def test_check_run(empty_database):
+    run_ids = [database.insert_run('RAM', {'triad': 1000.0 + run % 3, 'latency_ns': 80.0 + run % 2},
+                                   started_at=1000 + run) for run in range(10)]
+    assert regression.check_run(run_ids[-1]) and not regression.regressions(run_ids[-1])
+    for run in range(10, 13):
+        run_ids.append(database.insert_run('RAM', {'triad': 700.0, 'latency_ns': 80.0},
+                                           started_at=1000 + run))
+
+    findings = {finding['metric']: finding for finding in regression.check_run(run_ids[-1])}
+    assert findings['triad']['regressed']
+    assert findings['triad']['baseline_runs'] == 10
+    assert findings['triad']['change_point_run'] == run_ids[10]
+    assert not findings['latency_ns']['regressed']
+    assert [finding['metric'] for finding in regression.regressions(run_ids[-1])] == ['triad']
+
+def test_check_run_needs_a_baseline(empty_database):
+    run_ids = [database.insert_run('CPU', {'score': 1.0}, started_at=1000 + run) for run in range(5)]
+    assert regression.check_run(run_ids[-1]) == []  # Three recent runs but only two before them
+    with pytest.raises(ValueError):
+        regression.check_run(run_ids[-1] + 1)
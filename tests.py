@@ -2,52 +2,835 @@
 
 import time
 import os
+import ctypes
+import functools
+import hashlib
+import shutil
+import stat
+import subprocess
+import math
+import zlib
 import tempfile
 import random
+import mmap
+import threading
+try:
+    import resource
+except ImportError:
+    resource = None  # Not available on Windows, see _page_faults
+from concurrent.futures import ThreadPoolExecutor, wait
+from multiprocessing import Pool
+import numpy as np
+import psutil
+import hardware
+import harness
 
-def cpu_test():
-    """Simulate a CPU performance test by calculating factorials in a loop."""
-    start_time = time.time()
+PROGRESS_INTERVAL = 0.25  # Seconds between progress reports from long-running loops
+TARGET_DURATION = 10.0  # Seconds a calibrated test aims to run for, however fast the machine is
+PROBE_DURATION = 0.1  # Seconds a calibration probe must take to be timed reliably
+
+class TestCancelled(Exception):
+    """Raised inside a test when its cancel event is set."""
+
+def _check_cancel(cancel):
+    """Raise TestCancelled if the cancel event (a threading.Event or None) is set."""
+    if cancel is not None and cancel.is_set():
+        raise TestCancelled()
+
+def _report(progress, fraction, throughput):
+    """Pass the fraction done (0-1) and the current throughput to a progress callback."""
+    if progress is not None:
+        progress(fraction, throughput)
+
+def _calibrate(workload, size=1):
+    """Return how many units of work per second workload(size) gets through.
+
+    size doubles until one call takes at least PROBE_DURATION, so timer
+    resolution and call overhead do not distort the rate.
+    """
+    while True:
+        start_time = time.perf_counter_ns()
+        workload(size)
+        duration = (time.perf_counter_ns() - start_time) / 1e9
+        if duration >= PROBE_DURATION:
+            return size / duration
+        size *= 2
+
+CPU_ITERATIONS = 1000000000  # A run of this many iterations taking 1 s scores CPU_SCORE
+CPU_SCORE = 250000
+CPU_CHUNKS = 50  # Pieces each CPU workload is split into, for progress and cancellation
+
+def _cpu_workload(iterations):
+    """Run the multiply loop and return how long it took in seconds."""
+    start_time = time.perf_counter_ns()
     result = 1
-    for i in range(1, 1000000000):  # Increase this range for more intense testing
+    for i in range(1, iterations):
         result *= i
         if result > 1e20:
             result = 1  # Reset to prevent overflow
-    end_time = time.time()
-    duration = end_time - start_time
-    cpu_score = 250000 / duration  # Calculate a score based on time taken
-    return cpu_score
-
-def ram_test():
-    """Simulate a RAM performance test by allocating and manipulating a large list."""
-    start_time = time.time()
-    data = [random.random() for _ in range(10**8)]  # Allocate a large list
-    for i in range(len(data)):
-        data[i] = data[i] ** 2  # Manipulate list data to simulate load
-    end_time = time.time()
-    duration = end_time - start_time
-    ram_score = round(100000 / duration, 1)
-    return ram_score
-
-def disk_test():
-    """Simulate a Disk performance test by writing and reading a temporary file."""
-    start_time = time.time()
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    return (time.perf_counter_ns() - start_time) / 1e9
+
+def cpu_test(processes=None, duration=TARGET_DURATION, iterations=None, progress=None, cancel=None):
+    """Run the CPU workload on a single core, then on every core at once.
+
+    Unless iterations is given, a short probe sizes the workload so that
+    each half takes about duration / 2 seconds on this machine. Scores are
+    iterations per second scaled by CPU_SCORE / CPU_ITERATIONS, so they
+    compare across machines whatever size was picked. The workload is split
+    into CPU_CHUNKS pieces so progress (in millions of iterations per
+    second) can be reported and cancel checked between them.
+    processes defaults to the CPUs the calling thread may run on, so a test
+    pinned with suite.pin_thread runs its all-core half on those CPUs only,
+    one worker each, rather than crowding every core's worker onto them.
+    Returns the single-core score, the all-core score and the scaling
+    efficiency (all-core score divided by single-core score times the
+    number of processes, 1.0 being perfect linear scaling).
+    """
+    if processes is None:
+        if hasattr(os, "sched_getaffinity"):
+            processes = len(os.sched_getaffinity(0))  # On Linux, 0 is the calling thread
+        else:
+            processes = os.cpu_count() or 1  # Same as psutil.cpu_count(logical=True)
+    if iterations is None:
+        iterations = max(CPU_CHUNKS, int(_calibrate(_cpu_workload, 1000) * duration / 2))
+    score_constant = CPU_SCORE * iterations / CPU_ITERATIONS
+    chunk_size = max(1, iterations // CPU_CHUNKS)
+    chunks = [chunk_size] * (iterations // chunk_size)
+
+    single_duration = 0
+    for index, size in enumerate(chunks):
+        _check_cancel(cancel)
+        chunk_duration = _cpu_workload(size)
+        single_duration += chunk_duration
+        _report(progress, 0.5 * (index + 1) / len(chunks), size / chunk_duration / 1e6)
+    single_core_score = score_constant / single_duration
+
+    # Start the workers before timing so process spawn is not measured;
+    # leaving the with block early on cancel terminates them
+    with Pool(processes) as pool:
+        start_time = time.perf_counter_ns()
+        tasks = chunks * processes
+        for index, _ in enumerate(pool.imap_unordered(_cpu_workload, tasks)):
+            _check_cancel(cancel)
+            elapsed = (time.perf_counter_ns() - start_time) / 1e9
+            _report(progress, 0.5 + 0.5 * (index + 1) / len(tasks),
+                    sum(tasks[:index + 1]) / elapsed / 1e6)
+        all_duration = (time.perf_counter_ns() - start_time) / 1e9
+    all_core_score = processes * score_constant / all_duration
+
+    return {
+        "single_core": round(single_core_score, 1),
+        "all_core": round(all_core_score, 1),
+        "scaling_efficiency": round(all_core_score / (single_core_score * processes), 2),
+    }
+
+# Kernels of the CPU mix test, each spending nearly all of its time in C rather than the interpreter
+CPU_MIX_KERNELS = ("sha256", "zlib", "matmul", "sort")
+CPU_MIX_BUFFER = 1024 ** 2  # Bytes hashed and compressed per call
+CPU_MIX_MATRIX = 256  # Side of the square float64 matrices multiplied per call
+CPU_MIX_SORT = 1024 ** 2  # float64 values sorted per call
+# Rates that score 1000, round numbers near one core of a current x86 server
+CPU_MIX_REFERENCE = {"sha256": 1000e6, "zlib": 30e6, "matmul": 40e9, "sort": 80e6}
+# Result key and divisor of each kernel's rate (bytes, flops or elements per second)
+CPU_MIX_UNITS = {
+    "sha256": ("sha256_mb_s", 1e6),
+    "zlib": ("zlib_mb_s", 1e6),
+    "matmul": ("matmul_gflop_s", 1e9),
+    "sort": ("sort_m_elements_s", 1e6),
+}
+
+def _mix_input(kernel, rng):
+    """Build one thread's input for a CPU mix kernel and return (call, units of work per call)."""
+    if kernel in ("sha256", "zlib"):
+        # Text-like data from a random vocabulary, so zlib has realistic matches to find
+        words = [bytes(rng.integers(97, 123, rng.integers(2, 10), dtype=np.uint8)) for _ in range(1024)]
+        text = b" ".join(words[index] for index in rng.integers(0, len(words), CPU_MIX_BUFFER // 4))
+        text = text[:CPU_MIX_BUFFER]
+        if kernel == "sha256":
+            return (lambda: hashlib.sha256(text).digest()), len(text)
+        return (lambda: zlib.compress(text, 6)), len(text)
+    if kernel == "matmul":
+        a, b = rng.random((CPU_MIX_MATRIX, CPU_MIX_MATRIX)), rng.random((CPU_MIX_MATRIX, CPU_MIX_MATRIX))
+        c = np.empty_like(a)
+        return (lambda: np.matmul(a, b, out=c)), 2 * CPU_MIX_MATRIX ** 3
+    source = rng.random(CPU_MIX_SORT)
+    work = np.empty_like(source)
+
+    def sort():
+        np.copyto(work, source)
+        work.sort()
+    return sort, len(source)
+
+def cpu_mix_test(threads=1, duration=TARGET_DURATION, kernels=CPU_MIX_KERNELS, progress=None, cancel=None,
+                 seed=None):
+    """Measure CPU speed with a mix of kernels that run in native code.
+
+    SHA-256 hashing and zlib compression of text-like data, a float64
+    matrix multiply and a float64 sort each run for an equal share of
+    duration seconds on threads threads at once. All four release the GIL,
+    so threads scale across cores. Nearly all of the time is spent in C,
+    so scores follow the hardware rather than the Python version. NumPy's
+    BLAS may use several cores for the multiply even with one thread.
+
+    Returns the geometric mean of each kernel's rate relative to
+    CPU_MIX_REFERENCE as mix_score (1000 matching the reference), then
+    each kernel's rate. Progress is reported in mix points of the kernel
+    running. Every thread completes at least one call of each kernel, so
+    a very short duration still gives a rate.
+    """
+    if threads < 1:
+        raise ValueError("threads must be at least 1")
+    if not kernels:
+        raise ValueError("kernels must name at least one kernel")
+    unknown = [kernel for kernel in kernels if kernel not in CPU_MIX_KERNELS]
+    if unknown:
+        raise ValueError(f"Unknown kernels {', '.join(unknown)}, expected some of {', '.join(CPU_MIX_KERNELS)}")
+    rng = np.random.default_rng(seed)
+    rates = {}
+    for kernel_index, kernel in enumerate(kernels):
+        inputs = [_mix_input(kernel, rng) for _ in range(threads)]
+        inputs[0][0]()  # Warm up caches and NumPy's first-call setup outside the timing
+        completed = [0] * threads  # Each thread only counts into its own slot
+        share = duration / len(kernels)
+        deadline = time.perf_counter() + share
+
+        def worker(index):
+            call, units = inputs[index]
+            while True:
+                call()
+                completed[index] += units
+                if time.perf_counter() >= deadline or (cancel is not None and cancel.is_set()):
+                    break
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            futures = [executor.submit(worker, index) for index in range(threads)]
+            while wait(futures, timeout=PROGRESS_INTERVAL).not_done:
+                elapsed = time.perf_counter() - start_time
+                _report(progress, min(1.0, (kernel_index + elapsed / share) / len(kernels)),
+                        1000 * sum(completed) / elapsed / CPU_MIX_REFERENCE[kernel])
+            for future in futures:
+                future.result()
+        _check_cancel(cancel)
+        rates[kernel] = sum(completed) / (time.perf_counter() - start_time)
+
+    mix_score = 1000 * math.exp(sum(math.log(rate / CPU_MIX_REFERENCE[kernel]) for kernel, rate in rates.items())
+                                / len(rates))
+    scores = {"mix_score": round(mix_score, 1)}
+    for kernel, rate in rates.items():
+        key, divisor = CPU_MIX_UNITS[kernel]
+        scores[key] = round(rate / divisor, 2)
+    return scores
+
+RAM_MAX_MEMORY = 4 * 1024 ** 3  # Upper bound for the three RAM test arrays together
+RAM_CACHE_SIZE = 64 * 1024 ** 2  # Last-level cache size assumed when the hardware does not report one
+RAM_TRIAD_BLOCK = 32 * 1024  # float64 values per triad block, whose scratch buffer stays in L1/L2
+RAM_AVAILABLE_FRACTION = 0.25  # Share of the currently available memory the RAM tests may allocate
+RAM_MIN_REPEATS = 2  # Rounds of every kernel a time-bounded RAM test always runs
+
+def _memory_limit(max_memory):
+    """Cap max_memory at RAM_AVAILABLE_FRACTION of the memory available right now, so small VMs do not run out."""
+    return min(max_memory, int(psutil.virtual_memory().available * RAM_AVAILABLE_FRACTION))
+
+def ram_test(max_memory=RAM_MAX_MEMORY, cache_size=None, duration=TARGET_DURATION, repeats=None,
+             progress=None, cancel=None):
+    """Measure memory bandwidth with the STREAM copy, scale, add and triad kernels.
+
+    Each of the three float64 arrays is four times cache_size, by default
+    the detected last-level cache, so the kernels stream from DRAM rather
+    than cache, capped so that all three together never use more than
+    max_memory, nor more than _memory_limit allows. Every kernel writes into
+    a preallocated array, so no temporaries are created. Triad goes through
+    a small scratch buffer block by block, so DRAM sees only the three
+    arrays STREAM counts for it. As in STREAM, each round runs the four
+    kernels in turn. Rounds repeat until duration seconds have passed, or
+    exactly repeats times if given, and at least RAM_MIN_REPEATS times.
+    Results are in GB/s, from the best run of each kernel as STREAM reports
+    them. Progress is reported in GB/s after every kernel run.
+    """
+    cache_size = cache_size or hardware.last_level_cache_bytes() or RAM_CACHE_SIZE
+    length = min(4 * cache_size, _memory_limit(max_memory) // 3) // np.dtype(np.float64).itemsize
+    if length < 1:
+        raise ValueError("max_memory is too small for the RAM test")
+    scalar = 3.0
+    a = np.full(length, 1.0)
+    b = np.full(length, 2.0)
+    c = np.zeros(length)
+    scratch = np.empty(min(length, RAM_TRIAD_BLOCK))
+
+    def triad():
+        for start in range(0, length, RAM_TRIAD_BLOCK):
+            end = min(start + RAM_TRIAD_BLOCK, length)
+            block = scratch[:end - start]
+            np.multiply(c[start:end], scalar, out=block)
+            np.add(block, b[start:end], out=a[start:end])
+
+    kernels = [
+        ("copy", lambda: np.copyto(c, a), 2),  # c = a
+        ("scale", lambda: np.multiply(c, scalar, out=b), 2),  # b = scalar * c
+        ("add", lambda: np.add(a, b, out=c), 3),  # c = a + b
+        ("triad", triad, 3),  # a = b + scalar * c
+    ]
+    best = dict.fromkeys((name for name, _, _ in kernels), float("inf"))
+    start_time = time.perf_counter_ns()
+    rounds = 0
+    while True:
+        for kernel_index, (name, kernel, arrays_touched) in enumerate(kernels):
+            _check_cancel(cancel)
+            kernel_start = time.perf_counter_ns()
+            kernel()
+            kernel_duration = (time.perf_counter_ns() - kernel_start) / 1e9
+            best[name] = min(best[name], kernel_duration)
+            if repeats is None:
+                fraction = (time.perf_counter_ns() - start_time) / 1e9 / duration
+            else:
+                fraction = (rounds + (kernel_index + 1) / len(kernels)) / repeats
+            _report(progress, min(1.0, fraction), arrays_touched * a.nbytes / kernel_duration / 1e9)
+        rounds += 1
+        elapsed = (time.perf_counter_ns() - start_time) / 1e9
+        if rounds >= RAM_MIN_REPEATS and (rounds >= repeats if repeats is not None else elapsed >= duration):
+            break
+    return {name: round(arrays_touched * a.nbytes / best[name] / 1e9, 2) for name, _, arrays_touched in kernels}
+
+LATENCY_MIN_SIZE = 4 * 1024  # Smallest pointer-chasing working set, well inside L1
+LATENCY_MAX_MEMORY = 8 * 1024 ** 3  # Peak allocation: the largest working set and its build order, an eighth of it
+CACHE_LINE_SIZE = 64
+LATENCY_WARM_STEPS = 1000000  # Most loads of the warmup pass, which also times a calibrated latency test
+
+CHASE_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache")),
+                               "benchmark")  # Private directory the compiled chase loop is kept in
+
+# The chase loop in C, compiled on first use by _compile_chase; it times itself so no call overhead is counted
+CHASE_SOURCE = r"""
+#include <stdint.h>
+#include <time.h>
+
+double chase(const int64_t *links, int64_t steps, int64_t *last) {
+    struct timespec start, end;
+    int64_t index = 0;
+    clock_gettime(CLOCK_MONOTONIC, &start);
+    for (int64_t step = 0; step < steps; step++)
+        index = links[index];
+    clock_gettime(CLOCK_MONOTONIC, &end);
+    *last = index;  /* Keeps the compiler from dropping the loop */
+    return ((end.tv_sec - start.tv_sec) * 1e9 + (end.tv_nsec - start.tv_nsec)) / steps;
+}
+"""
+
+def latency_sizes(max_memory=LATENCY_MAX_MEMORY, min_size=LATENCY_MIN_SIZE):
+    """Return the working set sizes the latency test visits: powers of two from min_size to max_memory."""
+    sizes = []
+    size = min_size
+    while size <= max_memory:
+        sizes.append(size)
+        size *= 2
+    return sizes
+
+def size_label(size):
+    """Format a byte count as a short power-of-two label such as 4K, 32M or 1G."""
+    for unit in ("", "K", "M", "G"):
+        if size < 1024 or unit == "G":
+            return f"{size:g}{unit}"
+        size /= 1024
+
+def _pointer_chain(working_set, rng):
+    """Build an int64 array in which the first slot of every cache line points to the next line of one random cycle."""
+    stride = CACHE_LINE_SIZE // 8
+    lines = max(2, working_set // CACHE_LINE_SIZE)
+    chain = np.zeros(lines * stride, dtype=np.int64)
+    order = rng.permutation(lines)
+    order *= stride  # In place, so the build needs only this one index array next to the chain
+    chain[order[:-1]] = order[1:]
+    chain[order[-1]] = order[0]
+    return chain, lines
+
+def _owned_by_user(path, mode_mask):
+    """Return whether path is owned by the current user and has none of the permission bits in mode_mask."""
+    info = os.lstat(path)
+    return info.st_uid == os.getuid() and not info.st_mode & mode_mask
+
+def _compile_chase():
+    """Compile CHASE_SOURCE into a shared library in CHASE_CACHE_DIR and return a chase function for it.
+
+    The library is named after a hash of the source and reused by later
+    runs. Only a directory and library owned by the current user, that no
+    one else can write to, are used, so no other user can have a library
+    of theirs loaded. Returns None if there is no C compiler, it fails or
+    the cache is not private.
+    """
+    compiler = os.environ.get("CC") or shutil.which("cc") or shutil.which("gcc") or shutil.which("clang")
+    if compiler is None or os.name != "posix":
+        return None
+    library = os.path.join(CHASE_CACHE_DIR, f"chase_{hashlib.sha256(CHASE_SOURCE.encode()).hexdigest()[:16]}.so")
+    try:
+        os.makedirs(CHASE_CACHE_DIR, mode=0o700, exist_ok=True)
+        if not stat.S_ISDIR(os.lstat(CHASE_CACHE_DIR).st_mode) or not _owned_by_user(CHASE_CACHE_DIR, 0o077):
+            return None
+        if not os.path.lexists(library):
+            with tempfile.TemporaryDirectory(dir=CHASE_CACHE_DIR) as workdir:
+                source = os.path.join(workdir, "chase.c")
+                with open(source, "w") as file:
+                    file.write(CHASE_SOURCE)
+                subprocess.run([compiler, "-O2", "-shared", "-fPIC", "-o", os.path.join(workdir, "chase.so"), source],
+                               check=True, capture_output=True, timeout=60)
+                os.replace(os.path.join(workdir, "chase.so"), library)  # Other processes never load a half-written one
+        if not stat.S_ISREG(os.lstat(library).st_mode) or not _owned_by_user(library, 0o022):
+            return None
+        chase = ctypes.CDLL(library).chase
+    except (OSError, subprocess.SubprocessError):
+        return None
+    chase.restype = ctypes.c_double
+    chase.argtypes = [ctypes.c_void_p, ctypes.c_int64, ctypes.POINTER(ctypes.c_int64)]
+    last = ctypes.c_int64()
+    return lambda chain, steps: chase(chain.ctypes.data, steps, ctypes.byref(last))
+
+def _numba_chase():
+    """Return the chase loop compiled with numba, or None if numba is not installed."""
     try:
-        for _ in range(10):
-            # Write a large amount of data
-            temp_file.write(os.urandom(10**9))  # 10 MB of random data
-            temp_file.flush()
-            temp_file.seek(0)
+        import numba  # Optional, preferred over compiling the C loop at runtime
+    except ImportError:
+        return None
+
+    @numba.njit(cache=True)
+    def loop(links, steps):
+        index = 0
+        for _ in range(steps):
+            index = links[index]
+        return index
+
+    def chase(chain, steps):
+        start_time = time.perf_counter_ns()
+        loop(chain, steps)
+        return (time.perf_counter_ns() - start_time) / steps
+
+    chase(np.zeros(CACHE_LINE_SIZE // 8, dtype=np.int64), 1)  # Compile now rather than in the first timing
+    return chase
+
+def _python_chase(chain, steps):
+    """Follow the chain in the interpreter, which costs tens of ns per step on top of the load itself."""
+    links = memoryview(chain)  # Indexing a memoryview gives plain ints without NumPy scalar overhead
+    index = 0
+    start_time = time.perf_counter_ns()
+    for _ in range(steps):
+        index = links[index]
+    return (time.perf_counter_ns() - start_time) / steps
+
+@functools.lru_cache(maxsize=None)
+def chase_engine():
+    """Return (name, chase function) of the first chase loop available: "numba", "c" or "python"."""
+    for name, build in (("numba", _numba_chase), ("c", _compile_chase)):
+        chase = build()
+        if chase is not None:
+            return name, chase
+    return "python", _python_chase
 
-            # Read the data back
-            temp_file.read()
+def _chase(chain, steps):
+    """Follow a _pointer_chain for steps dependent loads and return the nanoseconds per load."""
+    return chase_engine()[1](chain, steps)
 
+def ram_latency_test(max_memory=LATENCY_MAX_MEMORY, min_size=LATENCY_MIN_SIZE, duration=TARGET_DURATION,
+                     accesses=None, progress=None, cancel=None, seed=None):
+    """Measure memory latency by pointer chasing over growing working sets.
+
+    For every size from latency_sizes a single random cycle through all of
+    its cache lines is built in a NumPy int64 array, so each load depends on
+    the previous one and the prefetcher cannot guess the next line. Steps in
+    the resulting curve show the L1, L2, L3 and DRAM (and remote NUMA node)
+    latencies. The chase loop runs as native code, see chase_engine. Only
+    when neither numba nor a C compiler is available does it run in the
+    interpreter, whose cost per step hides the cache levels. The cost of an
+    L1-resident step is then measured as chase_overhead_ns and subtracted:
+    the latency_<size>_ns scores become the latency above L1, and the
+    measured values are kept as raw_latency_<size>_ns. Unless accesses is
+    given, each size chases for an equal share of duration seconds, timed
+    from its warmup pass. Building a working set takes about an eighth of
+    its size on top, and sizes for which that exceeds max_memory, or what
+    _memory_limit allows, are skipped.
+    Returns ns per access as latency_<size>_ns for each size, smallest first.
+    Progress is reported in ns per access.
+    """
+    rng = np.random.default_rng(seed)
+    sizes = latency_sizes(_memory_limit(max_memory) * 8 // 9, min_size)
+    if not sizes:
+        raise ValueError("max_memory is smaller than min_size")
+
+    overhead = None
+    if chase_engine()[0] == "python":
+        # The interpreter's cost per step, from a chain that never leaves L1
+        chain, lines = _pointer_chain(LATENCY_MIN_SIZE, rng)
+        _chase(chain, lines)
+        overhead = _chase(chain, max(lines, min(accesses or LATENCY_WARM_STEPS, LATENCY_WARM_STEPS)))
+
+    latency_scores = {}
+    raw_scores = {}
+    for index, size in enumerate(sizes):
+        _check_cancel(cancel)
+        chain, lines = _pointer_chain(size, rng)
+        warm_steps = min(lines, accesses or LATENCY_WARM_STEPS)
+        warm_nanoseconds = _chase(chain, warm_steps)  # Warm caches and TLB with one pass
+        steps = accesses or max(warm_steps, int(duration * 1e9 / len(sizes) / max(warm_nanoseconds, 1.0)))
+        nanoseconds = _chase(chain, steps)
+        if overhead is None:
+            latency_scores[f"latency_{size_label(size)}_ns"] = round(nanoseconds, 2)
+        else:
+            latency_scores[f"latency_{size_label(size)}_ns"] = round(max(nanoseconds - overhead, 0.0), 2)
+            raw_scores[f"raw_latency_{size_label(size)}_ns"] = round(nanoseconds, 2)
+        _report(progress, (index + 1) / len(sizes), nanoseconds)
+        del chain
+    if overhead is not None:
+        latency_scores.update(raw_scores, chase_overhead_ns=round(overhead, 2))
+    return latency_scores
+
+DISK_FILE_SIZE = 256 * 1024 ** 2  # Size of the file the disk test works on
+DISK_PATTERNS = ("seq_write", "seq_read", "rand_write", "rand_read")
+DIRECT_IO_ALIGNMENT = 4096  # O_DIRECT needs block sizes and offsets aligned to this
+_seek_lock = threading.Lock()  # Serializes seek+read/write where pread/pwrite are missing
+
+def _write_block(fd, view, offset):
+    """Write a block at offset without moving a shared file position."""
+    if hasattr(os, "pwrite"):
+        os.pwrite(fd, view, offset)
+    else:
+        with _seek_lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            os.write(fd, view)
+
+def _read_block(fd, view, offset):
+    """Read a block at offset into view, reusing the buffer when the OS allows it."""
+    if hasattr(os, "preadv"):
+        os.preadv(fd, [view], offset)
+    elif hasattr(os, "pread"):
+        view[:] = os.pread(fd, len(view), offset)
+    else:
+        with _seek_lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            view[:] = os.read(fd, len(view))
+
+def _drop_cache(fd):
+    """Ask the OS to evict the file from the page cache, where supported."""
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+def _open_flags(direct, *block_sizes):
+    """Return os.open flags for a read-write benchmark file, with O_DIRECT if asked for."""
+    flags = os.O_RDWR | getattr(os, "O_BINARY", 0)
+    if direct:
+        if not hasattr(os, "O_DIRECT"):
+            raise ValueError("O_DIRECT is not supported on this platform")
+        if any(block_size % DIRECT_IO_ALIGNMENT for block_size in block_sizes):
+            raise ValueError(f"Block sizes must be multiples of {DIRECT_IO_ALIGNMENT} bytes with O_DIRECT")
+        flags |= os.O_DIRECT
+    return flags
+
+def _lay_out_file(fd, file_size, block, cancel=None):
+    """Fill the file with copies of block and fsync it, so reads never hit sparse holes."""
+    for offset in range(0, file_size, len(block)):
+        _check_cancel(cancel)
+        _write_block(fd, block, offset)
+    os.fsync(fd)
+
+def _run_pattern(fd, buffer, slot_size, offsets, block_size, write, queue_depth, fsync,
+                 progress=None, cancel=None, deadline=None):
+    """Issue one block operation per offset from queue_depth threads.
+
+    Each thread works on its own slot of the shared preallocated buffer and
+    stops early once time.perf_counter_ns() passes deadline, if given.
+    Returns the latencies in nanoseconds of the operations done and the
+    total elapsed time in seconds. Writes are fsynced before the clock stops so the
+    page cache cannot absorb them. While the threads run, the fraction of
+    offsets done and the MB/s since the last report go to progress every
+    PROGRESS_INTERVAL seconds.
+    """
+    completed = [0] * queue_depth  # Each thread only counts into its own slot
+
+    def worker(index):
+        view = buffer[index * slot_size:index * slot_size + block_size]
+        latencies = []
+        for offset in offsets[index::queue_depth]:
+            if cancel is not None and cancel.is_set():
+                break
+            start_time = time.perf_counter_ns()
+            if deadline is not None and start_time > deadline:
+                break
+            if write:
+                _write_block(fd, view, offset)
+                if fsync:
+                    os.fsync(fd)
+            else:
+                _read_block(fd, view, offset)
+            latencies.append(time.perf_counter_ns() - start_time)
+            completed[index] += 1
+        return latencies
+
+    start_time = time.perf_counter_ns()
+    with ThreadPoolExecutor(queue_depth) as executor:
+        futures = [executor.submit(worker, index) for index in range(queue_depth)]
+        last_time, last_done = start_time, 0
+        while wait(futures, timeout=PROGRESS_INTERVAL).not_done:
+            now, done = time.perf_counter_ns(), sum(completed)
+            _report(progress, done / len(offsets), (done - last_done) * block_size / ((now - last_time) / 1e9) / 1e6)
+            last_time, last_done = now, done
+        latencies = [latency for future in futures for latency in future.result()]
+    _check_cancel(cancel)
+    if write:
+        os.fsync(fd)
+    elapsed = (time.perf_counter_ns() - start_time) / 1e9
+    return latencies, elapsed
+
+def disk_test(file_size=DISK_FILE_SIZE, seq_block_size=1024 ** 2, rand_block_size=4096,
+              rand_ops=10000, queue_depth=1, patterns=DISK_PATTERNS, direct=False,
+              fsync=False, duration=TARGET_DURATION, directory=None, progress=None, cancel=None):
+    """Measure disk throughput, IOPS and latency for sequential and random access.
+
+    A file of file_size bytes is laid out once, then each pattern in patterns
+    runs over it: sequential patterns cover the whole file in seq_block_size
+    blocks, random patterns issue rand_ops block-aligned operations of
+    rand_block_size. queue_depth threads keep that many operations in flight.
+    With direct=True the file is opened with O_DIRECT to bypass the page
+    cache; with fsync=True every write is followed by an fsync. All I/O goes
+    through one preallocated, page-aligned buffer filled with random data once.
+    Each pattern stops early once it has run for its share of duration
+    seconds, so slow disks finish in bounded time; rates are computed from
+    the operations done.
+
+    Progress is reported in MB/s while each pattern runs.
+
+    Returns MB/s, IOPS and p50/p95/p99 latency in microseconds per pattern.
+    """
+    flags = _open_flags(direct, seq_block_size, rand_block_size)
+    file_size -= file_size % seq_block_size
+    if file_size < rand_block_size or file_size < seq_block_size:
+        raise ValueError("file_size must hold at least one block")
+
+    # Anonymous mmap memory is page aligned, which O_DIRECT requires
+    slot_size = max(seq_block_size, rand_block_size)
+    buffer_map = mmap.mmap(-1, slot_size * queue_depth)
+    buffer = memoryview(buffer_map)
+    for start in range(0, len(buffer), slot_size):
+        buffer[start:start + slot_size] = os.urandom(slot_size)
+
+    handle, path = tempfile.mkstemp(dir=directory)
+    os.close(handle)
+    fd = os.open(path, flags)
+    disk_scores = {}
+    try:
+        _lay_out_file(fd, file_size, buffer[:seq_block_size], cancel)
+
+        for pattern_index, pattern in enumerate(patterns):
+            if pattern.startswith("seq_"):
+                block_size = seq_block_size
+                offsets = list(range(0, file_size, block_size))
+            else:
+                block_size = rand_block_size
+                blocks = file_size // block_size
+                offsets = [random.randrange(blocks) * block_size for _ in range(rand_ops)]
+            write = pattern.endswith("_write")
+            if not write:
+                _drop_cache(fd)
+            pattern_progress = None
+            if progress is not None:
+                def pattern_progress(fraction, throughput, pattern_index=pattern_index):
+                    progress((pattern_index + fraction) / len(patterns), throughput)
+            deadline = time.perf_counter_ns() + int(duration * 1e9 / len(patterns))
+            latencies, elapsed = _run_pattern(fd, buffer, slot_size, offsets, block_size,
+                                              write, queue_depth, fsync, pattern_progress, cancel, deadline)
+            disk_scores[f"{pattern}_mb_s"] = round(len(latencies) * block_size / elapsed / 1e6, 1)
+            _report(progress, (pattern_index + 1) / len(patterns), disk_scores[f"{pattern}_mb_s"])
+            disk_scores[f"{pattern}_iops"] = round(len(latencies) / elapsed)
+            for fraction in (0.5, 0.95, 0.99):
+                disk_scores[f"{pattern}_p{round(fraction * 100)}_us"] = round(harness.percentile(latencies, fraction) / 1000, 1)
     finally:
-        temp_file.close()
-        os.unlink(temp_file.name)  # Delete the temp file
+        os.close(fd)
+        os.unlink(path)  # Delete the temp file
+        buffer.release()
+        buffer_map.close()
+    return disk_scores
+
+STREAM_COUNTS = (1, 2, 4, 8, 16)  # Numbers of parallel streams the multi-stream test sweeps
+SATURATION_FRACTION = 0.95  # Throughput within this fraction of the peak counts as saturated
 
-    end_time = time.time()
-    duration = end_time - start_time
-    disk_score = 25000 / duration  # Calculate a score based on time taken
-    return disk_score
+def disk_streams_test(streams=STREAM_COUNTS, stream_size=64 * 1024 ** 2, block_size=1024 ** 2,
+                      pattern="seq_read", direct=False, directory=None, progress=None, cancel=None):
+    """Measure how total disk throughput scales with parallel streams.
+
+    max(streams) files of stream_size bytes are laid out once. Then, for
+    every count K in streams, K threads each run pattern (one of
+    DISK_PATTERNS) over their own file with pread/pwrite in block_size
+    blocks, each from its own slot of one preallocated buffer. Random
+    patterns issue as many block-aligned operations as a sequential pass.
+    The page cache is dropped before reads and writes are fsynced before
+    the clock stops; direct=True opens the files with O_DIRECT.
+
+    Returns, per K, the total MB/s and the slowest and fastest stream's
+    MB/s; then the peak total MB/s, the smallest K that reaches
+    SATURATION_FRACTION of it, and each stream's share of the throughput
+    at that K. Progress is reported as total MB/s.
+    """
+    if pattern not in DISK_PATTERNS:
+        raise ValueError(f"pattern must be one of {', '.join(DISK_PATTERNS)}")
+    flags = _open_flags(direct, block_size)
+    stream_size -= stream_size % block_size
+    if stream_size < block_size:
+        raise ValueError("stream_size must hold at least one block")
+    write = pattern.endswith("_write")
+    blocks = stream_size // block_size
+    max_streams = max(streams)
+
+    buffer_map = mmap.mmap(-1, block_size * max_streams)  # Page aligned, as O_DIRECT requires
+    buffer = memoryview(buffer_map)
+    buffer[:block_size] = os.urandom(block_size)
+    for start in range(block_size, len(buffer), block_size):
+        buffer[start:start + block_size] = buffer[:block_size]
+
+    paths, fds = [], []
+    scores, stream_rates = {}, {}
+    try:
+        for _ in range(max_streams):
+            handle, path = tempfile.mkstemp(dir=directory)
+            os.close(handle)
+            paths.append(path)
+            fds.append(os.open(path, flags))
+            _lay_out_file(fds[-1], stream_size, buffer[:block_size], cancel)
+
+        total_operations = sum(streams) * blocks
+        operations_before = 0
+        for count in streams:
+            completed = [0] * count
+            if not write:
+                for fd in fds[:count]:
+                    _drop_cache(fd)
+
+            def stream(index):
+                fd = fds[index]
+                view = buffer[index * block_size:(index + 1) * block_size]
+                if pattern.startswith("seq_"):
+                    offsets = range(0, stream_size, block_size)
+                else:
+                    offsets = [random.randrange(blocks) * block_size for _ in range(blocks)]
+                start_time = time.perf_counter_ns()
+                for offset in offsets:
+                    if cancel is not None and cancel.is_set():
+                        break
+                    if write:
+                        _write_block(fd, view, offset)
+                    else:
+                        _read_block(fd, view, offset)
+                    completed[index] += 1
+                if write:
+                    os.fsync(fd)
+                return (time.perf_counter_ns() - start_time) / 1e9
+
+            start_time = time.perf_counter_ns()
+            with ThreadPoolExecutor(count) as executor:
+                futures = [executor.submit(stream, index) for index in range(count)]
+                while wait(futures, timeout=PROGRESS_INTERVAL).not_done:
+                    done = sum(completed)
+                    elapsed = (time.perf_counter_ns() - start_time) / 1e9
+                    _report(progress, (operations_before + done) / total_operations,
+                            done * block_size / elapsed / 1e6)
+                durations = [future.result() for future in futures]
+            elapsed = (time.perf_counter_ns() - start_time) / 1e9
+            _check_cancel(cancel)
+            operations_before += count * blocks
+
+            rates = [stream_size / duration / 1e6 for duration in durations]
+            stream_rates[count] = rates
+            scores[f"streams_{count}_mb_s"] = round(count * stream_size / elapsed / 1e6, 1)
+            scores[f"streams_{count}_min_stream_mb_s"] = round(min(rates), 1)
+            scores[f"streams_{count}_max_stream_mb_s"] = round(max(rates), 1)
+            _report(progress, operations_before / total_operations, scores[f"streams_{count}_mb_s"])
+    finally:
+        for fd in fds:
+            os.close(fd)
+        for path in paths:
+            os.unlink(path)  # Delete the temp files
+        buffer.release()
+        buffer_map.close()
+
+    peak = max(scores[f"streams_{count}_mb_s"] for count in streams)
+    saturation = min(count for count in streams if scores[f"streams_{count}_mb_s"] >= SATURATION_FRACTION * peak)
+    summary = {"peak_mb_s": peak, "saturation_streams": saturation}
+    rates = stream_rates[saturation]
+    for index, rate in enumerate(rates):
+        summary[f"saturation_stream_{index + 1}_share"] = round(rate / sum(rates), 3)
+    # Headline scores first, as the harness and the database treat the first one as the main result
+    return {**summary, **scores}
+
+MMAP_PATTERNS = ("seq_cold", "seq_warm", "rand_cold", "rand_warm")
+
+def _page_faults():
+    """Return the (major, minor) page faults of the calling thread, or the process where per-thread counts are missing."""
+    if resource is not None:
+        usage = resource.getrusage(getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF))
+        return usage.ru_majflt, usage.ru_minflt
+    return psutil.Process().memory_info().num_page_faults, 0
+
+def disk_mmap_test(file_size=DISK_FILE_SIZE, rand_pages=20000, patterns=MMAP_PATTERNS,
+                   directory=None, progress=None, cancel=None):
+    """Measure page-touch throughput and page faults through a read-only memory map.
+
+    A file of file_size bytes is laid out once and mapped fresh for every
+    pattern. Sequential patterns touch every page in order and random ones
+    touch rand_pages random pages, with the matching madvise hint where the
+    OS supports it. Cold patterns first evict the file from the page cache,
+    so touches fault the data in from disk; warm patterns first touch the
+    same pages through a throwaway mapping and then only pay for mapping
+    pages that are already cached.
+
+    Returns MB/s and major/minor page faults per pattern. Progress is
+    reported in MB/s.
+    """
+    page_size = mmap.PAGESIZE
+    file_size -= file_size % page_size
+    if file_size < page_size:
+        raise ValueError("file_size must hold at least one page")
+    pages = file_size // page_size
+
+    handle, path = tempfile.mkstemp(dir=directory)
+    os.close(handle)
+    fd = os.open(path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+    mmap_scores = {}
+    try:
+        _lay_out_file(fd, file_size, os.urandom(1024 ** 2 - 1024 ** 2 % page_size), cancel)
+        offsets_by_access = {
+            "seq": range(0, file_size, page_size),
+            "rand": [random.randrange(pages) * page_size for _ in range(rand_pages)],
+        }
+        for pattern_index, pattern in enumerate(patterns):
+            access, _, cache = pattern.partition("_")
+            offsets = offsets_by_access[access]
+            if cache == "cold":
+                _drop_cache(fd)
+            else:
+                with mmap.mmap(fd, file_size, access=mmap.ACCESS_READ) as warmup_mapping:
+                    for offset in offsets:
+                        warmup_mapping[offset]
+            mapping = mmap.mmap(fd, file_size, access=mmap.ACCESS_READ)
+            try:
+                advice = "MADV_SEQUENTIAL" if access == "seq" else "MADV_RANDOM"
+                if hasattr(mapping, "madvise") and hasattr(mmap, advice):
+                    mapping.madvise(getattr(mmap, advice))
+
+                major_before, minor_before = _page_faults()
+                start_time = time.perf_counter_ns()
+                last_report = start_time
+                for index, offset in enumerate(offsets):
+                    mapping[offset]  # Reading one byte is enough to fault the whole page in
+                    if index % 1024 == 0 and time.perf_counter_ns() - last_report > PROGRESS_INTERVAL * 1e9:
+                        _check_cancel(cancel)
+                        last_report = time.perf_counter_ns()
+                        _report(progress, (pattern_index + index / len(offsets)) / len(patterns),
+                                index * page_size / ((last_report - start_time) / 1e9) / 1e6)
+                elapsed = (time.perf_counter_ns() - start_time) / 1e9
+                major_after, minor_after = _page_faults()
+            finally:
+                mapping.close()
+
+            mmap_scores[f"mmap_{pattern}_mb_s"] = round(len(offsets) * page_size / elapsed / 1e6, 1)
+            mmap_scores[f"mmap_{pattern}_major_faults"] = major_after - major_before
+            mmap_scores[f"mmap_{pattern}_minor_faults"] = minor_after - minor_before
+            _report(progress, (pattern_index + 1) / len(patterns), mmap_scores[f"mmap_{pattern}_mb_s"])
+    finally:
+        os.close(fd)
+        os.unlink(path)  # Delete the temp file
+    return mmap_scores
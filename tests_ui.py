@@ -1,32 +1,148 @@
 # tests_ui.py
 
 import random
+import functools
+import json
+import threading
 from PyQt5 import QtWidgets, QtGui, QtCore
 import database
-import psutil
-import platform
+import hardware
 from datetime import datetime
 import tests
+import harness
+import regression
+import registry
+import suite
+
+# Repetition settings for tests started from the UI, see harness.measure
+MEASURE_OPTIONS = {"warmup": 1, "min_runs": 3, "max_runs": 10, "time_budget": 600.0}
+TEST_THREADS = 1  # Tests and suites that may run at once; more would skew each other's results
+
+_test_pool = None
+
+def test_pool():
+    """Return the pool tests and suites run on.
+
+    It has TEST_THREADS threads, so a test started while another one runs
+    waits for it rather than skewing it.
+    """
+    global _test_pool
+    if _test_pool is None:
+        _test_pool = QtCore.QThreadPool()
+        _test_pool.setMaxThreadCount(TEST_THREADS)
+    return _test_pool
+
+class TestSignals(QtCore.QObject):
+    """Signals a TestRunnable emits from its worker thread.
+
+    They are created on the UI thread, so connected slots run there,
+    queued, and may touch widgets.
+    """
+    progress = QtCore.pyqtSignal(float, float)  # Fraction complete (0-1), current throughput
+    finished = QtCore.pyqtSignal(object, object, object)  # Result, host utilization summary, telemetry
+    cancelled = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str)
 
 class TestRunnable(QtCore.QRunnable):
-    def __init__(self, test_type, callback):
+    def __init__(self, test_type):
         super().__init__()
         self.test_type = test_type
-        self.callback = callback  # Function to call with the result
+        self.signals = TestSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Ask the running test to stop at its next checkpoint."""
+        self.cancel_event.set()
 
     def run(self):
-        # Run the appropriate test function based on test type
-        if self.test_type == "CPU":
-            result = tests.cpu_test()
-        elif self.test_type == "RAM":
-            result = tests.ram_test()
-        elif self.test_type == "DISK":
-            result = tests.disk_test()
-        else:
-            result = 0  # Default result if test type is unknown
+        # Look up the test function registered for the test type
+        if registry.get(self.test_type) is None:
+            self.signals.finished.emit(0, None, None)  # Default result if test type is unknown
+            return
+        test = functools.partial(registry.runner(self.test_type),
+                                 **suite.test_params(self.test_type, {}, MEASURE_OPTIONS))
+
+        try:
+            with hardware.UtilizationSampler() as sampler:
+                result = harness.measure(functools.partial(test, cancel=self.cancel_event),
+                                         progress=self.signals.progress.emit, **MEASURE_OPTIONS)
+        except tests.TestCancelled:
+            self.signals.cancelled.emit()
+            return
+        except Exception as error:  # Report the failure on the page rather than losing it on the worker thread
+            self.signals.failed.emit(repr(error))
+            return
+
+        # Hand the result to the UI thread
+        self.signals.finished.emit(result, sampler.summary(), sampler.telemetry())
+
+class SuiteSignals(QtCore.QObject):
+    """Signals a SuiteRunnable emits from its worker thread."""
+    test_started = QtCore.pyqtSignal(str, int)  # Test type, index in the suite
+    progress = QtCore.pyqtSignal(str, float, float)  # Test type, fraction complete (0-1), current throughput
+    test_finished = QtCore.pyqtSignal(str, object)  # Test type, its suite.run_suite report entry
+    finished = QtCore.pyqtSignal(object)  # The combined report
+    cancelled = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str)
 
-        # Call the callback function with the test result
-        self.callback(result)
+class SuiteRunnable(QtCore.QRunnable):
+    """Runs suite.run_suite on the test pool, reporting through SuiteSignals."""
+    def __init__(self, test_types, **suite_options):
+        super().__init__()
+        self.test_types = test_types
+        self.suite_options = suite_options  # Mode, cooldown and affinity, see suite.run_suite
+        self.signals = SuiteSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Stop the suite at the next checkpoint of its running test or cooldown."""
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            report = suite.run_suite(self.test_types, measure_options=MEASURE_OPTIONS, cancel=self.cancel_event,
+                                     progress=self.signals.progress.emit, on_start=self.signals.test_started.emit,
+                                     on_result=self.signals.test_finished.emit, **self.suite_options)
+        except tests.TestCancelled:
+            self.signals.cancelled.emit()
+            return
+        except Exception as error:  # Report the failure on the page rather than losing it on the worker thread
+            self.signals.failed.emit(repr(error))
+            return
+        self.signals.finished.emit(report)
+
+class ExportSignals(QtCore.QObject):
+    """Signals an ExportRunnable emits from its worker thread."""
+    progress = QtCore.pyqtSignal(float, float)  # Fraction complete (0-1), rows written per second
+    finished = QtCore.pyqtSignal(object)  # The export.export_runs summary
+    cancelled = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str)
+
+class ExportRunnable(QtCore.QRunnable):
+    """Runs export.export_runs off the UI thread, reporting through ExportSignals."""
+    def __init__(self, path, **export_options):
+        super().__init__()
+        self.path = path
+        self.export_options = export_options  # Format, compression and since_last, see export.export_runs
+        self.signals = ExportSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Stop the export before its next chunk, removing the partial file."""
+        self.cancel_event.set()
+
+    def run(self):
+        import export  # Only needed once something is exported
+        try:
+            summary = export.export_runs(self.path, progress=self.signals.progress.emit, cancel=self.cancel_event,
+                                         **self.export_options)
+        except export.ExportCancelled:
+            self.signals.cancelled.emit()
+            return
+        except Exception as error:  # Report the failure in the dialog rather than losing it on the worker thread
+            self.signals.failed.emit(repr(error))
+            return
+        self.signals.finished.emit(summary)
 
 class StopwatchLabel(QtWidgets.QLabel):
     """A label that acts as a stopwatch."""
@@ -52,76 +168,344 @@ class StopwatchLabel(QtWidgets.QLabel):
         seconds = self.time_elapsed % 60
         self.setText(f"{minutes:02}:{seconds:02}")
 
-def get_cpu_info():
-    """Retrieve CPU information."""
-    cpu_name = platform.processor() or "Unknown CPU"
-    cores = psutil.cpu_count(logical=False)
-    threads = psutil.cpu_count(logical=True)
-    frequency = psutil.cpu_freq().max if psutil.cpu_freq() else "Unknown"
-    return f"CPU Name: {cpu_name}", f"CPU Characteristics: {cores} Cores, {threads} Threads, {frequency / 1000:.2f} GHz"
-
-def get_ram_info():
-    """Retrieve RAM information."""
-    total_memory = psutil.virtual_memory().total / (1024 ** 3)  # Convert to GB
-    return f"RAM Name: Physical Memory", f"RAM Characteristics: {total_memory:.2f} GB"
-
-def get_disk_info():
-    """Retrieve Disk information."""
-    disk = psutil.disk_usage('/')
-    total_disk = disk.total / (1024 ** 3)  # Convert to GB
-    return f"Disk Name: System Disk", f"Disk Characteristics: {total_disk:.2f} GB Total"
-
-def show_other_results():
-    """Show a dialog with hardcoded benchmark results for different configurations."""
-    dialog = QtWidgets.QDialog()
-    dialog.setWindowTitle("Other Benchmark Results")
-    dialog.setGeometry(200, 200, 600, 300)  # Set a larger width to display all text
-
-    # Table with hardcoded results
-    table = QtWidgets.QTableWidget(5, 4)  # 5 rows, 4 columns
-    table.setHorizontalHeaderLabels(["Configuration", "CPU Result", "RAM Result", "Disk Result"])
-    
-    # Resize columns to fit content
-    table.setColumnWidth(0, 250)  # Wider column for configuration description
-    table.setColumnWidth(1, 100)  # CPU result column
-    table.setColumnWidth(2, 100)  # RAM result column
-    table.setColumnWidth(3, 100)  # Disk result column
-
-    # Hardcoded data
-    data = [
-        ["Intel i7-9700K, 16GB RAM, SSD", "6200", "2900", "4800"],
-        ["AMD Ryzen 5 3600, 16GB RAM, SSD", "5900", "2700", "4500"],
-        ["Intel i5-9400F, 8GB RAM, HDD", "5400", "2400", "3000"],
-        ["AMD Ryzen 7 3700X, 32GB RAM, SSD", "6400", "3000", "4900"],
-        ["Intel i9-9900K, 32GB RAM, NVMe", "6500", "3100", "5000"],
-    ]
-
-    # Populate table
-    for row, (config, cpu, ram, disk) in enumerate(data):
-        table.setItem(row, 0, QtWidgets.QTableWidgetItem(config))
-        table.setItem(row, 1, QtWidgets.QTableWidgetItem(cpu))
-        table.setItem(row, 2, QtWidgets.QTableWidgetItem(ram))
-        table.setItem(row, 3, QtWidgets.QTableWidgetItem(disk))
+class ThroughputGraph(QtWidgets.QWidget):
+    """A line graph of the throughput samples a running test reports."""
+    def __init__(self, unit):
+        super().__init__()
+        self.unit = unit
+        self.samples = []
+        self.setMinimumHeight(90)
+
+    def clear(self):
+        self.samples = []
+        self.update()
+
+    def add_sample(self, value):
+        self.samples.append(value)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        area = QtCore.QRectF(self.rect().adjusted(4, 20, -4, -4))
+        painter.setPen(QtGui.QColor("#D3D3D3"))
+        painter.drawRect(area)
+        if not self.samples:
+            return
+
+        peak = max(self.samples) or 1
+        step = area.width() / max(1, len(self.samples) - 1)
+        points = [QtCore.QPointF(area.left() + index * step, area.bottom() - value / peak * area.height())
+                  for index, value in enumerate(self.samples)]
+        painter.setPen(QtGui.QPen(QtGui.QColor("#4B0082"), 2))
+        painter.drawPolyline(QtGui.QPolygonF(points))
+        painter.drawText(4, 14, f"{self.samples[-1]:.1f} {self.unit} (peak {peak:.1f})")
+
+class TelemetrySparklines(QtWidgets.QWidget):
+    """One sparkline per telemetry channel recorded while a test ran, with its latest and peak value."""
+    ROW_HEIGHT = 20
+
+    def __init__(self, color="#4B0082"):
+        super().__init__()
+        self.color = QtGui.QColor(color)  # Of the labels and lines, to suit a light or dark background
+        self.rows = []  # (label, unit, values)
+        self.setMinimumHeight(len(self.channel_rows({})) * self.ROW_HEIGHT)
+
+    @staticmethod
+    def channel_rows(telemetry):
+        """Turn the raw channels into (label, unit, values) rows, per-sample counts becoming rates."""
+        times = telemetry.get("t", [])
+        intervals = [max(end - start, 1e-9) for start, end in zip([0.0] + times, times)]
+
+        def rate(channel, scale=1.0):
+            return [None if value is None else value / interval * scale
+                    for value, interval in zip(telemetry.get(channel, []), intervals)]
+
+        def total(*columns):
+            return [None if None in values else sum(values) for values in zip(*columns)]
+
+        return [
+            ("CPU clock", "MHz", telemetry.get("cpu_mhz", [])),
+            ("CPU use", "%", telemetry.get("cpu_percent", [])),
+            ("RSS", "MB", [None if value is None else value / 1e6 for value in telemetry.get("rss_bytes", [])]),
+            ("Page faults", "/s", total(rate("major_faults"), rate("minor_faults"))),
+            ("Disk I/O", "MB/s", total(rate("disk_read_bytes", 1e-6), rate("disk_write_bytes", 1e-6))),
+        ]
+
+    def set_telemetry(self, telemetry):
+        """Take the columns of hardware.UtilizationSampler.telemetry or database.get_telemetry."""
+        self.rows = self.channel_rows(telemetry)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        metrics = painter.fontMetrics()
+        rows = []  # (label, value text, known values, all values)
+        for label, unit, values in self.rows:
+            known = [value for value in values if value is not None]
+            text = f"{known[-1]:.1f} {unit} (peak {max(known):.1f})" if known else ""
+            rows.append((label, text, known, values))
+        # Size the label and value columns to their text, the lines get what is left
+        left = max((metrics.horizontalAdvance(label) for label, *_ in rows), default=0) + 12
+        right = self.width() - max((metrics.horizontalAdvance(text) for _, text, *_ in rows), default=0) - 12
+        for row, (label, text, known, values) in enumerate(rows):
+            top = row * self.ROW_HEIGHT
+            painter.setPen(self.color)
+            painter.drawText(4, top + 14, label)
+            if not known:
+                continue
+            painter.drawText(right + 8, top + 14, text)
+            low, high = min(known), max(known)
+            span = (high - low) or 1
+            step = (right - left) / max(1, len(values) - 1)
+            points = [QtCore.QPointF(left + index * step,
+                                     top + self.ROW_HEIGHT - 3 - (value - low) / span * (self.ROW_HEIGHT - 6))
+                      for index, value in enumerate(values) if value is not None]
+            painter.setPen(QtGui.QPen(self.color, 1.5))
+            painter.drawPolyline(QtGui.QPolygonF(points))
+
+class HistoryModel(QtCore.QAbstractTableModel):
+    """Table model over the stored results that loads one page at a time as the view scrolls."""
+    HEADERS = ["Test", "Result", "Time"]
+    PAGE_SIZE = 200
+
+    def __init__(self, test_type=None):
+        super().__init__()
+        self.test_type = test_type
+        self.rows = []
+        self.exhausted = False
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
 
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole or not index.isValid():
+            return None
+        _, test_type, metric, result, started_at = self.rows[index.row()]
+        if index.column() == 0:
+            return test_type
+        if index.column() == 1:
+            return f"{result:g}" if metric == "score" else f"{result_label(metric)}: {result:g}"
+        return datetime.fromtimestamp(started_at).strftime("%Y-%m-%d %H:%M:%S")
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        before = (self.rows[-1][4], self.rows[-1][0]) if self.rows else None
+        page = database.get_test_results_page(self.PAGE_SIZE, before, self.test_type)
+        if len(page) < self.PAGE_SIZE:
+            self.exhausted = True
+        if page:
+            self.beginInsertRows(QtCore.QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+class LatencyCurve(QtWidgets.QWidget):
+    """Memory latency against working set size, one point per size on a log2 axis."""
+    def __init__(self):
+        super().__init__()
+        self.points = []  # (size label, ns per access), smallest size first
+        self.setMinimumHeight(110)
+
+    def set_result(self, result):
+        """Take the latency_<size>_ns scores (or their summaries) of a ram_latency_test result."""
+        self.points = []
+        for name, value in result.items():
+            if name.startswith("latency_") and name.endswith("_ns"):
+                mean = value["mean"] if isinstance(value, dict) else value
+                self.points.append((name[len("latency_"):-len("_ns")], mean))
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        area = QtCore.QRectF(self.rect().adjusted(40, 18, -24, -18))
+        painter.setPen(QtGui.QColor("#D3D3D3"))
+        painter.drawRect(area)
+        if len(self.points) < 2:
+            return
+
+        peak = max(value for _, value in self.points) or 1
+        step = area.width() / (len(self.points) - 1)
+        points = [QtCore.QPointF(area.left() + index * step, area.bottom() - value / peak * area.height())
+                  for index, (_, value) in enumerate(self.points)]
+        painter.setPen(QtGui.QPen(QtGui.QColor("#4B0082"), 2))
+        painter.drawPolyline(QtGui.QPolygonF(points))
+        painter.drawText(4, 14, f"Memory latency (ns/access), peak {peak:.1f}")
+        painter.drawText(4, round(area.bottom()), "0")
+        painter.drawText(4, round(area.top()) + 10, f"{peak:.0f}")
+        # Label every other size so the labels do not overlap
+        for index in range(0, len(self.points), 2):
+            painter.drawText(round(points[index].x()) - 10, self.height() - 4, self.points[index][0])
+
+def _summary_value(value):
+    """Return the number to compare of a score, the mean where harness.measure summarized it."""
+    return value["mean"] if isinstance(value, dict) else value
+
+def show_other_results(test_type, result):
+    """Show how a result ranks against the imported reference sets and this database's own hosts.
+
+    The ranking and the CPU models around the result come from the
+    precomputed aggregates of comparison, so they stay quick however large
+    the reference sets are. The own hosts' set is rebuilt, and reference
+    files imported, on the database writer thread.
+    """
+    import comparison  # Deferred like the other dialogs' modules, only this dialog needs it
+    metrics = result if isinstance(result, dict) else {"score": result}
+    host = comparison.host_attributes(hardware.get_host_info())
+
+    dialog = QtWidgets.QDialog()
+    dialog.setWindowTitle("Compare Results")
+    dialog.setGeometry(200, 200, 640, 480)
     layout = QtWidgets.QVBoxLayout(dialog)
-    layout.addWidget(table)
 
-    # Close button
+    controls = QtWidgets.QHBoxLayout()
+    metric_combo = QtWidgets.QComboBox()
+    for name in metrics:
+        metric_combo.addItem(result_label(name), name)
+    filter_combo = QtWidgets.QComboBox()
+    filter_combo.addItem("All results", None)
+    for attribute, label in comparison.FILTERS.items():
+        if host[attribute] is not None:
+            filter_combo.addItem(f"{label} ({host[attribute]})", attribute)
+    controls.addWidget(metric_combo)
+    controls.addWidget(filter_combo)
+    layout.addLayout(controls)
+
+    status_label = QtWidgets.QLabel("")
+    layout.addWidget(status_label)
+
+    # One row per reference set: how many results match and how this one ranks among them
+    ranking_table = QtWidgets.QTableWidget(0, 4)
+    ranking_table.setHorizontalHeaderLabels(["Reference set", "Results", "Median", "Better than"])
+    ranking_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+    ranking_table.verticalHeader().setVisible(False)
+    ranking_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+    ranking_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+    layout.addWidget(ranking_table)
+
+    # The CPU models of the selected set whose median is closest to this result
+    models_table = QtWidgets.QTableWidget(0, 3)
+    models_table.setHorizontalHeaderLabels(["CPU model", "Results", "Median"])
+    models_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+    models_table.verticalHeader().setVisible(False)
+    models_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+    layout.addWidget(models_table)
+
+    def set_row(table, row, texts, bold=False):
+        for column, text in enumerate(texts):
+            item = QtWidgets.QTableWidgetItem(text)
+            if bold:
+                font = item.font()
+                font.setBold(True)
+                item.setFont(font)
+            table.setItem(row, column, item)
+
+    def show_models():
+        metric = metric_combo.currentData()
+        row = ranking_table.currentRow()
+        if row < 0:
+            models_table.setRowCount(0)
+            return
+        value = _summary_value(metrics[metric])
+        set_name = ranking_table.item(row, 0).data(QtCore.Qt.UserRole)
+        models = comparison.neighbours(set_name, test_type, metric, value)
+        # This host goes where its result falls, the list being ordered best first
+        higher_is_better = regression.higher_is_better(metric)
+        position = sum(1 for model in models if (model["median"] > value) == higher_is_better)
+        rows = [(model["name"], str(model["count"]), f"{model['median']:.2f}") for model in models]
+        rows.insert(position, (f"This host ({host['cpu_name']})", "", f"{value:.2f}"))
+        models_table.setRowCount(len(rows))
+        for index, texts in enumerate(rows):
+            set_row(models_table, index, texts, bold=index == position)
+
+    def show_ranking():
+        metric = metric_combo.currentData()
+        attribute = filter_combo.currentData()
+        filters = {attribute: host[attribute]} if attribute else None
+        ranking = comparison.rank(test_type, metric, _summary_value(metrics[metric]), filters)
+        ranking_table.setRowCount(len(ranking))
+        for row, entry in enumerate(ranking):
+            median = entry.get("median")
+            set_row(ranking_table, row, [
+                "Own hosts" if entry["set"] == comparison.LOCAL_SET else entry["set"],
+                str(entry["count"]),
+                "" if median is None else f"{median:.2f}",
+                f"{entry['percentile']:.1f}% of results",
+            ])
+            # The display name of the own hosts' set is not what neighbours looks up
+            ranking_table.item(row, 0).setData(QtCore.Qt.UserRole, entry["set"])
+        if not ranking:
+            status_label.setText("No reference results for this test yet. Import a reference file to compare with.")
+        ranking_table.setCurrentCell(0 if ranking else -1, 0)
+        show_models()
+
+    metric_combo.currentIndexChanged.connect(show_ranking)
+    filter_combo.currentIndexChanged.connect(show_ranking)
+    ranking_table.itemSelectionChanged.connect(show_models)
+
+    import_button = QtWidgets.QPushButton("Import Reference Data...")
+
+    def import_reference():
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            dialog, "Import Reference Data", "", "Reference data (*.csv *.csv.gz *.jsonl *.jsonl.gz)")
+        if not path:
+            return
+        import_button.setEnabled(False)
+        status_label.setText("Importing...")
+
+        def imported(summary):
+            import_button.setEnabled(True)
+            status_label.setText(f"Imported {summary['results']:,} results as {summary['name']}")
+            show_ranking()
+
+        def import_failed(message):
+            import_button.setEnabled(True)
+            status_label.setText(f"Import failed: {message}")
+
+        runnable = JobRunnable(lambda: comparison.import_reference(path))
+        runnable.signals.finished.connect(imported)
+        runnable.signals.failed.connect(import_failed)
+        QtCore.QThreadPool.globalInstance().start(runnable)
+
+    import_button.clicked.connect(import_reference)
     close_button = QtWidgets.QPushButton("Close")
     close_button.clicked.connect(dialog.close)
-    layout.addWidget(close_button)
+    button_layout = QtWidgets.QHBoxLayout()
+    button_layout.addWidget(import_button)
+    button_layout.addStretch()
+    button_layout.addWidget(close_button)
+    layout.addLayout(button_layout)
+
+    # Show what is there at once, then again once the own hosts include the latest runs
+    show_ranking()
+    status_label.setText("Updating the own hosts' results...")
+    def refreshed(count):
+        status_label.setText("")
+        show_ranking()
+
+    runnable = JobRunnable(comparison.refresh_local)
+    runnable.signals.finished.connect(refreshed)
+    runnable.signals.failed.connect(
+        lambda message: status_label.setText(f"Could not update the own hosts' results: {message}"))
+    QtCore.QThreadPool.globalInstance().start(runnable)
 
     dialog.exec_()
 
 def create_test_ui(main_window, test_type):
-    if test_type == "CPU":
-        name_text, characteristics_text = get_cpu_info()
-    elif test_type == "RAM":
-        name_text, characteristics_text = get_ram_info()
-    elif test_type == "DISK":
-        name_text, characteristics_text = get_disk_info()
-    else:
-        name_text, characteristics_text = "Unknown", "No information available"
+    benchmark = registry.get(test_type)
+    extras = registry.extras(test_type)
+    name_text, characteristics_text = registry.hardware_info(test_type)
 
     widget = QtWidgets.QWidget()
     layout = QtWidgets.QVBoxLayout(widget)
@@ -143,10 +527,32 @@ def create_test_ui(main_window, test_type):
     layout.addWidget(name_label)
     layout.addWidget(characteristics_label)
 
+    # A page that runs the pointer-chasing latency test shows its curve here
+    latency_curve = None
+    if any(extra["name"] == "RAM_LATENCY" for extra in extras):
+        latency_curve = LatencyCurve()
+        latency_curve.setVisible(False)
+        layout.addWidget(latency_curve)
+
     # Stopwatch
     stopwatch = StopwatchLabel()
     layout.addWidget(stopwatch)
 
+    # Live progress and throughput while a test runs
+    progress_bar = QtWidgets.QProgressBar()
+    progress_bar.setRange(0, 1000)
+    progress_bar.setTextVisible(False)
+    progress_bar.setVisible(False)
+    graph = ThroughputGraph(benchmark["unit"])
+    graph.setVisible(False)
+    layout.addWidget(progress_bar)
+    layout.addWidget(graph)
+
+    # What the host was doing while the last test ran, shown once it ends
+    sparklines = TelemetrySparklines()
+    sparklines.setVisible(False)
+    layout.addWidget(sparklines)
+
     # Start button and output label
     start_button = QtWidgets.QPushButton("Start Test")
     start_button.setIcon(QtGui.QIcon("icons/start.png"))  # Replace with your icon path
@@ -163,7 +569,15 @@ def create_test_ui(main_window, test_type):
             background-color: #551A8B;
         }
     """)
+    extra_buttons = {}
+    for extra in extras:
+        extra_button = QtWidgets.QPushButton(extra["button"])
+        extra_button.setIcon(QtGui.QIcon("icons/start.png"))
+        extra_button.setIconSize(QtCore.QSize(32, 32))
+        extra_button.setStyleSheet(start_button.styleSheet())
+        extra_buttons[extra["name"]] = extra_button
     output_label = QtWidgets.QLabel("")
+    output_label.setWordWrap(True)
     output_label.setStyleSheet("font-size: 16px; color: #800080; margin-top: 10px;")
 
     # Export and Other Results button layout
@@ -203,14 +617,14 @@ def create_test_ui(main_window, test_type):
             background-color: #551A8B;
         }
     """)
-    other_results_button.clicked.connect(show_other_results)
+    other_results_button.clicked.connect(lambda: show_other_results(test_result["test_type"], test_result["value"]))
     other_results_button.setVisible(False)  # Hide initially
     button_layout.addWidget(export_button)
     button_layout.addWidget(other_results_button)
     layout.addLayout(button_layout)
 
     # Variable to store the random result
-    test_result = {"value": None}  # Use a mutable dictionary to allow updates in inner functions
+    test_result = {"value": None, "test_type": test_type}  # Use a mutable dictionary to allow updates in inner functions
 
     # Define export action
     def export_result():
@@ -222,7 +636,7 @@ def create_test_ui(main_window, test_type):
                 current_time = datetime.now().strftime("%m/%d/%Y %I:%M%p")
                 content = (
                     f"{test_type} Benchmark\n"
-                    f"Result: {test_result['value']}\n"
+                    f"Result: {format_result(test_result['value'])}\n"
                     f"Time taken: {stopwatch.time_elapsed} seconds\n"
                     f"Datetime of the test: {current_time}"
                 )
@@ -247,23 +661,90 @@ def create_test_ui(main_window, test_type):
         }
     """)
 
-    def start_test():
+    cancel_button = QtWidgets.QPushButton("Cancel")
+    cancel_button.setStyleSheet("""
+        QPushButton {
+            background-color: #D3D3D3;
+            color: #4B0082;
+            border-radius: 8px;
+            padding: 10px 20px;
+            font-size: 16px;
+        }
+        QPushButton:hover {
+            background-color: #C0C0C0;
+        }
+    """)
+    cancel_button.setVisible(False)
+
+    current_run = {"runnable": None}  # The runnable of the test in progress, for cancelling
+
+    def show_progress(fraction, throughput):
+        progress_bar.setValue(round(fraction * 1000))
+        graph.add_sample(throughput)
+
+    def cancel_test():
+        cancel_button.setEnabled(False)
+        output_label.setText("Cancelling test...")
+        current_run["runnable"].cancel()
+
+    def handle_stopped(message):
+        stopwatch.stop()
+        cancel_button.setVisible(False)
+        progress_bar.setVisible(False)
+        output_label.setText(message)
+        start_button.setEnabled(True)
+        for extra_button in extra_buttons.values():
+            extra_button.setEnabled(True)
+        back_button.setEnabled(True)
+
+    def start_test(run_type):
         start_button.setEnabled(False)
+        for extra_button in extra_buttons.values():
+            extra_button.setEnabled(False)
         back_button.setEnabled(False)  # Block navigation until the test ends
-        output_label.setText("Running test...")
+        cancel_button.setEnabled(True)
+        cancel_button.setVisible(True)
+        output_label.setText("Waiting for the running test to finish..." if test_pool().activeThreadCount() else "Running test...")
+        progress_bar.setValue(0)
+        progress_bar.setVisible(True)
+        graph.unit = registry.get(run_type)["unit"]
+        graph.clear()
+        graph.setVisible(True)
+        sparklines.setVisible(False)
         stopwatch.start()
 
-        # Define a callback to handle the result after the test completes
-        def handle_test_result(result):
+        # Runs on the UI thread, queued from the worker by TestSignals.finished
+        def handle_test_result(result, utilization, telemetry):
             stopwatch.stop()  # Stop the stopwatch when the test completes
-            finish_test(output_label, start_button, back_button, stopwatch, export_button, other_results_button, test_type, test_result, result)
+            cancel_button.setVisible(False)
+            progress_bar.setVisible(False)
+            finish_test(output_label, start_button, back_button, stopwatch, export_button, other_results_button, run_type, test_result, result,
+                        utilization, telemetry)
+            if telemetry:
+                sparklines.set_telemetry(telemetry)
+                sparklines.setVisible(True)
+            for extra_button in extra_buttons.values():
+                extra_button.setEnabled(True)
+            if run_type == "RAM_LATENCY":
+                latency_curve.set_result(result)
+                latency_curve.setVisible(True)
 
-        # Create a runnable with the test type and callback, then start it
-        runnable = TestRunnable(test_type, handle_test_result)
-        QtCore.QThreadPool.globalInstance().start(runnable)
+        # Create a runnable for the test type, then start it
+        runnable = TestRunnable(run_type)
+        runnable.signals.progress.connect(show_progress)
+        runnable.signals.finished.connect(handle_test_result)
+        runnable.signals.cancelled.connect(lambda: handle_stopped("Test cancelled."))
+        runnable.signals.failed.connect(lambda message: handle_stopped(f"Test failed: {message}"))
+        current_run["runnable"] = runnable
+        test_pool().start(runnable)
 
-    start_button.clicked.connect(start_test)
+    start_button.clicked.connect(lambda: start_test(test_type))
+    cancel_button.clicked.connect(cancel_test)
     layout.addWidget(start_button)
+    for extra_type, extra_button in extra_buttons.items():
+        extra_button.clicked.connect(lambda _, run_type=extra_type: start_test(run_type))
+        layout.addWidget(extra_button)
+    layout.addWidget(cancel_button)
     layout.addWidget(output_label)
 
     # Buttons for history and recommendations
@@ -311,16 +792,335 @@ def create_test_ui(main_window, test_type):
     back_button.clicked.connect(lambda: main_window.central_widget.setCurrentWidget(main_window.main_menu))
     layout.addWidget(back_button)
 
-    return widget
+    # Scroll rather than squeeze when graphs and long results outgrow the window
+    scroll_area = QtWidgets.QScrollArea()
+    scroll_area.setWidgetResizable(True)
+    scroll_area.setFrameShape(QtWidgets.QFrame.NoFrame)
+    scroll_area.setWidget(widget)
+    return scroll_area
+
+def create_suite_ui(main_window):
+    """Build the page that runs several tests as one suite and shows their combined report."""
+    widget = QtWidgets.QWidget()
+    layout = QtWidgets.QVBoxLayout(widget)
+    layout.setAlignment(QtCore.Qt.AlignTop)
+    layout.setSpacing(10)
+    widget.setStyleSheet("""
+        background-color: #F5F5F5;
+        color: #4B0082;
+        font-family: 'Segoe UI', Arial;
+    """)
+    button_style = """
+        QPushButton {
+            background-color: #4B0082;
+            color: white;
+            border-radius: 8px;
+            padding: 10px 20px;
+            font-size: 16px;
+        }
+        QPushButton:hover {
+            background-color: #551A8B;
+        }
+        QPushButton:disabled {
+            background-color: #A9A9A9;
+        }
+    """
+
+    title_label = QtWidgets.QLabel("Full Suite")
+    title_label.setStyleSheet("font-size: 20px; font-weight: 600; margin-bottom: 5px;")
+    layout.addWidget(title_label)
+
+    # Tests to run, every test with its own page ticked by default
+    test_checks = {}
+    checks_layout = QtWidgets.QGridLayout()
+    for index, (name, benchmark) in enumerate(registry.benchmarks().items()):
+        check = QtWidgets.QCheckBox(name)
+        check.setChecked(benchmark["page"] is None)
+        check.setStyleSheet("font-size: 14px;")
+        test_checks[name] = check
+        checks_layout.addWidget(check, *divmod(index, 3))
+    layout.addLayout(checks_layout)
+
+    # Isolation controls
+    options_layout = QtWidgets.QFormLayout()
+    mode_box = QtWidgets.QComboBox()
+    mode_box.addItems(["Serial", "Parallel"])
+    cooldown_box = QtWidgets.QSpinBox()
+    cooldown_box.setRange(0, 600)
+    cooldown_box.setValue(int(suite.COOLDOWN))
+    cooldown_box.setSuffix(" s")
+    cpus_edit = QtWidgets.QLineEdit()
+    cpus_edit.setPlaceholderText("All CPUs, or a list such as 0-3,6")
+    options_layout.addRow("Mode:", mode_box)
+    options_layout.addRow("Cooldown between tests:", cooldown_box)
+    options_layout.addRow("Pin tests to CPUs:", cpus_edit)
+    layout.addLayout(options_layout)
+
+    start_button = QtWidgets.QPushButton("Start Suite")
+    start_button.setIcon(QtGui.QIcon("icons/start.png"))
+    start_button.setIconSize(QtCore.QSize(32, 32))
+    start_button.setStyleSheet(button_style)
+    cancel_button = QtWidgets.QPushButton("Cancel")
+    cancel_button.setStyleSheet(button_style)
+    cancel_button.setVisible(False)
+    progress_bar = QtWidgets.QProgressBar()
+    progress_bar.setRange(0, 1000)
+    progress_bar.setTextVisible(False)
+    progress_bar.setVisible(False)
+    status_label = QtWidgets.QLabel("")
+    status_label.setStyleSheet("font-size: 16px;")
+    report_label = QtWidgets.QLabel("")
+    report_label.setWordWrap(True)
+    report_label.setStyleSheet("font-size: 14px; color: #800080;")
+    export_button = QtWidgets.QPushButton("Export Report")
+    export_button.setIcon(QtGui.QIcon("icons/export.png"))
+    export_button.setIconSize(QtCore.QSize(24, 24))
+    export_button.setStyleSheet(button_style)
+    export_button.setVisible(False)
+    back_button = QtWidgets.QPushButton("Back")
+    back_button.setIcon(QtGui.QIcon("icons/back.png"))
+    back_button.setIconSize(QtCore.QSize(24, 24))
+    back_button.setStyleSheet(button_style)
+    for item in (start_button, cancel_button, progress_bar, status_label, report_label, export_button, back_button):
+        layout.addWidget(item)
+
+    current_run = {"runnable": None, "mode": None, "fractions": {}, "lines": [], "report": None}
 
-def finish_test(output_label, start_button, back_button, stopwatch, export_button, other_results_button, test_type, test_result, result):
+    def set_running(running):
+        start_button.setEnabled(not running)
+        back_button.setEnabled(not running)
+        cancel_button.setEnabled(True)
+        cancel_button.setVisible(running)
+        progress_bar.setVisible(running)
+
+    def show_progress(test_type, fraction, throughput):
+        current_run["fractions"][test_type] = fraction
+        fractions = current_run["fractions"]
+        progress_bar.setValue(round(sum(fractions.values()) / len(fractions) * 1000))
+
+    def handle_test_started(test_type, index):
+        count = len(current_run["fractions"])
+        status_label.setText(f"Running {test_type} ({index + 1} of {count})...")
+
+    def handle_test_finished(test_type, entry):
+        show_progress(test_type, 1.0, 0.0)
+        lines = current_run["lines"]
+        index = len(lines)
+        lines.append(f"{test_type}: {format_result(entry['results'])}\n{format_utilization(entry['utilization'])}")
+        report_label.setText("\n\n".join(lines))
+
+        def show_saved(run_id, findings):
+            if findings and current_run["lines"] is lines:  # Not if another suite has started meanwhile
+                lines[index] += f"\n{format_regressions(findings)}"
+                report_label.setText("\n\n".join(lines))
+
+        def show_save_failed(message):
+            if current_run["lines"] is lines:
+                lines[index] += f"\nCould not save the result: {message}"
+                report_label.setText("\n\n".join(lines))
+
+        save_in_background(test_type, entry["results"], entry["utilization"], entry["telemetry"],
+                           show_saved, show_save_failed)
+        if current_run["mode"] == "serial" and len(current_run["lines"]) < len(current_run["fractions"]):
+            status_label.setText(f"Cooling down after {test_type}...")
+
+    def handle_finished(report):
+        set_running(False)
+        current_run["report"] = report
+        status_label.setText(f"Suite completed in {report['duration']:.0f} s.")
+        export_button.setVisible(True)
+
+    def handle_stopped(message):
+        set_running(False)
+        status_label.setText(message)
+
+    def start_suite():
+        test_types = [name for name, check in test_checks.items() if check.isChecked()]
+        if not test_types:
+            status_label.setText("Select at least one test.")
+            return
+        try:
+            cpus = suite.parse_cpu_list(cpus_edit.text()) if cpus_edit.text().strip() else None
+        except ValueError as error:
+            status_label.setText(str(error))
+            return
+        mode = mode_box.currentText().lower()
+        runnable = SuiteRunnable(test_types, mode=mode, cooldown=cooldown_box.value(), affinity=cpus)
+        runnable.signals.test_started.connect(handle_test_started)
+        runnable.signals.progress.connect(show_progress)
+        runnable.signals.test_finished.connect(handle_test_finished)
+        runnable.signals.finished.connect(handle_finished)
+        runnable.signals.cancelled.connect(lambda: handle_stopped("Suite cancelled."))
+        runnable.signals.failed.connect(lambda message: handle_stopped(f"Suite failed: {message}"))
+        current_run.update(runnable=runnable, mode=mode, fractions=dict.fromkeys(test_types, 0.0), lines=[], report=None)
+        report_label.setText("")
+        export_button.setVisible(False)
+        progress_bar.setValue(0)
+        status_label.setText("Waiting for the running test to finish..." if test_pool().activeThreadCount() else "Starting suite...")
+        set_running(True)
+        test_pool().start(runnable)
+
+    def cancel_suite():
+        cancel_button.setEnabled(False)
+        status_label.setText("Cancelling suite...")
+        current_run["runnable"].cancel()
+
+    def export_report():
+        filename, _ = QtWidgets.QFileDialog.getSaveFileName(None, "Save Suite Report", "", "JSON Files (*.json)")
+        if filename:
+            with open(filename, "w") as file:
+                json.dump({"host": hardware.get_host_info(), **current_run["report"]}, file, indent=2)
+
+    start_button.clicked.connect(start_suite)
+    cancel_button.clicked.connect(cancel_suite)
+    export_button.clicked.connect(export_report)
+    back_button.clicked.connect(lambda: main_window.central_widget.setCurrentWidget(main_window.main_menu))
+
+    scroll_area = QtWidgets.QScrollArea()
+    scroll_area.setWidgetResizable(True)
+    scroll_area.setFrameShape(QtWidgets.QFrame.NoFrame)
+    scroll_area.setWidget(widget)
+    return scroll_area
+
+RESULT_LABELS = {
+    "single_core": "Single-core",
+    "all_core": "All-core",
+    "scaling_efficiency": "Scaling efficiency",
+    "copy": "Copy GB/s",
+    "scale": "Scale GB/s",
+    "add": "Add GB/s",
+    "triad": "Triad GB/s",
+    "mix_score": "Mix score",
+    "sha256_mb_s": "SHA-256 MB/s",
+    "zlib_mb_s": "zlib MB/s",
+    "matmul_gflop_s": "Matrix multiply GFLOP/s",
+    "sort_m_elements_s": "Sort M elements/s",
+}
+
+UNIT_SUFFIXES = [("_mb_s", " MB/s"), ("_iops", " IOPS"), ("_us", " \u00b5s"), ("_ns", " ns")]
+
+def result_label(name):
+    """Return a readable label for a named score, e.g. seq_read_mb_s -> Seq read MB/s."""
+    if name in RESULT_LABELS:
+        return RESULT_LABELS[name]
+    unit = ""
+    for suffix, suffix_label in UNIT_SUFFIXES:
+        if name.endswith(suffix):
+            name, unit = name[:-len(suffix)], suffix_label
+            break
+    label = name.replace("_", " ")
+    return label[:1].upper() + label[1:] + unit
+
+def format_value(value):
+    """Format a score, or a harness summary as mean ± stddev with its sample count."""
+    if isinstance(value, dict):
+        return f"{value['mean']:.2f} \u00b1 {value['stddev']:.2f} (n={value['samples']})"
+    return str(value)
+
+def format_result(result):
+    """Format a test result, either a single score or a dict of named scores."""
+    if isinstance(result, dict):
+        return ", ".join(f"{result_label(name)}: {format_value(value)}" for name, value in result.items())
+    return format_value(result)
+
+def save_result(test_type, result, utilization=None, telemetry=None):
+    """Save a test result as a run on this host, with each named score as a metric."""
+    metrics = result if isinstance(result, dict) else {"score": result}
+    return database.insert_run(test_type, metrics, host=hardware.get_host_info(), utilization=utilization,
+                               telemetry=telemetry)
+
+class JobSignals(QtCore.QObject):
+    """Signals run_on_writer and JobRunnable emit from the thread that ran their job."""
+    finished = QtCore.pyqtSignal(object)  # What the job returned
+    failed = QtCore.pyqtSignal(str)
+
+class JobRunnable(QtCore.QRunnable):
+    """Runs a long database job, such as a reference import, off both the UI and the writer thread.
+
+    Its transactions take turns with the writer's, so results saved
+    meanwhile are not queued behind the whole job.
+    """
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+        self.signals = JobSignals()
+
+    def run(self):
+        try:
+            result = self.job()
+        except Exception as error:  # Report the failure in the dialog rather than losing it on the worker thread
+            self.signals.failed.emit(repr(error))
+            return
+        self.signals.finished.emit(result)
+
+def run_on_writer(job, on_finished, on_failed):
+    """Run job on the database writer thread, then call on_finished(result) or on_failed(message) on the UI thread.
+
+    They are connected before the job is queued, so a fast job cannot
+    finish before anyone listens.
+    """
+    signals = JobSignals()
+    signals.finished.connect(on_finished)
+    signals.failed.connect(on_failed)
+
+    def done(future):
+        # The closure keeps signals alive until the writer is done with it
+        if future.exception() is not None:
+            signals.failed.emit(repr(future.exception()))
+        else:
+            signals.finished.emit(future.result())
+
+    database.writer().submit(job).add_done_callback(done)
+
+def save_in_background(test_type, result, utilization, telemetry, on_saved, on_failed):
+    """Save a result and check it for regressions on the database writer thread.
+
+    on_saved(run_id, findings) or on_failed(message) is then called on the
+    UI thread, see run_on_writer.
+    """
+    def save():
+        run_id = save_result(test_type, result, utilization, telemetry)
+        return run_id, regression.regressions(run_id)  # Compare with earlier runs on this host
+
+    run_on_writer(save, lambda saved: on_saved(*saved), on_failed)
+
+def format_utilization(utilization):
+    """Describe how busy the host was during a run, from a hardware.UtilizationSampler summary."""
+    text = (f"Host load: CPU {utilization['cpu_percent_mean']:.0f}% (max {utilization['cpu_percent_max']:.0f}%), "
+            f"RAM {utilization['ram_percent_max']:.0f}%")
+    if utilization["disk_read_mb_s"] is not None:
+        text += f", disk {utilization['disk_read_mb_s']:.1f} MB/s read, {utilization['disk_write_mb_s']:.1f} MB/s written"
+    return text
+
+def format_regressions(findings):
+    """Describe regression findings, one line per slowed-down metric."""
+    return "\n".join(
+        f"Regression: {result_label(finding['metric'])} is {finding['slowdown']:.1%} worse than "
+        f"the last {finding['baseline_runs']} runs (p={finding['p_value']:.3f})"
+        for finding in findings
+    )
+
+def finish_test(output_label, start_button, back_button, stopwatch, export_button, other_results_button, test_type, test_result, result,
+                utilization=None, telemetry=None):
     # Display the actual result from the test
-    output_label.setText(f"Test completed. Result: {result}")
-    database.insert_test_result(test_type, result)  # Save to the database
+    output_label.setText(f"Test completed. Result: {format_result(result)}")
+    if utilization is not None:
+        output_label.setText(f"{output_label.text()}\n{format_utilization(utilization)}")
+
+    def show_saved(run_id, findings):
+        # Skip the findings if another test has started on the page meanwhile
+        if findings and test_result["value"] is result and start_button.isEnabled():
+            output_label.setText(f"{output_label.text()}\n{format_regressions(findings)}")
+
+    def show_save_failed(message):
+        output_label.setText(f"{output_label.text()}\nCould not save the result: {message}")
+
+    save_in_background(test_type, result, utilization, telemetry, show_saved, show_save_failed)
     start_button.setEnabled(True)
     back_button.setEnabled(True)  # Enable back button after the test ends
     export_button.setVisible(True)  # Show the export button
     other_results_button.setVisible(True)  # Show the Other Results button after test ends
 
-    # Store the test result for exporting
+    # Store the test result for exporting and comparing
     test_result["value"] = result
+    test_result["test_type"] = test_type